@@ -6,23 +6,29 @@ from flask_cors import CORS
 import os
 import traceback
 import threading
+import multiprocessing
 import uuid
 import json
 from datetime import datetime
 from dotenv import load_dotenv
-from threading import Semaphore
 import psutil
 
-# Memory protection
-MAX_CONCURRENT_PROCESSING = 2
-processing_semaphore = Semaphore(MAX_CONCURRENT_PROCESSING)
-
 print("Starting voice donation API...")
 
 # Load environment variables
 load_dotenv()
 
+# Feature extraction runs in a process pool (concurrency = config.EXTRACTION_WORKERS)
+import config
+from utils import metrics
+from utils.admission import get_admission_controller, job_class
+from utils.job_queue import JobHandler, JobWorkers, get_job_queue
+from utils.processing_pool import get_extraction_executor
+from utils.uploads import SpoolingRequest
+
 app = Flask(__name__)
+# File uploads stream to disk as they arrive (hashed on the way) instead of into memory
+app.request_class = SpoolingRequest
 CORS(app)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
@@ -73,12 +79,80 @@ def test_aws_connection():
         return False, str(e)
 
 
-# Test AWS on startup
-aws_connected, aws_message = test_aws_connection()
-print(f"AWS Status: {aws_connected} - {aws_message}")
+# Test AWS on startup (extraction worker processes re-import this module under spawn; skip it there)
+if multiprocessing.parent_process() is None:
+    aws_connected, aws_message = test_aws_connection()
+    print(f"AWS Status: {aws_connected} - {aws_message}")
+else:
+    aws_connected, aws_message = False, "Extraction worker process"
+
+# Uploads wait in the durable job queue (utils/job_queue.py); started at the end of this module
+job_workers = None
+
+
+def job_queue_stats():
+    """Job queue snapshot (JobQueue.stats), so the queue database is queried at most every JOB_STATS_SECONDS"""
+    return get_job_queue().stats(config.JOB_STATS_SECONDS)
+
+
+def extraction_backlog():
+    """Jobs waiting for an extraction worker: ready in the job queue plus waiting in the executor"""
+    return job_queue_stats()['ready'] + get_extraction_executor().queue_depth
+
 
-# In-memory storage for pending multi-task submissions
-pending_submissions = {}
+def worker_utilization():
+    executor = get_extraction_executor()
+    return min(executor.in_flight, executor.max_workers) / executor.max_workers
+
+
+def resident_memory():
+    """RSS of the web process and, summed, of its extraction worker processes"""
+    process = psutil.Process()
+    workers = 0
+    for child in process.children(recursive=True):
+        try:
+            workers += child.memory_info().rss
+        except psutil.Error:
+            pass  # Worker exited between listing and reading
+    return {('web',): process.memory_info().rss, ('workers',): workers}
+
+
+def job_latency_quantiles():
+    """{(job_class, quantile): seconds} of the recent jobs, kept in memory by the job workers"""
+    if job_workers is None:
+        return {}
+    return {(job_class, quantile): seconds
+            for job_class, report in job_workers.latency_percentiles().items()
+            for quantile, seconds in report.items() if quantile != 'jobs'}
+
+
+# Scrape-time gauges; everything they read is in memory (job queue figures from a periodic snapshot)
+metrics.REGISTRY.gauge('voice_extraction_queue_depth', 'Extraction jobs waiting for a free worker',
+                       lambda: get_extraction_executor().queue_depth)
+metrics.REGISTRY.gauge('voice_extraction_in_flight', 'Extraction jobs submitted and not finished',
+                       lambda: get_extraction_executor().in_flight)
+metrics.REGISTRY.gauge('voice_extraction_workers', 'Extraction worker slots',
+                       lambda: get_extraction_executor().max_workers)
+metrics.REGISTRY.gauge('voice_extraction_worker_utilization', 'Share of extraction workers running a job',
+                       worker_utilization)
+metrics.REGISTRY.gauge('voice_jobs', 'Jobs in the durable job queue by status',
+                       lambda: {(status,): count for status, count in job_queue_stats()['counts'].items()},
+                       ['status'])
+metrics.REGISTRY.gauge('voice_extraction_backlog', 'Jobs waiting for an extraction worker', extraction_backlog)
+metrics.REGISTRY.gauge('voice_pending_donations', 'Multi-task donations still waiting for tasks',
+                       lambda: job_queue_stats()['pending_groups'])
+metrics.REGISTRY.gauge('voice_resident_memory_bytes', 'Resident set size', resident_memory, ['process'])
+metrics.REGISTRY.gauge('voice_job_latency_quantile_seconds',
+                       'Submission-to-completion latency percentiles of the last hour by job class',
+                       job_latency_quantiles, ['job_class', 'quantile'])
+metrics.REGISTRY.gauge('voice_extraction_backlog_cpu_seconds', 'Estimated CPU seconds of queued and running extractions',
+                       lambda: job_queue_stats()['pending_cpu_s'])
+metrics.REGISTRY.gauge('voice_admission_running', 'Extractions admitted by the memory-budget scheduler',
+                       lambda: get_admission_controller().running)
+metrics.REGISTRY.gauge('voice_admission_admitted_memory_bytes', 'Estimated memory of the admitted extractions',
+                       lambda: get_admission_controller().admitted_mb * 2**20)
+metrics.REGISTRY.gauge('voice_admission_memory_budget_bytes', 'Memory budget for running extractions',
+                       lambda: get_admission_controller().memory_budget_mb() * 2**20)
 
 
 # Routes
@@ -111,13 +185,29 @@ def health_check_basic():
 
 @app.route('/health', methods=['GET'])
 def health_check():
+    """Healthy unless the extraction backlog is over HEALTH_MAX_QUEUE_DEPTH (then 503, not ready)"""
+    queue_depth = extraction_backlog()
+    if config.HEALTH_MAX_QUEUE_DEPTH and queue_depth > config.HEALTH_MAX_QUEUE_DEPTH:
+        return jsonify({
+            'status': 'not_ready',
+            'message': f'Extraction backlog of {queue_depth} jobs',
+            'queue_depth': queue_depth,
+            'aws_status': aws_message
+        }), 503
     return jsonify({
         'status': 'healthy',
         'message': 'Voice Donation API is running',
+        'queue_depth': queue_depth,
         'aws_status': aws_message
     })
 
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Queue, worker, stage latency, DynamoDB and memory metrics in the Prometheus text format"""
+    return app.response_class(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/test', methods=['GET'])
 def test():
     return jsonify({
@@ -127,6 +217,22 @@ def test():
     })
 
 
+@app.route('/api/extraction-plan/<task_type>', methods=['GET'])
+def extraction_plan(task_type):
+    """
+    Feature groups and estimated CPU and memory cost of a task type
+    (?duration=<seconds>&sample_rate=<Hz>&engine=praat|numpy&tier=fast|standard|full)
+    """
+    from utils.feature_registry import get_extraction_plan
+    duration = request.args.get('duration', type=float)
+    sample_rate = request.args.get('sample_rate', 48000, type=int)
+    try:
+        plan = get_extraction_plan(task_type, request.args.get('engine'), request.args.get('tier'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(plan.describe(duration, sample_rate))
+
+
 # AWS-dependent routes (only if AWS is connected)
 if aws_connected:
     @app.route('/api/test-aws', methods=['GET'])
@@ -168,7 +274,7 @@ if aws_connected:
                 return jsonify({'error': 'No file selected'}), 400
 
             from utils.aws_helpers import upload_audio_file
-            result = upload_audio_file(file.read(), file.filename)
+            result = upload_audio_file(file.stream, file.filename)
 
             if result['success']:
                 return jsonify(result), 200
@@ -216,56 +322,87 @@ if aws_connected:
             task_metadata = questionnaire_json.get('task_metadata', {})
             donation_id = task_metadata.get('donation_id', recording_id)
 
-            # Read audio data
-            audio_data = file.read()
-            if len(audio_data) == 0:
+            # The audio was streamed to a spool file while the request was parsed (utils/uploads.py)
+            upload = file.stream
+            if upload.size == 0:
                 return jsonify({'error': 'Empty audio file'}), 400
+            metrics.UPLOAD_BYTES.observe(upload.size, task_type=task_metadata.get('task_type', 'speech'))
 
-            # Request info for metadata
+            # Container header probe: reject what can't be decoded or is out of bounds before queueing it
+            # (the container is sniffed from the leading bytes captured while spooling)
+            from utils.audio_probe import ProbeError, probe_audio
+            try:
+                probe = probe_audio(upload, head=upload.head)
+            except ProbeError as e:
+                metrics.UPLOADS_REJECTED.inc(reason='invalid_audio')
+                return jsonify({'error': 'Unsupported or corrupt audio file', 'details': str(e)}), 400
+            if not probe.channels or (probe.duration_s is not None and not
+                                      config.AUDIO_MIN_SECONDS <= probe.duration_s <= config.AUDIO_MAX_SECONDS):
+                metrics.UPLOADS_REJECTED.inc(reason='invalid_audio')
+                return jsonify({'error': f'Recordings must be {config.AUDIO_MIN_SECONDS:g} to '
+                                         f'{config.AUDIO_MAX_SECONDS:g} seconds of audio',
+                                'audio': probe.as_dict()}), 400
+
+            # Request info for metadata; the hash computed while spooling is reused by extraction
             request_info = {
                 'remote_addr': request.remote_addr,
                 'user_agent': request.headers.get('User-Agent', 'unknown'),
-                'method': request.method
+                'method': request.method,
+                'audio_sha256': upload.sha256,
+                'audio_probe': probe.as_dict()  # duration_s None: the container doesn't record it
             }
 
+            # Task metadata drives the extraction plan and the feature cache key
+            if task_metadata:
+                request_info['task_metadata'] = questionnaire_result['data'].get('task_metadata', task_metadata)
+
+            # Optional extraction tier ('fast', 'standard' or 'full'); the scheduler may still downgrade it
+            requested_tier = request.form.get('extraction_tier')
+            if requested_tier:
+                from utils.feature_registry import EXTRACTION_TIERS
+                if requested_tier not in EXTRACTION_TIERS:
+                    return jsonify({'error': f'Unknown extraction tier: {requested_tier}'}), 400
+                request_info['requested_extraction_tier'] = requested_tier
+
+            # Admission control: refuse new work while the queued extractions are over the CPU backlog limit
+            from utils.admission import estimate_audio, estimate_job_cost, retry_after_seconds
+            duration, sample_rate = estimate_audio(probe, upload.size)
+            cost = estimate_job_cost(duration, sample_rate, task_metadata.get('task_type'), requested_tier)
+            retry_after = retry_after_seconds(job_queue_stats()['pending_cpu_s'], cost['cpu_s'],
+                                              get_extraction_executor().max_workers)
+            if retry_after:
+                metrics.UPLOADS_REJECTED.inc(reason='backlog')
+                print(f"Rejecting upload for {donation_id}: extraction backlog full, retry in {retry_after}s")
+                response = jsonify({'error': 'Too many recordings are being processed, please retry later',
+                                    'retry_after': retry_after})
+                response.headers['Retry-After'] = str(retry_after)
+                return response, 429
+
             # Check if multi-task
             is_multi_task = task_metadata.get('total_tasks', 1) > 1
 
-            if is_multi_task:
-                # Store task submission
+            if is_multi_task and not config.PIPELINED_DONATIONS:
+                # Batch mode: hold the task until the whole donation is in
                 success = store_task_submission(
                     recording_id=recording_id,
                     donation_id=donation_id,
-                    audio_data=audio_data,
+                    upload=upload,
                     filename=file.filename,
                     questionnaire_result=questionnaire_result,
-                    request_info=request_info
+                    request_info=request_info,
+                    cost=cost
                 )
 
                 if not success:
                     return jsonify({'error': 'Failed to store task submission'}), 500
 
-                # Check if all tasks submitted
-                if should_start_processing(donation_id, task_metadata.get('total_tasks', 2)):
-                    print(f"Starting background processing for {donation_id}")
-                    start_multi_task_processing(donation_id)
+                # Queue the donation once all its tasks are in
+                if start_multi_task_processing(donation_id, task_metadata.get('total_tasks', 2)):
+                    print(f"Queued background processing for {donation_id}")
             else:
-                # Single task processing
-                from utils.database import save_initial_voice_donation
-                save_initial_voice_donation(
-                    recording_id=recording_id,
-                    questionnaire_data=questionnaire_result['data'],
-                    audio_filename=file.filename,
-                    audio_size=len(audio_data),
-                    request_info=request_info
-                )
-
-                processing_thread = threading.Thread(
-                    target=process_audio_background,
-                    args=(recording_id, audio_data, file.filename, questionnaire_result, request_info),
-                    daemon=True
-                )
-                processing_thread.start()
+                # Single tasks, and each task of a multi-task donation in pipelined mode, are queued on arrival
+                queue_recording(recording_id, upload, file.filename, questionnaire_result, request_info,
+                                cost, donation_id=donation_id if is_multi_task else None)
 
             print(f"Returning response for {donation_id}")
 
@@ -291,16 +428,28 @@ if aws_connected:
         try:
             from utils.database import get_donation_recordings_status
             result = get_donation_recordings_status(donation_id)
+            # Donation-level progress kept by the job queue: knows the expected task count
+            # and whether tasks are still to come, which the stored recordings alone don't
+            progress = get_job_queue().group_status(donation_id)
 
             if not result['success']:
-                return jsonify({'error': 'Donation not found'}), 404
+                if progress is None:
+                    return jsonify({'error': 'Donation not found'}), 404
+                result = {'recordings': [], 'donation_status': 'submitted', 'completed_count': 0, 'total_count': 0}
+
+            donation_status = result['donation_status']
+            total_count = result['total_count']
+            if progress is not None:
+                total_count = max(total_count, progress['expected'] or 0)
+                if progress['closed_at'] is None and donation_status == 'completed':
+                    donation_status = 'processing'
 
             return jsonify({
                 'donation_id': donation_id,
                 'recordings': result['recordings'],
-                'donation_status': result['donation_status'],
+                'donation_status': donation_status,
                 'completed_count': result['completed_count'],
-                'total_count': result['total_count']
+                'total_count': total_count
             }), 200
 
         except Exception as e:
@@ -318,20 +467,57 @@ else:
 
 
 # Helper functions
-def store_task_submission(recording_id, donation_id, audio_data, filename, questionnaire_result, request_info):
-    try:
-        if donation_id not in pending_submissions:
-            pending_submissions[donation_id] = {}
+def queue_recording(recording_id, upload, filename, questionnaire_result, request_info, cost,
+                    donation_id=None):
+    """
+    Write the initial record and queue the spooled upload for extraction with its cost
+    estimate (utils/admission.py). A task of a multi-task donation (donation_id given)
+    also counts towards the donation's completion.
+    """
+    from utils.database import save_initial_voice_donation
+    from utils.profiling import StageProfiler
+    profiler = StageProfiler()
+    with profiler.stage('db_initial_write'):
+        save_initial_voice_donation(
+            recording_id=recording_id,
+            questionnaire_data=questionnaire_result['data'],
+            audio_filename=filename,
+            audio_size=upload.size,
+            request_info=request_info
+        )
 
+    group = {}
+    if donation_id:
+        task_metadata = questionnaire_result['data']['task_metadata']
+        group = {'group_key': donation_id, 'group_seq': task_metadata['task_number'],
+                 'group_size': task_metadata.get('total_tasks')}
+
+    # Audio waits on disk in the job queue until a worker picks it up
+    get_job_queue().enqueue('recording', {
+        'recording_id': recording_id,
+        'filename': filename,
+        'questionnaire_result': questionnaire_result,
+        'request_info': request_info,
+        'cost': cost,
+        'initial_write_s': profiler.stages['db_initial_write']['seconds']
+    }, audio_file=upload, cost=cost['cpu_s'], job_class=job_class(cost), **group)
+    job_workers.notify()
+
+
+def store_task_submission(recording_id, donation_id, upload, filename, questionnaire_result, request_info, cost):
+    """Hold a task of a multi-task donation in the job queue until the rest of the donation arrives"""
+    try:
         task_num = questionnaire_result['data']['task_metadata']['task_number']
-        pending_submissions[donation_id][task_num] = {
+        get_job_queue().enqueue('task', {
             'recording_id': recording_id,
-            'audio_data': audio_data,
             'filename': filename,
             'questionnaire_result': questionnaire_result,
             'request_info': request_info,
+            'cost': cost,
             'submitted_at': datetime.utcnow().isoformat()
-        }
+        }, audio_file=upload, group_key=donation_id, group_seq=task_num, hold=True,
+            group_size=questionnaire_result['data']['task_metadata'].get('total_tasks'),
+            cost=cost['cpu_s'], job_class=job_class(cost))
 
         print(f"Stored task {task_num} for donation {donation_id}")
         return True
@@ -340,147 +526,212 @@ def store_task_submission(recording_id, donation_id, audio_data, filename, quest
         return False
 
 
-def should_start_processing(donation_id, total_tasks):
-    if donation_id not in pending_submissions:
+def reap_abandoned_donations():
+    """
+    Multi-task donations with no new task for DONATION_TTL_HOURS: process the tasks that
+    arrived (DONATION_TTL_ACTION=process) or drop them and their audio (expire)
+    """
+    queue = get_job_queue()
+    for donation_id, expected, held in queue.abandoned_groups(config.DONATION_TTL_HOURS * 3600):
+        if not held:
+            # Every task that arrived was processed (pipelined mode, or a partial batch already run)
+            if not queue.group_in_progress(donation_id):
+                donation_completed(queue.close_group(donation_id, 'partial'))
+        elif config.DONATION_TTL_ACTION == 'expire':
+            print(f"Expiring abandoned donation {donation_id} ({held}/{expected or '?'} tasks)")
+            donation_completed(queue.expire_group(donation_id))
+        elif queue.enqueue_when_complete(donation_id, 1, 'donation', {'donation_id': donation_id, 'partial': True}):
+            print(f"Processing abandoned donation {donation_id} with {held}/{expected or '?'} tasks")
+            job_workers.notify()
+
+
+def finish_donation_task(donation_id, task_number, outcome):
+    """Record a task's outcome ('completed' or 'failed'); the last one completes the donation"""
+    status = get_job_queue().record_result(donation_id, task_number, outcome)
+    if status:
+        donation_completed(status)
+
+
+def donation_completed(status):
+    """Donation-level completion event: every task has a result, or the donation was closed early"""
+    outcomes = list(status['results'].values())
+    since_last_task = status['closed_at'] - status['last_activity_at']
+    metrics.DONATION_COMPLETION_SECONDS.observe(since_last_task, outcome=status['outcome'])
+    print(f"Donation {status['group_key']} {status['outcome']}: {outcomes.count('completed')} completed, "
+          f"{outcomes.count('failed')} failed of {status['expected'] or '?'} tasks, "
+          f"{since_last_task:.1f}s after its last task arrived")
+
+
+def start_multi_task_processing(donation_id, total_tasks):
+    """Queue the donation job once all tasks are held; True if this call queued it"""
+    queue = get_job_queue()
+    print(f"Donation {donation_id}: {queue.held_count(donation_id)}/{total_tasks} tasks submitted")
+    if not queue.enqueue_when_complete(donation_id, total_tasks, 'donation', {'donation_id': donation_id}):
         return False
-    submitted_tasks = len(pending_submissions[donation_id])
-    print(f"Donation {donation_id}: {submitted_tasks}/{total_tasks} tasks submitted")
-    return submitted_tasks >= total_tasks
-
-
-def start_multi_task_processing(donation_id):
-    processing_thread = threading.Thread(
-        target=process_multi_task_background,
-        args=(donation_id,),
-        daemon=True
-    )
-    processing_thread.start()
-
-
-def process_multi_task_background(donation_id):
-    """Multi-task processing with memory management"""
-
-    # ACQUIRE SEMAPHORE FOR WHOLE DONATION
-    processing_semaphore.acquire()
+    job_workers.notify()
+    return True
+
+
+def extract_features(recording_id, audio_data, filename, request_info, profiler=None, audio_path=None, cost=None):
+    """
+    Feature extraction in the worker pool, skipped when identical audio is already cached.
+    Runs at the requested extraction tier, downgraded while jobs are queueing for workers,
+    once the admission controller has room for its estimated memory (`cost`, estimated
+    at upload); audio of recordings with deferred feature groups is archived for a later
+    backfill.
+
+    With audio_path (audio spooled to disk, audio_data its memory map) the worker reads
+    the file itself instead of receiving the bytes.
+
+    The result's processing_profile gets the stages measured here (admission and queue
+    wait, archive upload) and those already in `profiler` (e.g. the initial database write).
+    """
+    import time
+    from utils.admission import estimate_audio, estimate_job_cost
+    from utils.audio_probe import probe_or_none
+    from utils.feature_cache import extract_features_cached
+    from utils.feature_extraction import extract_all_features, extract_spooled_features
+    from utils.feature_registry import select_extraction_tier
+    from utils.profiling import StageProfiler, add_stages, processing_profile
+
+    profiler = profiler if profiler is not None else StageProfiler()
+
+    executor = get_extraction_executor()
+    backlog = extraction_backlog()
+    tier = select_extraction_tier(request_info.get('requested_extraction_tier'), backlog)
+    if tier != (request_info.get('requested_extraction_tier') or config.EXTRACTION_TIER):
+        print(f"Backlog of {backlog} jobs: running {recording_id} at the {tier} tier")
+    request_info = dict(request_info, extraction_tier=tier)
+
+    def run_in_pool(audio_data, filename, request_info):
+        # Memory is estimated again at the tier the job actually runs at
+        duration, sample_rate = (cost['duration_s'], cost['sample_rate']) if cost \
+            else estimate_audio(probe_or_none(audio_data), len(audio_data))
+        memory_mb = estimate_job_cost(duration, sample_rate, request_info.get('task_metadata', {}).get('task_type'),
+                                      tier)['memory_mb']
+        admission = get_admission_controller()
+        profiler.add('admission_wait', admission.acquire(memory_mb))
+        try:
+            submitted_at = time.time()
+            if audio_path:
+                result = executor.run(extract_spooled_features, audio_path, filename, request_info)
+            else:
+                result = executor.run(extract_all_features, audio_data, filename, request_info)
+        finally:
+            admission.release(memory_mb)
+        started_at = result.get('processing_profile', {}).get('started_at')
+        if started_at is not None:
+            profiler.add('queue_wait', max(0.0, started_at - submitted_at))
+        return result
 
     try:
-        print(f"Background processing started: {donation_id}")
-        memory_start = check_memory_usage()
-        print(f"Memory at start: {memory_start:.1f} MB")
-
-        if donation_id not in pending_submissions:
-            print(f"ERROR: No submissions for {donation_id}")
-            return
-
-        tasks = pending_submissions[donation_id]
-
-        # PROCESS TASKS SEQUENTIALLY - Not parallel
-        for task_num in sorted(tasks.keys()):
-            task_data = tasks[task_num]
-            print(f"Processing task {task_num}")
-
-            try:
-                from utils.database import save_initial_voice_donation
-                save_initial_voice_donation(
-                    recording_id=task_data['recording_id'],
-                    questionnaire_data=task_data['questionnaire_result']['data'],
-                    audio_filename=task_data['filename'],
-                    audio_size=len(task_data['audio_data']),
-                    request_info=task_data['request_info']
-                )
-
-                # PROCESS IMMEDIATELY WITHOUT NEW THREAD
-                from utils.feature_extraction import extract_all_features
-                features_result = extract_all_features(
-                    task_data['audio_data'],
-                    task_data['filename'],
-                    task_data['request_info']
-                )
-
-                if features_result.get('summary', {}).get('processing_successful', False):
-                    from utils.database import save_voice_donation_features
-                    save_voice_donation_features(
-                        recording_id=task_data['recording_id'],
-                        audio_features=features_result,
-                        questionnaire_data=task_data['questionnaire_result']['data'],
-                        metadata=features_result['metadata']
-                    )
-
-                print(f"Completed task {task_num}")
-
-                # CLEANUP BETWEEN TASKS
-                import gc
-                gc.collect()
-
-            except Exception as e:
-                print(f"Task {task_num} error: {e}")
-
-        del pending_submissions[donation_id]
-        print(f"Completed all tasks for donation: {donation_id}")
-
-    except Exception as e:
-        print(f"Background processing error: {e}")
-
-    finally:
-        # ALWAYS RELEASE
-        processing_semaphore.release()
-
-        import gc
-        gc.collect()
+        features_result = extract_features_cached(recording_id, audio_data, filename, request_info, run_in_pool)
+    except Exception:
+        metrics.EXTRACTION_JOBS.inc(outcome='error')
+        raise
+
+    summary = features_result.get('summary', {})
+    if summary.get('deferred_feature_groups') and config.ARCHIVE_DEFERRED_AUDIO:
+        from utils.aws_helpers import upload_audio_file
+        with profiler.stage('archive_upload'):
+            archive = upload_audio_file(bytes(audio_data), f"{recording_id}_{filename}")
+        if archive['success']:
+            summary['deferred_audio_key'] = archive['filename']
+        else:
+            print(f"Could not archive audio for deferred features of {recording_id}: {archive['error']}")
+
+    if 'processing_profile' in features_result:
+        add_stages(features_result['processing_profile'], profiler)
+    else:
+        # Feature cache hit: nothing ran in the pool
+        features_result['processing_profile'] = processing_profile(
+            profiler, feature_cache_hit=True, tier=tier, file_bytes=len(audio_data),
+            task_type=request_info.get('task_metadata', {}).get('task_type', 'speech'),
+            format=os.path.splitext(filename)[1].lower().lstrip('.') or 'unknown')
+
+    outcome = ('cache_hit' if summary.get('feature_cache_hit') else 'success') \
+        if summary.get('processing_successful') else 'failed'
+    metrics.record_processing_profile(features_result['processing_profile'], outcome)
+    return features_result
+
+
+def save_features(recording_id, features_result, questionnaire_result):
+    """
+    Store a successful extraction with its processing_profile as a separate attribute.
+    The write's own latency cannot go into the item it writes, so it is logged instead.
+    """
+    import time
+    from utils.database import save_voice_donation_features
+
+    profile = features_result.pop('processing_profile', None)
+    start = time.perf_counter()
+    db_result = save_voice_donation_features(
+        recording_id=recording_id,
+        audio_features=features_result,
+        questionnaire_data=questionnaire_result['data'],
+        metadata=features_result['metadata'],
+        feature_source_recording_id=features_result['summary'].get('feature_source_recording_id'),
+        processing_profile=profile
+    )
+    print(f"Saved features for {recording_id} in {time.perf_counter() - start:.3f}s: {db_result['success']}")
+    return db_result
+
+
+def save_initial_record(payload, audio_size):
+    """Initial 'processing' record of a queued recording; returns the write's duration in seconds"""
+    import time
+    from utils.database import save_initial_voice_donation
+
+    start = time.perf_counter()
+    save_initial_voice_donation(
+        recording_id=payload['recording_id'],
+        questionnaire_data=payload['questionnaire_result']['data'],
+        audio_filename=payload['filename'],
+        audio_size=audio_size,
+        request_info=payload['request_info']
+    )
+    return time.perf_counter() - start
 
-        memory_end = check_memory_usage()
-        print(f"Memory at end: {memory_end:.1f} MB")
 
+def process_recording(job, payload, initial_write_s):
+    """
+    Extract and store the features of one queued recording; returns 'completed' or
+    'failed'. Raises on errors worth retrying (timeouts, database failures); an
+    upload that cannot be analysed is marked failed right away.
+    """
+    from utils.profiling import StageProfiler
 
-def process_audio_background(recording_id, audio_data, filename, questionnaire_result, request_info):
-    """Background audio processing with memory limits"""
+    recording_id = payload['recording_id']
+    print(f"Starting audio processing for {recording_id} (attempt {job.attempts})")
+    memory_before = check_memory_usage()
+    print(f"Memory before processing: {memory_before:.1f} MB")
 
-    # ACQUIRE SEMAPHORE - Wait if too many processing
-    processing_semaphore.acquire()
+    profiler = StageProfiler()
+    profiler.add('db_initial_write', initial_write_s)
+    profiler.add('job_queue_wait', max(0.0, job.leased_at - job.created_at))
 
     try:
-        print(f"Starting audio processing for {recording_id}")
-        memory_before = check_memory_usage()
-        print(f"Memory before processing: {memory_before:.1f} MB")
-
-        # MEMORY CHECK - Don't start if already high
-        if memory_before > 700:  # 700MB threshold
-            print(f"Memory too high ({memory_before:.1f}MB), delaying processing")
-            import time
-            time.sleep(5)  # Wait 5 seconds
-
-        from utils.feature_extraction import extract_all_features
-        features_result = extract_all_features(audio_data, filename, request_info)
+        with job.map_audio() as audio_data:
+            features_result = extract_features(recording_id, audio_data, payload['filename'],
+                                               payload['request_info'], profiler, audio_path=job.audio_path,
+                                               cost=payload.get('cost'))
 
         memory_after = check_memory_usage()
         print(f"Memory after processing: {memory_after:.1f} MB")
 
         if features_result.get('summary', {}).get('processing_successful', False):
-            from utils.database import save_voice_donation_features
-            db_result = save_voice_donation_features(
-                recording_id=recording_id,
-                audio_features=features_result,
-                questionnaire_data=questionnaire_result['data'],
-                metadata=features_result['metadata']
-            )
-            print(f"Processing completed for {recording_id}: {db_result['success']}")
-        else:
-            print(f"Feature extraction failed for {recording_id}")
+            db_result = save_features(recording_id, features_result, payload['questionnaire_result'])
+            if not db_result['success']:
+                raise RuntimeError(f"Saving features failed: {db_result['error']}")
+            print(f"Processing completed for {recording_id}")
+            return 'completed'
 
-    except Exception as e:
-        print(f"Audio processing error for {recording_id}: {e}")
-
-        # UPDATE DATABASE WITH ERROR
-        try:
-            from utils.database import update_voice_donation_status
-            update_voice_donation_status(recording_id, 'failed', str(e))
-        except:
-            pass
+        print(f"Feature extraction failed for {recording_id}")
+        from utils.database import update_voice_donation_status
+        update_voice_donation_status(recording_id, 'failed', features_result.get('processing_error'))
+        return 'failed'
 
     finally:
-        # ALWAYS RELEASE SEMAPHORE
-        processing_semaphore.release()
-
         # FORCE CLEANUP
         import gc
         gc.collect()
@@ -489,6 +740,73 @@ def process_audio_background(recording_id, audio_data, filename, questionnaire_r
         print(f"Final memory after cleanup: {memory_final:.1f} MB")
 
 
+def run_recording_job(job):
+    """
+    Job handler for one recording: a single-task upload or one task of a donation, queued
+    on arrival (pipelined mode) or fanned out by its donation job (its initial record
+    was written before it was queued)
+    """
+    outcome = process_recording(job, job.payload, job.payload.get('initial_write_s', 0.0))
+    if job.group_key:
+        finish_donation_task(job.group_key, job.group_seq, outcome)
+
+
+def run_donation_job(job):
+    """
+    Job handler for a multi-task donation in batch mode: fans its held tasks out as
+    independent recording jobs, so they are extracted in parallel across the workers
+    and joined again by finish_donation_task when the last one has a result.
+    """
+    queue = get_job_queue()
+    donation_id = job.payload['donation_id']
+    tasks = queue.held_jobs(donation_id)
+    print(f"Background processing started: {donation_id} ({len(tasks)} tasks, attempt {job.attempts})")
+
+    # The only ordering the database needs: each task's 'processing' record is written before
+    # its features update. Writing them all up front also lets the donation status show every task.
+    for task in tasks:
+        task.payload['initial_write_s'] = save_initial_record(task.payload, os.path.getsize(task.audio_path))
+
+    queue.release_held(tasks, 'recording')
+    job_workers.notify(len(tasks))
+    print(f"Queued {len(tasks)} tasks of donation {donation_id}")
+
+
+def recording_job_dead(job, error):
+    from utils.database import update_voice_donation_status
+    update_voice_donation_status(job.payload['recording_id'], 'failed', error)
+    if job.group_key:
+        finish_donation_task(job.group_key, job.group_seq, 'failed')
+
+
+def donation_job_dead(job, error):
+    """Mark the tasks that never got queued as failed; their audio stays held for a manual requeue"""
+    from utils.database import update_voice_donation_status
+    donation_id = job.payload['donation_id']
+    for task in get_job_queue().held_jobs(donation_id):
+        update_voice_donation_status(task.payload['recording_id'], 'failed', error)
+        finish_donation_task(donation_id, task.group_seq, 'failed')
+
+
+def start_job_workers():
+    """Start the threads that work through the job queue, resuming jobs left by the last run"""
+    global job_workers
+    import atexit
+
+    get_extraction_executor()  # Created first so its atexit shutdown runs after the queue has drained
+    job_workers = JobWorkers(get_job_queue(), {
+        'recording': JobHandler(run_recording_job, on_dead=recording_job_dead),
+        'donation': JobHandler(run_donation_job, on_dead=donation_job_dead),
+    }, workers=config.JOB_QUEUE_WORKERS, drain_seconds=config.JOB_DRAIN_SECONDS,
+        retention_seconds=config.JOB_RETENTION_HOURS * 3600, class_limits=config.JOB_CLASS_LIMITS,
+        latency_window_seconds=config.JOB_LATENCY_WINDOW_SECONDS)
+    job_workers.every(config.DONATION_REAP_SECONDS, reap_abandoned_donations)
+    job_workers.start()
+    atexit.register(job_workers.stop)
+    if threading.current_thread() is threading.main_thread():
+        job_workers.install_signal_handlers()
+
+
 # Dashboard
 @app.route('/dashboard')
 def dashboard():
@@ -817,6 +1135,10 @@ def test_validation():
 
 print("All routes configured")
 
+# Process uploads only where they can be stored (and never in extraction worker processes)
+if aws_connected:
+    start_job_workers()
+
 if __name__ == '__main__':
     # Force port 5000 to match Railway networking config
     port = 5000
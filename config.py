@@ -0,0 +1,137 @@
+# config.py - Runtime settings for the voice donation API (override with environment variables)
+
+import os
+
+
+def available_cpu_count():
+    """CPU cores this process may run on (respects container CPU affinity)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# Feature extraction executor: 'process' (process pool, one core per worker) or 'thread' (in-process)
+EXTRACTION_EXECUTOR = os.getenv('EXTRACTION_EXECUTOR', 'process')
+
+# Number of extraction workers (defaults to one per available CPU core)
+EXTRACTION_WORKERS = int(os.getenv('EXTRACTION_WORKERS', available_cpu_count()))
+
+# Recycle a worker process after this many jobs to stop heap fragmentation growth (0 = never)
+EXTRACTION_MAX_TASKS_PER_CHILD = int(os.getenv('EXTRACTION_MAX_TASKS_PER_CHILD', 20))
+
+# Per-job time limit in seconds
+EXTRACTION_JOB_TIMEOUT = int(os.getenv('EXTRACTION_JOB_TIMEOUT', 300))
+
+# Analysis sample rates: spectral (librosa) features run at this rate or the native rate if lower;
+# Praat measures always use the native rate
+SPECTRAL_SAMPLE_RATE = int(os.getenv('SPECTRAL_SAMPLE_RATE', 22050))
+
+# WebRTC VAD only accepts 8/16/32/48 kHz; other recordings are resampled to this rate
+VAD_SAMPLE_RATE = int(os.getenv('VAD_SAMPLE_RATE', 16000))
+
+# Feature-result cache: entries kept in memory (LRU) and optional directory for a persistent tier
+FEATURE_CACHE_SIZE = int(os.getenv('FEATURE_CACHE_SIZE', 256))
+FEATURE_CACHE_DIR = os.getenv('FEATURE_CACHE_DIR', '')
+
+# Accepted recording length in seconds: uploads outside it are rejected from their container header
+AUDIO_MIN_SECONDS = float(os.getenv('AUDIO_MIN_SECONDS', 1))
+AUDIO_MAX_SECONDS = float(os.getenv('AUDIO_MAX_SECONDS', 300))
+
+# ffmpeg binary that decodes WebM and MP4 uploads
+FFMPEG_PATH = os.getenv('FFMPEG_PATH', 'ffmpeg')
+
+# Recordings longer than this (seconds) get spectral features from the bounded-memory streaming
+# path (roughly 2x the CPU time, flat memory); shorter ones use the batch path.
+STREAMING_MIN_SECONDS = float(os.getenv('STREAMING_MIN_SECONDS', 120))
+STREAMING_BLOCK_SECONDS = float(os.getenv('STREAMING_BLOCK_SECONDS', 10))
+
+# Praat voice-quality measures: 'batched' (one Praat script run per recording) or 'per_call'
+# (one parselmouth call per measure; the reference implementation)
+PRAAT_MEASUREMENTS = os.getenv('PRAAT_MEASUREMENTS', 'batched')
+
+# Pitch/jitter/shimmer/HNR engine: 'praat' (reference, used for audit runs) or 'numpy'
+# (vectorised, several times faster; deviation reported by tools/compare_voice_engines.py)
+VOICE_QUALITY_ENGINE = os.getenv('VOICE_QUALITY_ENGINE', 'praat')
+
+# Extraction tier when a request doesn't ask for one: 'fast' (no tonnetz or tempo), 'standard'
+# (no tempo) or 'full'. Skipped groups are recorded in the summary as deferred.
+EXTRACTION_TIER = os.getenv('EXTRACTION_TIER', 'full')
+
+# Downgrade jobs to a cheaper tier once this many jobs are waiting for a worker (0 = never)
+TIER_DOWNGRADE_QUEUE_DEPTH = {
+    'standard': int(os.getenv('TIER_STANDARD_QUEUE_DEPTH', 4)),
+    'fast': int(os.getenv('TIER_FAST_QUEUE_DEPTH', 12)),
+}
+
+# Upload the audio of recordings with deferred feature groups to S3 so they can be backfilled
+# later (tools/backfill_deferred_features.py)
+ARCHIVE_DEFERRED_AUDIO = os.getenv('ARCHIVE_DEFERRED_AUDIO', 'true').lower() == 'true'
+
+# Admission control (utils/admission.py). Uploads get 429 with Retry-After while the estimated CPU
+# seconds of queued and running extractions would exceed this (0 = never refuse).
+ADMISSION_MAX_BACKLOG_CPU_SECONDS = float(os.getenv('ADMISSION_MAX_BACKLOG_CPU_SECONDS', 900))
+
+# Extractions start only while their estimated peak memory fits the budget: the memory still
+# available minus the reserve, capped at ADMISSION_MEMORY_BUDGET_MB if set (0 = no cap). At most
+# EXTRACTION_WORKERS run at once.
+ADMISSION_MEMORY_BUDGET_MB = float(os.getenv('ADMISSION_MEMORY_BUDGET_MB', 0))
+ADMISSION_MEMORY_RESERVE_MB = float(os.getenv('ADMISSION_MEMORY_RESERVE_MB', 256))
+
+# Fixed memory added to every job's estimate, and the bitrate assumed to estimate the duration of
+# uploads whose header can't be read without decoding (WebM, MP4)
+ADMISSION_JOB_BASE_MB = float(os.getenv('ADMISSION_JOB_BASE_MB', 20))
+ADMISSION_ASSUMED_BITRATE = int(os.getenv('ADMISSION_ASSUMED_BITRATE', 64000))
+
+# /health reports not ready (503) while more extraction jobs than this wait for a worker (0 = never)
+HEALTH_MAX_QUEUE_DEPTH = int(os.getenv('HEALTH_MAX_QUEUE_DEPTH', 20))
+
+# Durable job queue (utils/job_queue.py): SQLite database and spooled audio of queued uploads.
+# Must be on a persistent volume for jobs to survive a redeploy; one app process per directory.
+JOB_QUEUE_DIR = os.getenv('JOB_QUEUE_DIR', 'job-queue')
+
+# Threads that take jobs off the queue (each waits on one extraction at a time)
+JOB_QUEUE_WORKERS = int(os.getenv('JOB_QUEUE_WORKERS', EXTRACTION_WORKERS))
+
+# A leased job is handed to another worker if its lease isn't renewed for this many seconds
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 120))
+
+# Attempts before a job is dead-lettered, and the retry backoff (doubling from base up to max seconds)
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+JOB_RETRY_BASE_SECONDS = float(os.getenv('JOB_RETRY_BASE_SECONDS', 10))
+JOB_RETRY_MAX_SECONDS = float(os.getenv('JOB_RETRY_MAX_SECONDS', 600))
+
+# Shortest-job-first: ready jobs are taken in order of estimated CPU seconds less JOB_AGING_RATE
+# for every second they have waited, so a long job is overtaken for at most cost / rate seconds
+JOB_AGING_RATE = float(os.getenv('JOB_AGING_RATE', 0.5))
+
+# Jobs estimated at up to this many CPU seconds are 'short' (e.g. sustained vowels), the rest 'long'
+SHORT_JOB_MAX_CPU_SECONDS = float(os.getenv('SHORT_JOB_MAX_CPU_SECONDS', 10))
+
+# Jobs of a class that may run at once; by default long jobs leave one worker free for short ones
+JOB_CLASS_LIMITS = {
+    'long': int(os.getenv('LONG_JOB_WORKERS', max(1, JOB_QUEUE_WORKERS - 1))),
+}
+
+# On shutdown, running jobs get this long to finish before they are released for the next start
+JOB_DRAIN_SECONDS = int(os.getenv('JOB_DRAIN_SECONDS', 60))
+
+# Finished jobs are kept this many hours (dead jobs are kept until requeued or removed)
+JOB_RETENTION_HOURS = float(os.getenv('JOB_RETENTION_HOURS', 24))
+
+# Job queue gauges on /metrics, /health, tier selection and upload admission read one snapshot of the
+# queue database taken at most this often, so requests don't query it; job latency percentiles cover
+# the last JOB_LATENCY_WINDOW_SECONDS
+JOB_STATS_SECONDS = float(os.getenv('JOB_STATS_SECONDS', 15))
+JOB_LATENCY_WINDOW_SECONDS = int(os.getenv('JOB_LATENCY_WINDOW_SECONDS', 3600))
+
+# Multi-task donations with no new task for this many hours are abandoned: their tasks are
+# processed as they are ('process') or dropped with their audio ('expire'). Checked every
+# DONATION_REAP_SECONDS.
+DONATION_TTL_HOURS = float(os.getenv('DONATION_TTL_HOURS', 6))
+DONATION_TTL_ACTION = os.getenv('DONATION_TTL_ACTION', 'process')
+DONATION_REAP_SECONDS = int(os.getenv('DONATION_REAP_SECONDS', 300))
+
+# Pipelined donations: extract each task of a multi-task donation as soon as it arrives and
+# track donation completion separately. 'false' holds the tasks until the donation is complete
+# and processes them together.
+PIPELINED_DONATIONS = os.getenv('PIPELINED_DONATIONS', 'true').lower() == 'true'
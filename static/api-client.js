@@ -5,6 +5,9 @@ const API_BASE_URL = window.location.hostname === 'localhost'
     ? 'http://localhost:5000/api'  // ← Fix this port
     : window.location.origin + '/api'; // Production
 
+// Submission attempts while the server reports it is busy (429)
+const MAX_BUSY_RETRIES = 5;
+
 // ENHANCED: New function to collect questionnaire data for multi-task submissions
 function collectEnhancedQuestionnaireData() {
     // Get basic fields
@@ -161,10 +164,20 @@ async function submitSingleTask(formData, taskNum, taskType) {
         const submitUrl = `${API_BASE_URL}/voice-donation`;
         console.log(`Submitting task ${taskNum} (${taskType}) to:`, submitUrl);
 
-        const response = await fetch(submitUrl, {
-            method: 'POST',
-            body: formData
-        });
+        // The server answers 429 with Retry-After while its processing backlog is full
+        let response;
+        for (let attempt = 1; ; attempt++) {
+            response = await fetch(submitUrl, {
+                method: 'POST',
+                body: formData
+            });
+            if (response.status !== 429 || attempt >= MAX_BUSY_RETRIES) {
+                break;
+            }
+            const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 30;
+            console.log(`Server busy, retrying task ${taskNum} in ${retryAfter}s`);
+            await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+        }
 
         const responseText = await response.text();
 
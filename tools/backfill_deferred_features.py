@@ -0,0 +1,93 @@
+# backfill_deferred_features.py - Compute feature groups a cheaper extraction tier deferred
+#
+# Recordings extracted at the 'fast' or 'standard' tier list the skipped groups in
+# summary.deferred_feature_groups and, with ARCHIVE_DEFERRED_AUDIO, keep their audio in S3
+# (summary.deferred_audio_key). This fetches that audio, runs only the deferred groups and
+# merges the features into the record.
+#
+# Run from the repository root:
+#   python -m tools.backfill_deferred_features --dry-run
+#   python -m tools.backfill_deferred_features --recording-id <id> --recording-id <id>
+#   python -m tools.backfill_deferred_features --limit 100
+
+import argparse
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.aws_helpers import download_audio_file
+from utils.database import get_dynamodb_resource, get_voice_donation, save_deferred_features
+from utils.feature_extraction import extract_deferred_features
+
+
+def deferred_records(table):
+    """Completed records that still have deferred feature groups and archived audio"""
+    response = table.scan()
+    while True:
+        for item in response['Items']:
+            summary = item.get('audio_features', {}).get('summary', {})
+            if summary.get('deferred_feature_groups') and summary.get('deferred_audio_key'):
+                yield item
+        if 'LastEvaluatedKey' not in response:
+            break
+        response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+
+
+def backfill_record(item, dry_run=False):
+    """Run the deferred groups of one record; returns True when its features were saved"""
+    recording_id = item['recording_id']
+    summary = item['audio_features']['summary']
+    groups = list(summary['deferred_feature_groups'])
+    filename = item.get('audio_info', {}).get('filename', summary['deferred_audio_key'])
+
+    print(f"{recording_id}: {', '.join(groups)} from {summary['deferred_audio_key']}")
+    if dry_run:
+        return False
+
+    audio_data = download_audio_file(summary['deferred_audio_key'])
+    deferred_features = extract_deferred_features(audio_data, filename, groups)
+    result = save_deferred_features(recording_id, deferred_features)
+    if not result['success']:
+        print(f"  Save failed: {result['error']}")
+    return result['success']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute deferred feature groups from archived audio')
+    parser.add_argument('--recording-id', action='append', default=[], help='Only these recordings (repeatable)')
+    parser.add_argument('--limit', type=int, help='Stop after this many recordings')
+    parser.add_argument('--dry-run', action='store_true', help='List what would be computed')
+    args = parser.parse_args()
+
+    if args.recording_id:
+        items = []
+        for recording_id in args.recording_id:
+            record = get_voice_donation(recording_id)
+            if record['success']:
+                items.append(record['data'])
+            else:
+                print(f"{recording_id}: {record['error']}")
+    else:
+        items = deferred_records(get_dynamodb_resource().Table('voice-donations'))
+
+    start = time.perf_counter()
+    processed = saved = 0
+    for item in items:
+        if args.limit is not None and processed >= args.limit:
+            break
+        if not item.get('audio_features', {}).get('summary', {}).get('deferred_audio_key'):
+            print(f"{item['recording_id']}: no archived audio for deferred groups")
+            continue
+        processed += 1
+        try:
+            saved += backfill_record(item, dry_run=args.dry_run)
+        except Exception as e:
+            print(f"  Backfill failed: {e}")
+
+    print(f"{saved}/{processed} recordings backfilled in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
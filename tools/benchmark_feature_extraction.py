@@ -0,0 +1,378 @@
+# benchmark_feature_extraction.py - Timing and equivalence checks for the feature pipeline
+#
+# Run from the repository root:
+#   python -m tools.benchmark_feature_extraction
+#   python -m tools.benchmark_feature_extraction --durations 10 30 60 --repeats 3
+#   python -m tools.benchmark_feature_extraction --durations 10 --streaming-durations 60 300
+#   python -m tools.benchmark_feature_extraction --durations 10 --phonation-durations 30 --streaming-durations
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import librosa
+import parselmouth
+import scipy.signal
+
+import config
+from utils import feature_extraction as fx
+from utils.audio_buffer import AudioBuffer
+from utils.feature_extraction import extract_librosa_features, extract_phonation_duration_analysis, spectral_view
+from utils.feature_registry import get_extraction_plan
+from utils.spectral_context import SpectralContext
+from utils.streaming_features import ArraySource, extract_librosa_features_streaming
+
+
+def synthetic_speech(duration, sr=44100, seed=0):
+    """Deterministic speech-like signal: AM/FM harmonic tone with syllable-rate pauses"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * sr)) / sr
+
+    # Slowly wandering fundamental (100-180 Hz) with a few harmonics
+    f0 = 140 + 40 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    y = sum(np.sin(k * phase) / k for k in range(1, 6))
+
+    # Syllable-rate envelope (~4 Hz) gated into words and pauses
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t))
+    envelope *= (np.sin(2 * np.pi * 0.5 * t) > -0.3)
+
+    y = 0.3 * envelope * y + 0.005 * rng.standard_normal(len(t))
+    return y.astype(np.float32), sr
+
+
+def synthetic_vowel(duration, f0=200, sr=44100, jitter=0.005, seed=0):
+    """Deterministic sustained vowel: glottal pulse train with cycle-to-cycle jitter through formant-like resonances"""
+    rng = np.random.default_rng(seed)
+    n = int(duration * sr)
+
+    # Pulse train with jittered periods
+    periods = (1 + jitter * rng.standard_normal(int(duration * f0 * 1.1) + 1)) / f0
+    pulse_positions = (np.cumsum(periods) * sr).astype(int)
+    source = np.zeros(n)
+    source[pulse_positions[pulse_positions < n]] = 1.0
+
+    # /a/-like formants (F1 700 Hz, F2 1220 Hz, F3 2600 Hz) as second-order resonators
+    y = source
+    for formant, bandwidth in ((700, 130), (1220, 70), (2600, 160)):
+        r = np.exp(-np.pi * bandwidth / sr)
+        theta = 2 * np.pi * formant / sr
+        y = scipy.signal.lfilter([1 - r], [1, -2 * r * np.cos(theta), r * r], y)
+
+    y = 0.5 * y / np.max(np.abs(y)) + 0.001 * rng.standard_normal(n)
+    return y.astype(np.float32), sr
+
+
+def reference_phonation_analysis(sound, pitch):
+    """Original per-pulse voice-break loop (two Praat calls per pulse); kept for equivalence checks"""
+    point_process = parselmouth.praat.call([sound, pitch], "To PointProcess (cc)")
+    n_pulses = parselmouth.praat.call(point_process, "Get number of points")
+
+    voice_breaks_duration = 0
+    for i in range(1, n_pulses):
+        period = parselmouth.praat.call(point_process, "Get time from index", i + 1) - \
+                 parselmouth.praat.call(point_process, "Get time from index", i)
+        if period > 0.02:
+            voice_breaks_duration += period
+
+    return {'number_of_pulses': n_pulses, 'voice_breaks_duration': voice_breaks_duration}
+
+
+def bulk_phonation_analysis(audio, pitch):
+    """extract_phonation_duration_analysis with the point process built in the call, as the reference does"""
+    point_process = parselmouth.praat.call([audio.sound, pitch], "To PointProcess (cc)")
+    return extract_phonation_duration_analysis(audio, point_process)
+
+
+def reference_librosa_features(y, sr):
+    """Original per-feature librosa path (each call recomputes its own STFT); kept for equivalence checks"""
+    features = {}
+
+    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+    features['mfcc_mean'] = np.mean(mfcc, axis=1)
+    features['mfcc_std'] = np.std(mfcc, axis=1)
+
+    chroma = librosa.feature.chroma_stft(y=y, sr=sr)
+    features['chroma_mean'] = np.mean(chroma, axis=1)
+    features['chroma_std'] = np.std(chroma, axis=1)
+
+    contrast = librosa.feature.spectral_contrast(y=y, sr=sr)
+    features['spectral_contrast_mean'] = np.mean(contrast, axis=1)
+    features['spectral_contrast_std'] = np.std(contrast, axis=1)
+
+    y_harmonic = librosa.effects.harmonic(y)
+    tonnetz = librosa.feature.tonnetz(y=y_harmonic, sr=sr)
+    features['tonnetz_mean'] = np.mean(tonnetz, axis=1)
+    features['tonnetz_std'] = np.std(tonnetz, axis=1)
+
+    features['spectral_centroid'] = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
+    features['spectral_bandwidth'] = np.mean(librosa.feature.spectral_bandwidth(y=y, sr=sr))
+    features['spectral_rolloff'] = np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr))
+    features['zero_crossing_rate'] = np.mean(librosa.feature.zero_crossing_rate(y))
+
+    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+    features['tempo'] = tempo
+
+    features['rms_energy'] = np.mean(librosa.feature.rms(y=y))
+
+    mel_spectrogram = librosa.feature.melspectrogram(y=y, sr=sr)
+    features['mel_spectrogram_mean'] = np.mean(mel_spectrogram, axis=1)
+
+    return features
+
+
+def reference_stft_features(y, sr):
+    """STFT-derived subset of the reference path (one STFT or mel spectrogram per call)"""
+    librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+    librosa.feature.chroma_stft(y=y, sr=sr)
+    librosa.feature.spectral_contrast(y=y, sr=sr)
+    librosa.feature.spectral_centroid(y=y, sr=sr)
+    librosa.feature.spectral_bandwidth(y=y, sr=sr)
+    librosa.feature.spectral_rolloff(y=y, sr=sr)
+    librosa.feature.melspectrogram(y=y, sr=sr)
+    librosa.onset.onset_strength(y=y, sr=sr, aggregate=np.median)
+
+
+def shared_stft_features(y, sr):
+    """Same subset as reference_stft_features, fed from one SpectralContext"""
+    spectral = SpectralContext(y, sr)
+    librosa.feature.mfcc(S=spectral.log_mel, n_mfcc=13)
+    librosa.feature.chroma_stft(S=spectral.power, sr=sr)
+    librosa.feature.spectral_contrast(S=spectral.magnitude, sr=sr)
+    librosa.feature.spectral_centroid(S=spectral.magnitude, sr=sr)
+    librosa.feature.spectral_bandwidth(S=spectral.magnitude, sr=sr)
+    librosa.feature.spectral_rolloff(S=spectral.magnitude, sr=sr)
+    np.mean(spectral.mel_power, axis=1)
+    librosa.onset.onset_strength(S=spectral.log_mel, sr=sr, aggregate=np.median)
+
+
+def max_relative_difference(reference, candidate):
+    """Largest relative difference per feature between two feature dicts"""
+    differences = {}
+    for key, ref_value in reference.items():
+        ref_value = np.atleast_1d(np.asarray(ref_value, dtype=float))
+        value = np.atleast_1d(np.asarray(candidate[key], dtype=float))
+        scale = np.maximum(np.abs(ref_value), 1e-9)
+        differences[key] = float(np.max(np.abs(ref_value - value) / scale))
+    return differences
+
+
+def time_call(func, repeats, *args, **kwargs):
+    """Best-of-N wall time in seconds and the last result"""
+    best = float('inf')
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def benchmark_librosa_features(durations, repeats, tolerance):
+    """
+    Compare extract_librosa_features (shared SpectralContext at SPECTRAL_SAMPLE_RATE)
+    against the per-feature reference path at the native 44.1kHz rate.
+    Equivalence is checked against the reference run on the same resampled view.
+    """
+    print("\n=== extract_librosa_features: shared SpectralContext vs per-feature STFT ===")
+    print(f"{'duration':>9} {'ref@44.1k':>10} {'shared':>10} {'speedup':>8} {'stft-only':>10} {'max rel diff':>13}")
+
+    # Warm up numba-compiled librosa kernels so the first duration is not penalised
+    y, sr = synthetic_speech(2)
+    reference_librosa_features(y, sr)
+    extract_librosa_features(AudioBuffer(y, sr))
+
+    all_ok = True
+    for duration in durations:
+        y, sr = synthetic_speech(duration)
+        ref_time, _ = time_call(reference_librosa_features, repeats, y, sr)
+        new_time, new_features = time_call(lambda: extract_librosa_features(AudioBuffer(y, sr)), repeats)
+
+        view = spectral_view(AudioBuffer(y, sr))
+        ref_features = reference_librosa_features(view.samples, view.sr)
+        stft_ref_time, _ = time_call(reference_stft_features, repeats, view.samples, view.sr)
+        stft_new_time, _ = time_call(shared_stft_features, repeats, view.samples, view.sr)
+
+        differences = max_relative_difference(ref_features, new_features)
+        worst_key = max(differences, key=differences.get)
+        ok = differences[worst_key] <= tolerance
+        all_ok = all_ok and ok
+
+        print(f"{duration:>8}s {ref_time:>9.2f}s {new_time:>9.2f}s {ref_time / new_time:>7.2f}x "
+              f"{stft_ref_time / stft_new_time:>9.2f}x "
+              f"{differences[worst_key]:>12.2e} ({worst_key}){'' if ok else '  <-- OUT OF TOLERANCE'}")
+
+    print(f"shared: analysis at {view.sr}Hz including resampling; "
+          "stft-only: STFT-derived features alone at the same rate")
+    return all_ok
+
+
+def benchmark_phonation_analysis(durations, repeats, tolerance):
+    """
+    Compare extract_phonation_duration_analysis (bulk pulse times) against the
+    per-pulse reference loop on a synthetic sustained vowel, and show the effect
+    on the whole maximum_phonation_time plan.
+    """
+    print("\n=== extract_phonation_duration_analysis: bulk pulse times vs per-pulse calls ===")
+    print(f"{'duration':>9} {'pulses':>7} {'per-pulse':>10} {'bulk':>8} {'speedup':>8} "
+          f"{'MPT plan':>9} {'saved':>6} {'max rel diff':>13}")
+
+    plan = get_extraction_plan('maximum_phonation_time')
+    all_ok = True
+    for duration in durations:
+        y, sr = synthetic_vowel(duration)
+        audio = AudioBuffer(y, sr)
+        pitch = audio.sound.to_pitch()
+
+        ref_time, ref_features = time_call(reference_phonation_analysis, repeats, audio.sound, pitch)
+        new_time, new_features = time_call(bulk_phonation_analysis, repeats, audio, pitch)
+        plan_time, _ = time_call(plan.run, 1, audio)
+
+        differences = max_relative_difference(
+            ref_features, {key: new_features[key] for key in ref_features})
+        worst_key = max(differences, key=differences.get)
+        ok = differences[worst_key] <= tolerance
+        all_ok = all_ok and ok
+
+        print(f"{duration:>8}s {new_features['number_of_pulses']:>7} {ref_time:>9.3f}s {new_time:>7.3f}s "
+              f"{ref_time / new_time:>7.1f}x {plan_time:>8.2f}s {(ref_time - new_time) / (plan_time + ref_time - new_time):>5.0%} "
+              f"{differences[worst_key]:>12.2e} ({worst_key}){'' if ok else '  <-- OUT OF TOLERANCE'}")
+
+    print("saved: share of the MPT plan's wall time the per-pulse loop would have added")
+    return all_ok
+
+
+def per_call_praat_measures(audio):
+    """Voice-quality measures through the per-call reference extractors"""
+    praat = audio.praat
+    return {
+        **fx.extract_intensity_features(audio, praat.intensity),
+        **fx.extract_intensity_range_features(audio, praat.intensity),
+        **fx.extract_jitter_features(audio, praat.point_process),
+        **fx.extract_jitter_ppq5_features(audio, praat.point_process),
+        **fx.extract_shimmer_features(audio, praat.point_process),
+        **fx.extract_shimmer_apq5_features(audio, praat.point_process),
+        **fx.extract_hnr_features(audio),
+        **fx.extract_formant_features(audio, praat.formant),
+    }
+
+
+def batched_praat_measures(audio):
+    """Voice-quality measures from one Praat script run (measurement cache cleared first)"""
+    audio.praat.release('measurements')
+    return audio.praat.measurement_dict()
+
+
+def benchmark_praat_measurements(durations, repeats, tolerance):
+    """
+    Compare the batched Praat measurement script against the per-call reference
+    path on the same (pre-built) Praat objects, so only the measurement step is timed.
+    """
+    print("\n=== Praat voice-quality measures: batched script vs per-call ===")
+    print(f"{'signal':>7} {'duration':>9} {'per-call':>9} {'batched':>9} {'speedup':>8} {'max rel diff':>13}")
+
+    original_mode = config.PRAAT_MEASUREMENTS
+    all_ok = True
+    try:
+        for duration in durations:
+            for name, (y, sr) in (('vowel', synthetic_vowel(duration)), ('speech', synthetic_speech(duration))):
+                audio = AudioBuffer(y, sr)
+                praat = audio.praat
+                praat.pitch, praat.point_process, praat.intensity, praat.harmonicity, praat.formant  # Build once
+
+                config.PRAAT_MEASUREMENTS = 'per_call'
+                ref_time, ref_features = time_call(per_call_praat_measures, repeats, audio)
+                new_time, new_features = time_call(batched_praat_measures, repeats, audio)
+
+                differences = max_relative_difference(ref_features, new_features)
+                worst_key = max(differences, key=differences.get)
+                ok = differences[worst_key] <= tolerance
+                all_ok = all_ok and ok
+
+                print(f"{name:>7} {duration:>8}s {ref_time * 1000:>7.1f}ms {new_time * 1000:>7.1f}ms "
+                      f"{ref_time / new_time:>7.1f}x {differences[worst_key]:>12.2e} ({worst_key})"
+                      f"{'' if ok else '  <-- OUT OF TOLERANCE'}")
+    finally:
+        config.PRAAT_MEASUREMENTS = original_mode
+
+    return all_ok
+
+
+def peak_traced_memory(func, *args, **kwargs):
+    """Wall time, peak Python-allocated memory in bytes (tracemalloc) and the result of one call"""
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def benchmark_streaming_features(durations, block_seconds, tolerance):
+    """
+    Compare the block-wise streaming path against the batch SpectralContext path
+    on the same spectral view: values, time and peak traced memory. The input
+    signal itself is allocated before tracing starts, so the peak is the
+    extraction's own working memory.
+    """
+    print(f"\n=== Streaming ({block_seconds:g}s blocks) vs batch librosa features ===")
+    print(f"{'duration':>9} {'batch':>8} {'peak':>8} {'stream':>8} {'peak':>8} {'max rel diff':>13}")
+
+    all_ok = True
+    for duration in durations:
+        y, sr = synthetic_speech(duration)
+        view = spectral_view(AudioBuffer(y, sr))
+
+        batch_time, batch_peak, batch_features = peak_traced_memory(
+            extract_librosa_features, view, spectral=SpectralContext(view.samples, view.sr))
+        stream_time, stream_peak, stream_features = peak_traced_memory(
+            extract_librosa_features_streaming, ArraySource(view.samples, view.sr), block_seconds=block_seconds)
+
+        differences = max_relative_difference(batch_features, stream_features)
+        worst_key = max(differences, key=differences.get)
+        ok = differences[worst_key] <= tolerance
+        all_ok = all_ok and ok
+
+        print(f"{duration:>8}s {batch_time:>7.2f}s {batch_peak / 1e6:>6.0f}MB {stream_time:>7.2f}s "
+              f"{stream_peak / 1e6:>6.0f}MB {differences[worst_key]:>12.2e} ({worst_key})"
+              f"{'' if ok else '  <-- OUT OF TOLERANCE'}")
+
+    return all_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the voice feature extraction pipeline")
+    parser.add_argument('--durations', type=float, nargs='+', default=[10, 30, 60],
+                        help="Synthetic recording durations in seconds")
+    parser.add_argument('--repeats', type=int, default=2, help="Best-of-N timing repeats")
+    parser.add_argument('--tolerance', type=float, default=1e-4,
+                        help="Maximum allowed relative difference against the reference path")
+    parser.add_argument('--phonation-durations', type=float, nargs='*', default=[10, 30],
+                        help="Sustained-vowel durations for the phonation analysis comparison (none to skip)")
+    parser.add_argument('--praat-durations', type=float, nargs='*', default=[10, 30],
+                        help="Durations for the batched vs per-call Praat measurement comparison (none to skip)")
+    parser.add_argument('--streaming-durations', type=float, nargs='*', default=[30, 120],
+                        help="Durations for the streaming vs batch comparison (none to skip)")
+    parser.add_argument('--block-seconds', type=float, default=10, help="Streaming block length in seconds")
+    parser.add_argument('--streaming-tolerance', type=float, default=1e-3,
+                        help="Maximum allowed relative difference between streaming and batch values "
+                             "(tonnetz components near zero differ by ~1e-4 relative)")
+    args = parser.parse_args()
+
+    ok = benchmark_librosa_features(args.durations, args.repeats, args.tolerance)
+    if args.phonation_durations:
+        ok = benchmark_phonation_analysis(args.phonation_durations, args.repeats, args.tolerance) and ok
+    if args.praat_durations:
+        ok = benchmark_praat_measurements(args.praat_durations, args.repeats, args.tolerance) and ok
+    if args.streaming_durations:
+        ok = benchmark_streaming_features(args.streaming_durations, args.block_seconds,
+                                          args.streaming_tolerance) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
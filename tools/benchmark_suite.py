@@ -0,0 +1,309 @@
+# benchmark_suite.py - Stage timings and memory of extract_all_features on synthetic recordings
+#
+# Every case (signal x format x duration) runs in a fresh process, so peak RSS belongs to
+# that case alone. After a warm-up run, each case is timed `--repeats` times (median per
+# stage) and run once more under tracemalloc for per-stage allocation peaks (tracing slows
+# it down, so those timings are not used).
+#
+# Run from the repository root:
+#   python -m tools.benchmark_suite run --output benchmark.json
+#   python -m tools.benchmark_suite run --signals vowel speech --formats wav --durations 10 --output current.json
+#   python -m tools.benchmark_suite compare baseline.json current.json
+#   python -m tools.benchmark_suite compare baseline.json current.json --budgets tools/benchmark_budgets.json
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import soundfile as sf
+
+import config
+
+SIGNALS = ('vowel', 'speech', 'silence', 'clipped')
+FORMATS = ('wav', 'webm', 'ogg')
+SAMPLE_RATE = 44100
+
+# Task type each signal is extracted as (vowels are maximum phonation time recordings)
+SIGNAL_TASK_TYPES = {
+    'vowel': 'maximum_phonation_time',
+    'speech': 'picture_description',
+    'silence': 'picture_description',
+    'clipped': 'picture_description',
+}
+
+# Feature groups are reported individually and summed into a stage by their analysis view
+VIEW_STAGES = {'spectral': 'librosa', 'native': 'voice_quality', 'vad': 'vad'}
+
+DEFAULT_BUDGETS = os.path.join(os.path.dirname(__file__), 'benchmark_budgets.json')
+
+
+# --- Synthetic inputs ---------------------------------------------------------
+
+def synthetic_signal(signal, duration, seed=0):
+    """Deterministic mono float32 samples at SAMPLE_RATE"""
+    from tools.benchmark_feature_extraction import synthetic_speech, synthetic_vowel
+
+    if signal == 'vowel':
+        return synthetic_vowel(duration, f0=180, sr=SAMPLE_RATE, jitter=0.01, seed=seed)[0]
+    if signal == 'speech':
+        return synthetic_speech(duration, sr=SAMPLE_RATE, seed=seed)[0]
+    if signal == 'silence':
+        return np.zeros(int(duration * SAMPLE_RATE), dtype=np.float32)
+    if signal == 'clipped':
+        # Speech driven 12 dB too hot into a hard limiter
+        y = synthetic_speech(duration, sr=SAMPLE_RATE, seed=seed)[0]
+        return np.clip(4 * y, -0.99, 0.99).astype(np.float32)
+    raise ValueError(f"Unknown signal '{signal}'")
+
+
+def encode(y, audio_format):
+    """File bytes of the samples in the given container (WebM/Opus and OGG/Vorbis through ffmpeg)"""
+    buffer = io.BytesIO()
+    sf.write(buffer, y, SAMPLE_RATE, format='WAV', subtype='PCM_16')
+    if audio_format == 'wav':
+        return buffer.getvalue()
+
+    codec = {'webm': 'libopus', 'ogg': 'libvorbis'}[audio_format]
+    result = subprocess.run(
+        ['ffmpeg', '-v', 'error', '-f', 'wav', '-i', 'pipe:0', '-c:a', codec, '-f', audio_format, 'pipe:1'],
+        input=buffer.getvalue(), capture_output=True, check=True
+    )
+    return result.stdout
+
+
+# --- One case (runs in its own process) ---------------------------------------
+
+def run_case(case, repeats):
+    """Stage timings and memory for one synthetic recording"""
+    import tracemalloc
+    from utils.dynamodb_helper import prepare_for_dynamodb
+    from utils.feature_extraction import extract_all_features
+    from utils.feature_registry import FEATURE_GROUPS
+    from utils.profiling import StageProfiler, max_rss_bytes
+
+    audio_data = encode(synthetic_signal(case['signal'], case['duration']), case['format'])
+    filename = f"benchmark.{case['format']}"
+    request_info = {'task_metadata': {'task_type': case['task_type']}}
+    baseline_rss = max_rss_bytes()
+
+    def profiled_run():
+        profiler = StageProfiler()
+        with profiler.stage('total'):
+            result = extract_all_features(audio_data, filename, request_info, profiler=profiler)
+            with profiler.stage('db_serialize'):
+                prepare_for_dynamodb(result)
+        if not result['summary'].get('processing_successful'):
+            raise RuntimeError(result.get('processing_error', 'extraction failed'))
+        return profiler.as_dict(), result
+
+    # Output is silenced so the report stays readable; the first run warms lazy imports and caches
+    with open(os.devnull, 'w') as devnull:
+        stdout, stderr, sys.stdout, sys.stderr = sys.stdout, sys.stderr, devnull, devnull
+        try:
+            profiled_run()
+            runs = [profiled_run() for _ in range(repeats)]
+            tracemalloc.start()
+            traced, _ = profiled_run()
+            tracemalloc.stop()
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+    result = runs[-1][1]
+    groups = {}
+    stages = {}
+    for name in runs[0][0]:
+        seconds = statistics.median(run[name]['seconds'] for run, _ in runs)
+        cpu_seconds = statistics.median(run[name]['cpu_seconds'] for run, _ in runs)
+        entry = {'seconds': seconds, 'cpu_seconds': cpu_seconds,
+                 'peak_traced_bytes': traced.get(name, {}).get('peak_traced_bytes', 0)}
+        if name in FEATURE_GROUPS:
+            groups[name] = entry
+            stage = stages.setdefault(VIEW_STAGES[FEATURE_GROUPS[name].view],
+                                      {'seconds': 0.0, 'cpu_seconds': 0.0, 'peak_traced_bytes': 0})
+            stage['seconds'] += seconds
+            stage['cpu_seconds'] += cpu_seconds
+            stage['peak_traced_bytes'] = max(stage['peak_traced_bytes'], entry['peak_traced_bytes'])
+        else:
+            stages[name] = entry
+
+    return dict(case, **{
+        'file_bytes': len(audio_data),
+        'stages': stages,
+        'groups': groups,
+        'baseline_rss_bytes': baseline_rss,
+        'peak_rss_bytes': max_rss_bytes(),
+        'features_extracted': result['summary']['total_features_extracted'],
+    })
+
+
+def case_id(case):
+    return f"{case['signal']}-{case['format']}-{case['duration']:g}s"
+
+
+def run_suite(args):
+    formats = list(args.formats)
+    if shutil.which('ffmpeg') is None:
+        skipped = [audio_format for audio_format in formats if audio_format != 'wav']
+        if skipped:
+            print(f"ffmpeg not found: skipping {', '.join(skipped)} cases")
+        formats = [audio_format for audio_format in formats if audio_format == 'wav']
+
+    cases = [
+        {'id': None, 'signal': signal, 'format': audio_format, 'duration': duration,
+         'task_type': SIGNAL_TASK_TYPES[signal]}
+        for signal in args.signals for audio_format in formats for duration in args.durations
+    ]
+    for case in cases:
+        case['id'] = case_id(case)
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': config.available_cpu_count(),
+        },
+        'config': {
+            'voice_quality_engine': config.VOICE_QUALITY_ENGINE,
+            'extraction_tier': config.EXTRACTION_TIER,
+            'praat_measurements': config.PRAAT_MEASUREMENTS,
+            'spectral_sample_rate': config.SPECTRAL_SAMPLE_RATE,
+            'streaming_min_seconds': config.STREAMING_MIN_SECONDS,
+        },
+        'repeats': args.repeats,
+        'cases': [],
+    }
+    from utils.feature_extraction import FEATURE_PIPELINE_VERSION
+    report['pipeline_version'] = FEATURE_PIPELINE_VERSION
+
+    print(f"{'case':<24}{'total s':>9}{'decode':>8}{'librosa':>9}{'voice':>8}{'vad':>7}"
+          f"{'peak RSS':>10}{'traced':>9}")
+    context = multiprocessing.get_context('spawn')
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                measured = pool.submit(run_case, case, args.repeats).result()
+            except Exception as e:
+                print(f"{case['id']:<24} failed: {e}")
+                report['cases'].append(dict(case, error=str(e)))
+                continue
+
+        stages = measured['stages']
+        print(f"{case['id']:<24}{stages['total']['seconds']:>9.2f}"
+              f"{stages.get('decode', {}).get('seconds', 0):>8.2f}"
+              f"{stages.get('librosa', {}).get('seconds', 0):>9.2f}"
+              f"{stages.get('voice_quality', {}).get('seconds', 0):>8.2f}"
+              f"{stages.get('vad', {}).get('seconds', 0):>7.2f}"
+              f"{measured['peak_rss_bytes'] / 2 ** 20:>8.0f}MB"
+              f"{stages['total']['peak_traced_bytes'] / 2 ** 20:>7.0f}MB")
+        report['cases'].append(measured)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+# --- Compare ------------------------------------------------------------------
+
+def load_budgets(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def budget_for(budgets, stage, metric):
+    """Allowed relative increase of a metric for a stage (stage override, then default)"""
+    return budgets.get('stages', {}).get(stage, {}).get(metric, budgets['default'].get(metric))
+
+
+def compare(baseline, current, budgets):
+    """List of regressions of `current` against `baseline` past the budgets"""
+    regressions = []
+    baseline_cases = {case['id']: case for case in baseline['cases'] if 'error' not in case}
+    min_seconds = budgets.get('min_seconds', 0)
+    min_bytes = budgets.get('min_bytes', 0)
+
+    for case in current['cases']:
+        reference = baseline_cases.get(case['id'])
+        if 'error' in case:
+            if reference is not None:  # Cases that already failed in the baseline are not regressions
+                regressions.append((case['id'], 'run', 'failed', case['error']))
+            continue
+        if reference is None:
+            continue
+
+        checks = [(stage, metric, values.get(metric), reference['stages'].get(stage, {}).get(metric))
+                  for stage, values in case['stages'].items()
+                  for metric in ('seconds', 'peak_traced_bytes')]
+        checks.append(('process', 'peak_rss_bytes',
+                       case['peak_rss_bytes'] - case['baseline_rss_bytes'],
+                       reference['peak_rss_bytes'] - reference['baseline_rss_bytes']))
+
+        for stage, metric, value, old in checks:
+            allowed = budget_for(budgets, stage, metric)
+            if value is None or old is None or allowed is None:
+                continue
+            floor = min_seconds if metric == 'seconds' else min_bytes
+            if max(value, old) < floor:
+                continue  # Too small to measure reliably
+            limit = max(old, floor) * (1 + allowed)
+            if value > limit:
+                regressions.append((case['id'], stage, metric,
+                                    f"{old:.4g} -> {value:.4g} (+{value / max(old, 1e-12) - 1:.0%}, "
+                                    f"budget +{allowed:.0%})"))
+    return regressions
+
+
+def run_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    budgets = load_budgets(args.budgets)
+
+    regressions = compare(baseline, current, budgets)
+    matched = len({case['id'] for case in current['cases']} & {case['id'] for case in baseline['cases']})
+    print(f"Compared {matched} cases (pipeline {baseline.get('pipeline_version')} -> {current.get('pipeline_version')})")
+    for case, stage, metric, detail in regressions:
+        print(f"  REGRESSION {case} {stage} {metric}: {detail}")
+    if regressions:
+        print(f"{len(regressions)} regressions past budget")
+        return 1
+    print("No regressions past budget")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Feature extraction benchmark suite')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Benchmark synthetic recordings and save the results as JSON')
+    run_parser.add_argument('--signals', nargs='+', default=list(SIGNALS), choices=SIGNALS)
+    run_parser.add_argument('--formats', nargs='+', default=list(FORMATS), choices=FORMATS)
+    run_parser.add_argument('--durations', nargs='+', type=float, default=[5, 30, 60])
+    run_parser.add_argument('--repeats', type=int, default=3, help='Timed runs per case (median is reported)')
+    run_parser.add_argument('--output', default='benchmark.json')
+
+    compare_parser = commands.add_parser('compare', help='Fail when a stage regressed past its budget')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--budgets', default=DEFAULT_BUDGETS)
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run_suite(args)
+    else:
+        sys.exit(run_compare(args))
+
+
+if __name__ == '__main__':
+    main()
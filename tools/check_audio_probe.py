@@ -0,0 +1,153 @@
+# check_audio_probe.py - Regression cases and fuzzing for the upload header probe
+#
+# utils/audio_probe.py runs on untrusted uploads inside the request, so any input must
+# give either an AudioProbe or a ProbeError (a 400), never another exception (a 500).
+# The built-in cases are corrupt headers that once escaped as other exceptions; --fuzz
+# additionally mutates real recordings (byte flips, overwrites, truncation).
+#
+# Run from the repository root:
+#   python -m tools.check_audio_probe
+#   python -m tools.check_audio_probe --fuzz recordings/*.webm recordings/*.m4a --iterations 2000
+
+import argparse
+import io
+import random
+import struct
+import sys
+import tempfile
+
+import numpy as np
+import soundfile as sf
+
+from utils.audio_probe import AudioProbe, ProbeError, probe_audio
+
+
+# --- Crafted inputs -----------------------------------------------------------
+
+def ebml(element_id, payload):
+    """One EBML element with an 8-byte size"""
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big') + \
+        (0x01 << 56 | len(payload)).to_bytes(8, 'big') + payload
+
+
+def webm(info=b'', clusters=b''):
+    """Minimal WebM with one Opus audio track; `info` and `clusters` go into its segment"""
+    track = ebml(0xAE, ebml(0x83, b'\x02') + ebml(0x86, b'A_OPUS') +
+                 ebml(0xE1, ebml(0xB5, struct.pack('>d', 48000.0)) + ebml(0x9F, b'\x01')))
+    segment = ebml(0x1549A966, info) + ebml(0x1654AE6B, track) + clusters
+    return ebml(0x1A45DFA3, b'') + ebml(0x18538067, segment)
+
+
+def wav(seconds=2.0, sr=16000):
+    buffer = io.BytesIO()
+    sf.write(buffer, np.zeros(int(seconds * sr), dtype=np.float32), sr, format='WAV', subtype='PCM_16')
+    return buffer.getvalue()
+
+
+def mp4_box(box_type, payload):
+    return struct.pack('>I', 8 + len(payload)) + box_type + payload
+
+
+def cases():
+    """(name, data, expected duration in seconds or None for a ProbeError)"""
+    huge = (1 << 1600).to_bytes(201, 'big')
+    block = ebml(0xA3, b'\x81\x00\x00\x80')  # Track 1, relative timecode 0
+    return [
+        ('wav', wav(), 2.0),
+        ('webm duration', webm(ebml(0x4489, struct.pack('>d', 2500.0))), 2.5),
+        ('webm without duration', webm(clusters=ebml(0x1F43B675, ebml(0xE7, b'\x09\xc4') + block)), 2.5),
+        # An unbounded TimecodeScale or cluster timecode made the duration math raise OverflowError
+        ('webm huge timecode scale', webm(ebml(0x2AD7B1, huge) + ebml(0x4489, struct.pack('>d', 1.0))), None),
+        ('webm huge cluster timecode', webm(clusters=ebml(0x1F43B675, ebml(0xE7, huge) + block)), None),
+        ('webm infinite duration', webm(ebml(0x4489, struct.pack('>d', float('inf')))), None),
+        ('webm 3-byte float', webm(ebml(0x4489, b'\x00\x00\x00')), None),
+        ('ogg vorbis without a rate', b'OggS' + bytes(22) + b'\x01\x1e' + b'\x01vorbis' + bytes(23), None),
+        ('mp4 trun with 2^32 samples', mp4_box(b'ftyp', b'M4A ') + mp4_box(b'moof', mp4_box(b'traf',
+            mp4_box(b'tfhd', bytes(4) + b'\x00\x00\x00\x01') +
+            mp4_box(b'trun', b'\x00\x00\x01\x00' + b'\xff\xff\xff\xff'))), None),
+        ('truncated wav', wav()[:30], None),
+        ('garbage', b'not audio at all' * 8, None),
+    ]
+
+
+def check(name, data, expected):
+    """None if the probe behaved, else a description of what went wrong"""
+    try:
+        # From a file like the upload route: reads are real allocations there, not slices
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            probe = probe_audio(f.name)
+    except ProbeError as e:
+        return None if expected is None else f"ProbeError {e}"
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    if expected is None:
+        return f"expected a ProbeError, got {probe}"
+    if probe.duration_s is None or abs(probe.duration_s - expected) > 0.01:
+        return f"expected {expected}s, got {probe}"
+    return None
+
+
+# --- Fuzzing ------------------------------------------------------------------
+
+def mutate(data, rng):
+    data = bytearray(data)
+    choice = rng.random()
+    if choice < 0.2:
+        return bytes(data[:rng.randrange(12, len(data))])
+    for _ in range(rng.randint(1, 8)):
+        position = rng.randrange(4, len(data))  # Keep the magic bytes so the container parsers run
+        if choice < 0.6:
+            data[position] = rng.randrange(256)
+        else:
+            data[position:position + 8] = b'\xff' * 8 if rng.random() < 0.5 else b'\x01' + b'\x00' * 7
+    return bytes(data)
+
+
+def fuzz(paths, iterations, seed):
+    rng = random.Random(seed)
+    failures = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            original = f.read()
+        for iteration in range(iterations):
+            data = mutate(original, rng)
+            try:
+                result = probe_audio(data)
+            except ProbeError:
+                continue
+            except Exception as e:
+                failures.append(f"{path} #{iteration}: {type(e).__name__}: {e}")
+                continue
+            if not isinstance(result, AudioProbe):
+                failures.append(f"{path} #{iteration}: returned {result!r}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that the upload header probe only fails with ProbeError')
+    parser.add_argument('--fuzz', nargs='*', default=[], help='Recordings to mutate and probe')
+    parser.add_argument('--iterations', type=int, default=500, help='Mutations per fuzzed recording')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    failures = []
+    for name, data, expected in cases():
+        problem = check(name, data, expected)
+        print(f"{'FAIL' if problem else 'ok':4} {name}" + (f": {problem}" if problem else ''))
+        if problem:
+            failures.append(name)
+
+    if args.fuzz:
+        fuzz_failures = fuzz(args.fuzz, args.iterations, args.seed)
+        print(f"Fuzzed {len(args.fuzz)} recordings x {args.iterations}: {len(fuzz_failures)} failures")
+        for failure in fuzz_failures[:20]:
+            print(f"  {failure}")
+        failures.extend(fuzz_failures)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# check_job_timeout.py - Check that an extraction job over its time limit is retried
+#
+# A timed-out extraction must fail its job so the job queue retries it (and dead-letters it
+# after JOB_MAX_ATTEMPTS), not come back as an ordinary processing_successful: False result
+# that marks the recording failed for good. Runs extract_spooled_features on a long synthetic
+# vowel in the process pool with a 1 second limit, through a real JobQueue and JobWorkers.
+#
+# Run from the repository root:
+#   python -m tools.check_job_timeout
+
+import io
+import sys
+import tempfile
+import time
+
+import soundfile as sf
+
+from tools.benchmark_feature_extraction import synthetic_vowel
+from utils.feature_extraction import extract_spooled_features
+from utils.job_queue import QUEUED, JobHandler, JobQueue, JobWorkers
+from utils.processing_pool import ProcessExtractionExecutor
+
+
+def main():
+    y, sr = synthetic_vowel(120)
+    buffer = io.BytesIO()
+    sf.write(buffer, y, sr, format='WAV', subtype='PCM_16')
+    request_info = {'task_metadata': {'task_type': 'maximum_phonation_time'}}
+
+    executor = ProcessExtractionExecutor(1, timeout=1)
+    executor.run(len, b'warm-up')  # Start the worker before the clock matters
+
+    def run(job):
+        result = executor.run(extract_spooled_features, job.audio_path, 'vowel.wav', request_info)
+        print(f"Job returned instead of raising: processing_successful="
+              f"{result.get('summary', {}).get('processing_successful')}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        queue = JobQueue(directory, retry_base_seconds=3600)
+        job_id = queue.enqueue('recording', {}, audio_data=buffer.getvalue())
+        workers = JobWorkers(queue, {'recording': JobHandler(run)}, workers=1, poll_seconds=0.2)
+        workers.start()
+        deadline = time.time() + 60
+        row = None
+        while time.time() < deadline:
+            row = queue._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row['attempts'] and row['status'] != 'leased':
+                break
+            time.sleep(0.2)
+        workers.stop()
+    executor.shutdown()
+
+    ok = row['status'] == QUEUED and 'JobTimeoutError' in (row['last_error'] or '')
+    print(f"{'ok' if ok else 'FAIL'} job status {row['status']} after {row['attempts']} attempt(s): {row['last_error']}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
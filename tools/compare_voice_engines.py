@@ -0,0 +1,139 @@
+# compare_voice_engines.py - How far the NumPy voice-quality engine deviates from Praat
+#
+# Run from the repository root:
+#   python -m tools.compare_voice_engines
+#   python -m tools.compare_voice_engines --corpus path/to/recordings --json deviation.json
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from tools.benchmark_feature_extraction import synthetic_speech, synthetic_vowel
+from utils.audio_buffer import AudioBuffer
+from utils.audio_probe import AUDIO_EXTENSIONS
+from utils.feature_registry import run_feature_groups
+
+# Voice-quality groups each engine provides, in the order they are compared
+COMPARED_GROUPS = {
+    'praat': ('pitch', 'jitter', 'jitter_ppq5', 'shimmer', 'shimmer_apq5', 'hnr', 'phonation'),
+    'numpy': ('numpy_pitch', 'numpy_jitter', 'numpy_jitter_ppq5', 'numpy_shimmer', 'numpy_shimmer_apq5',
+              'numpy_hnr', 'numpy_phonation'),
+}
+
+
+def synthetic_corpus(duration=5.0):
+    """Sustained vowels over a range of pitches and jitter levels, plus connected speech"""
+    corpus = []
+    for f0 in (100, 150, 200, 250):
+        for jitter in (0.002, 0.005, 0.01, 0.02):
+            y, sr = synthetic_vowel(duration, f0=f0, jitter=jitter, seed=f0)
+            corpus.append((f"vowel_{f0}hz_jitter{jitter:g}", AudioBuffer(y, sr)))
+    for seed in range(3):
+        y, sr = synthetic_speech(duration, seed=seed)
+        corpus.append((f"speech_{seed}", AudioBuffer(y, sr)))
+    return corpus
+
+
+def directory_corpus(directory):
+    """Every audio file under directory, decoded the way uploads are"""
+    corpus = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                path = os.path.join(root, name)
+                with open(path, 'rb') as f:
+                    corpus.append((os.path.relpath(path, directory), AudioBuffer.from_bytes(f.read(), name)))
+    return corpus
+
+
+def run_engine(audio, engine):
+    """(features, seconds) for one engine on a fresh copy of the recording, so nothing is shared between engines"""
+    audio = AudioBuffer(audio.samples, audio.sr)
+    start = time.perf_counter()
+    features = run_feature_groups(audio, COMPARED_GROUPS[engine])
+    return features, time.perf_counter() - start
+
+
+def deviation_report(corpus):
+    """Per-feature deviation of the NumPy engine from Praat, and the speedup, over a corpus"""
+    pairs = {}
+    timings = {'praat': 0.0, 'numpy': 0.0}
+
+    for name, audio in corpus:
+        praat_features, praat_seconds = run_engine(audio, 'praat')
+        numpy_features, numpy_seconds = run_engine(audio, 'numpy')
+        timings['praat'] += praat_seconds
+        timings['numpy'] += numpy_seconds
+        print(f"  {name}: praat {praat_seconds:.2f}s, numpy {numpy_seconds:.2f}s")
+
+        for feature, reference in praat_features.items():
+            value = numpy_features.get(feature)
+            if isinstance(reference, (int, float)) and isinstance(value, (int, float)):
+                pairs.setdefault(feature, []).append((float(reference), float(value)))
+
+    features = {}
+    for feature, values in pairs.items():
+        reference, value = np.array(values).T
+        finite = np.isfinite(reference) & np.isfinite(value)
+        reference, value = reference[finite], value[finite]
+        if not len(reference):
+            continue
+        absolute = np.abs(value - reference)
+        # Near-zero references (e.g. no voice breaks) are compared against 5% of the feature's typical size
+        scale = np.maximum(np.abs(reference), 0.05 * np.mean(np.abs(reference)) + 1e-12)
+        relative = absolute / scale
+        correlated = len(reference) > 1 and np.std(reference) > 0 and np.std(value) > 0
+        features[feature] = {
+            'recordings': int(len(reference)),
+            'mean_reference': float(np.mean(reference)),
+            'mean_absolute_difference': float(np.mean(absolute)),
+            'median_relative_difference': float(np.median(relative)),
+            'p90_relative_difference': float(np.percentile(relative, 90)),
+            'correlation': float(np.corrcoef(reference, value)[0, 1]) if correlated else None,
+        }
+
+    return {
+        'recordings': len(corpus),
+        'praat_seconds': timings['praat'],
+        'numpy_seconds': timings['numpy'],
+        'speedup': timings['praat'] / timings['numpy'] if timings['numpy'] else None,
+        'features': features,
+    }
+
+
+def print_report(report):
+    print(f"\n{report['recordings']} recordings: praat {report['praat_seconds']:.2f}s, "
+          f"numpy {report['numpy_seconds']:.2f}s ({report['speedup']:.1f}x)")
+    print(f"{'feature':<26}{'mean ref':>12}{'mean |diff|':>14}{'median rel':>12}{'p90 rel':>10}{'corr':>8}")
+    for feature, row in report['features'].items():
+        correlation = f"{row['correlation']:.3f}" if row['correlation'] is not None else '-'
+        print(f"{feature:<26}{row['mean_reference']:>12.4g}{row['mean_absolute_difference']:>14.4g}"
+              f"{row['median_relative_difference']:>11.1%}{row['p90_relative_difference']:>10.1%}{correlation:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deviation of the NumPy voice-quality engine from Praat')
+    parser.add_argument('--corpus', help='Directory of reference recordings (default: synthetic corpus)')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per synthetic recording')
+    parser.add_argument('--json', help='Also write the report to this file')
+    args = parser.parse_args()
+
+    corpus = directory_corpus(args.corpus) if args.corpus else synthetic_corpus(args.duration)
+    if not corpus:
+        parser.error(f"No audio files found in {args.corpus}")
+
+    print(f"Comparing voice-quality engines on {len(corpus)} recordings")
+    report = deviation_report(corpus)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# profile_report.py - Which task types and input formats dominate processing compute
+#
+# Reads the processing_profile attribute of stored recordings (or of a re-extraction
+# JSON-lines file) and prints CPU seconds, share of the total, wall-time percentiles and
+# the costliest stages per group.
+#
+# Run from the repository root:
+#   python -m tools.profile_report
+#   python -m tools.profile_report --by task_type,format,tier --since 2025-06-01
+#   python -m tools.profile_report --jsonl features.jsonl --json report.json
+
+import argparse
+import json
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.profiling import aggregate_profiles
+
+
+def stored_profiles(since=None):
+    """processing_profile of every record that has one, projected so features are not read"""
+    from boto3.dynamodb.conditions import Attr
+    from utils.database import get_dynamodb_resource
+
+    table = get_dynamodb_resource().Table('voice-donations')
+    condition = Attr('processing_profile').exists()
+    if since:
+        condition &= Attr('completed_at').gte(since)
+    scan_kwargs = {'ProjectionExpression': 'processing_profile', 'FilterExpression': condition}
+
+    response = table.scan(**scan_kwargs)
+    while True:
+        for item in response['Items']:
+            yield item['processing_profile']
+        if 'LastEvaluatedKey' not in response:
+            break
+        response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'], **scan_kwargs)
+
+
+def jsonl_profiles(path):
+    with open(path) as f:
+        for line in f:
+            profile = json.loads(line).get('processing_profile')
+            if profile:
+                yield profile
+
+
+def print_report(rows, keys, top_stages):
+    key_width = max([len(' / '.join(keys))] + [len(' / '.join(str(row[key]) for key in keys)) for row in rows])
+    print(f"{' / '.join(keys):<{key_width}}  {'n':>6}  {'CPU s':>9}  {'share':>6}  {'CPU s/rec':>9}  "
+          f"{'CPU/audio s':>11}  {'p50 wall':>8}  {'p95 wall':>8}  top stages (CPU s)")
+    for row in rows:
+        per_audio = row['cpu_s_per_audio_second']
+        stages = ', '.join(f"{name} {seconds:.1f}" for name, seconds in list(row['stage_cpu_s'].items())[:top_stages])
+        print(f"{' / '.join(str(row[key]) for key in keys):<{key_width}}  {row['recordings']:>6}  "
+              f"{row['cpu_s']:>9.1f}  {row['cpu_share']:>6.1%}  {row['cpu_s_per_recording']:>9.2f}  "
+              f"{per_audio if per_audio is not None else float('nan'):>11.3f}  "
+              f"{row['wall_s_p50']:>8.2f}  {row['wall_s_p95']:>8.2f}  {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate per-recording processing profiles')
+    parser.add_argument('--by', default='task_type,format',
+                        help='Comma-separated profile fields to group by (task_type, format, tier, engine, ...)')
+    parser.add_argument('--since', help='Only records completed at or after this ISO timestamp (database only)')
+    parser.add_argument('--jsonl', help='Read profiles from a re-extraction JSON-lines file instead of the database')
+    parser.add_argument('--top-stages', type=int, default=4, help='Stages listed per group')
+    parser.add_argument('--json', help='Also write the aggregated rows to this file')
+    args = parser.parse_args()
+
+    keys = tuple(key.strip() for key in args.by.split(',') if key.strip())
+    profiles = list(jsonl_profiles(args.jsonl) if args.jsonl else stored_profiles(args.since))
+    if not profiles:
+        print('No processing profiles found')
+        return
+
+    rows = aggregate_profiles(profiles, keys=keys)
+    print(f"{len(profiles)} recordings, {sum(row['cpu_s'] for row in rows):.1f} CPU seconds")
+    print_report(rows, keys, args.top_stages)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
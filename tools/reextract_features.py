@@ -0,0 +1,290 @@
+# reextract_features.py - Recompute features for archived recordings after a pipeline change
+#
+# Walks a local directory or an S3 prefix of archived audio, runs extract_all_features in a
+# process pool and writes the results back through the database layer in batches. Finished
+# recording IDs are appended to a state file, so an interrupted run picks up where it stopped.
+# Each batch is one BatchGetItem for the stored request info, then one update_item per
+# recording (only the feature attributes, so live updates to a record are never overwritten),
+# run on --write-workers threads: writes cost a round trip per recording, spread over threads.
+# The recording ID is the UUID in each file name (or the file name without its extension).
+#
+# Run from the repository root:
+#   python -m tools.reextract_features archive/
+#   python -m tools.reextract_features s3://voice-donations-audio/audio/ --shard 0/4 --workers 8
+#   python -m tools.reextract_features archive/ --jsonl features.jsonl   # no database writes
+#
+# DYNAMODB_ENDPOINT_URL and S3_ENDPOINT_URL point the run at local stand-ins
+# (e.g. DynamoDB Local on http://localhost:8000).
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import config
+from utils.audio_probe import AUDIO_EXTENSIONS
+from utils.feature_extraction import FEATURE_PIPELINE_VERSION, extract_all_features
+from utils.feature_registry import EXTRACTION_TIERS
+from utils.processing_pool import ProcessExtractionExecutor
+
+UUID_PATTERN = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', re.IGNORECASE)
+
+
+def recording_id_for(key):
+    """Recording ID encoded in an archived file name"""
+    name = os.path.basename(key)
+    match = UUID_PATTERN.search(name)
+    return match.group(0).lower() if match else os.path.splitext(name)[0]
+
+
+def list_source(source):
+    """(recording_id, key) for every audio file under a directory or s3://bucket/prefix, in a stable order"""
+    if source.startswith('s3://'):
+        from utils.aws_helpers import list_audio_files
+        bucket, _, prefix = source[len('s3://'):].partition('/')
+        keys = list_audio_files(prefix, bucket_name=bucket)
+    else:
+        keys = (
+            os.path.relpath(os.path.join(root, name), source)
+            for root, _, files in os.walk(source)
+            for name in files
+        )
+    return sorted((recording_id_for(key), key) for key in keys if key.lower().endswith(AUDIO_EXTENSIONS))
+
+
+def parse_shard(value):
+    """'i/n' -> (i, n)"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard must look like i/n, got '{value}'")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard index must be in 0..{count - 1}")
+    return index, count
+
+
+def in_shard(recording_id, shard):
+    """Stable assignment of a recording to one of n shards (independent of listing order)"""
+    index, count = shard
+    return int(hashlib.sha1(recording_id.encode()).hexdigest(), 16) % count == index
+
+
+def read_audio(source, key):
+    if source.startswith('s3://'):
+        from utils.aws_helpers import download_audio_file
+        return download_audio_file(key, bucket_name=source[len('s3://'):].partition('/')[0])
+    with open(os.path.join(source, key), 'rb') as f:
+        return f.read()
+
+
+def reextract_recording(source, key, request_info):
+    """Worker job: read one recording and extract its features (audio never crosses the process boundary)"""
+    return extract_all_features(read_audio(source, key), os.path.basename(key), request_info)
+
+
+class Checkpoint:
+    """Append-only state file of finished recordings; the last line per recording wins"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line from an interrupted run
+                    if entry.get('status') == 'done':
+                        self.done.add(entry['recording_id'])
+                    else:
+                        self.done.discard(entry['recording_id'])
+        self._file = open(path, 'a')
+
+    def record(self, recording_ids, status='done', error=None):
+        for recording_id in recording_ids:
+            entry = {'recording_id': recording_id, 'status': status,
+                     'pipeline_version': FEATURE_PIPELINE_VERSION, 'at': time.time()}
+            if error:
+                entry['error'] = error
+            self._file.write(json.dumps(entry) + '\n')
+            if status == 'done':
+                self.done.add(recording_id)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class DatabaseSink:
+    """Batched reads and per-record feature updates through utils.database"""
+
+    def __init__(self, create_missing=False, write_workers=8):
+        self.create_missing = create_missing
+        self.write_workers = write_workers
+
+    def request_infos(self, recording_ids):
+        """Stored request info (with task metadata) per recording, so each is re-extracted with its own plan"""
+        from utils.database import get_voice_donations_batch
+        items = get_voice_donations_batch(recording_ids, attributes=['recording_id', 'request_info', 'task_metadata'])
+        infos = {}
+        for recording_id, item in items.items():
+            request_info = dict(item.get('request_info') or {})
+            if item.get('task_metadata') and 'task_metadata' not in request_info:
+                request_info['task_metadata'] = item['task_metadata']
+            infos[recording_id] = request_info
+        return infos
+
+    def write(self, results):
+        """(saved, missing) recording IDs"""
+        from utils.database import save_features_batch
+        outcome = save_features_batch(results, create_missing=self.create_missing,
+                                      workers=self.write_workers)
+        if not outcome['success']:
+            raise RuntimeError(outcome['error'])
+        for recording_id in outcome['missing']:
+            print(f"  {recording_id}: no database record (use --create-missing to add one)")
+        return outcome['saved'], outcome['missing']
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+    """Results to a JSON-lines file instead of the database (comparing pipeline versions, dry runs)"""
+
+    def __init__(self, path):
+        self._file = open(path, 'a')
+
+    def request_infos(self, recording_ids):
+        return {}
+
+    def write(self, results):
+        for recording_id, features_result in results.items():
+            self._file.write(json.dumps({'recording_id': recording_id, **features_result}) + '\n')
+        self._file.flush()
+        return list(results), []
+
+    def close(self):
+        self._file.close()
+
+
+def run(args):
+    recordings = [(recording_id, key) for recording_id, key in list_source(args.source)
+                  if in_shard(recording_id, args.shard)]
+    # The default state file is per pipeline version, so a new version starts from scratch
+    checkpoint = Checkpoint(args.state or
+                            f"reextract-state-{FEATURE_PIPELINE_VERSION}-{args.shard[0]}-of-{args.shard[1]}.jsonl")
+    pending = [(recording_id, key) for recording_id, key in recordings if recording_id not in checkpoint.done]
+    if args.limit is not None:
+        pending = pending[:args.limit]
+
+    already_done = sum(1 for recording_id, _ in recordings if recording_id in checkpoint.done)
+    print(f"Shard {args.shard[0]}/{args.shard[1]}: {len(recordings)} recordings, {already_done} already done, "
+          f"{len(pending)} to extract with {args.workers} workers (pipeline {FEATURE_PIPELINE_VERSION})")
+    if not pending:
+        checkpoint.close()
+        return
+
+    sink = JsonLinesSink(args.jsonl) if args.jsonl \
+        else DatabaseSink(create_missing=args.create_missing, write_workers=args.write_workers)
+    executor = ProcessExtractionExecutor(max_workers=args.workers,
+                                         max_tasks_per_child=config.EXTRACTION_MAX_TASKS_PER_CHILD,
+                                         timeout=config.EXTRACTION_JOB_TIMEOUT)
+    start = time.perf_counter()
+    completed = failed = 0
+    results = {}
+    in_flight = {}
+    queue = iter(pending)
+
+    def flush():
+        nonlocal results
+        if results:
+            saved, missing = sink.write(results)
+            checkpoint.record(saved)
+            checkpoint.record(missing, status='missing')  # Retried on the next run
+            results = {}
+
+    def report():
+        elapsed = time.perf_counter() - start
+        print(f"  {completed + failed}/{len(pending)} ({failed} failed), "
+              f"{completed / elapsed if elapsed else 0:.2f} recordings/s")
+
+    try:
+        while True:
+            # Keep the pool busy without reading the whole queue's request info up front
+            if len(in_flight) < args.workers * 2:
+                chunk = [item for _, item in zip(range(args.batch_size), queue)]
+                if chunk:
+                    infos = sink.request_infos([recording_id for recording_id, _ in chunk])
+                    for recording_id, key in chunk:
+                        request_info = dict(infos.get(recording_id) or {})
+                        if args.task_type and 'task_metadata' not in request_info:
+                            request_info['task_metadata'] = {'task_type': args.task_type}
+                        request_info['extraction_tier'] = args.tier
+                        future = executor.submit(reextract_recording, args.source, key, request_info)
+                        in_flight[future] = recording_id
+                    continue
+
+            if not in_flight:
+                break
+
+            done = next(iter(wait(in_flight, return_when=FIRST_COMPLETED).done))
+            recording_id = in_flight.pop(done)
+            try:
+                features_result = done.result()
+                if not features_result.get('summary', {}).get('processing_successful', False):
+                    raise RuntimeError(features_result.get('processing_error', 'extraction failed'))
+                results[recording_id] = features_result
+                completed += 1
+            except Exception as e:
+                print(f"  {recording_id}: {e}")
+                checkpoint.record([recording_id], status='failed', error=str(e))
+                failed += 1
+
+            if len(results) >= args.batch_size:
+                flush()
+            if (completed + failed) % args.report_every == 0:
+                report()
+
+        flush()
+    finally:
+        executor.shutdown(wait=False)
+        sink.close()
+        checkpoint.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Done: {completed} extracted, {failed} failed in {elapsed:.1f}s "
+          f"({completed / elapsed if elapsed else 0:.2f} recordings/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-extract features for archived recordings')
+    parser.add_argument('source', help='Directory of audio files or s3://bucket/prefix')
+    parser.add_argument('--shard', type=parse_shard, default=(0, 1), help='Process shard i of n (e.g. 2/8)')
+    parser.add_argument('--workers', type=int, default=config.EXTRACTION_WORKERS)
+    parser.add_argument('--batch-size', type=int, default=25,
+                        help='Recordings per batch: one batched read, then an update_item per recording')
+    parser.add_argument('--write-workers', type=int, default=8,
+                        help='Threads sending the per-recording feature updates of a batch')
+    parser.add_argument('--state', help="Checkpoint file (default: reextract-state-<pipeline version>-<i>-of-<n>.jsonl)")
+    parser.add_argument('--tier', default='full', choices=list(EXTRACTION_TIERS), help='Extraction tier')
+    parser.add_argument('--task-type', help='Task type for recordings without a database record')
+    parser.add_argument('--limit', type=int, help='Stop after this many recordings')
+    parser.add_argument('--jsonl', help='Write results to this JSON-lines file instead of the database')
+    parser.add_argument('--create-missing', action='store_true', help='Create records for unknown recordings')
+    parser.add_argument('--report-every', type=int, default=10, help='Progress line every N recordings')
+    args = parser.parse_args()
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
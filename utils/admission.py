@@ -0,0 +1,138 @@
+#admission.py - Cost-aware admission control for feature extraction
+#
+# Every upload gets a cost estimate (peak memory and CPU seconds) from its duration,
+# task type and extraction tier. Uploads are refused with a retry hint while the queued
+# CPU work is over a limit, and queued jobs only start extracting while the estimated
+# memory of the running jobs fits a budget that follows the memory actually available.
+
+import math
+import threading
+import time
+
+import psutil
+
+import config
+from .audio_buffer import CONVERSION_SAMPLE_RATE, decodes_natively
+
+
+def estimate_audio(probe, size):
+    """
+    (duration_seconds, sample_rate) of an upload of `size` bytes from its AudioProbe:
+    the duration the container records, or one guessed from the size at
+    ADMISSION_ASSUMED_BITRATE when it records none (or probe is None). Uploads that
+    aren't decoded at their own rate are decoded at CONVERSION_SAMPLE_RATE.
+    """
+    if probe is None or probe.duration_s is None:
+        duration = size * 8 / config.ADMISSION_ASSUMED_BITRATE
+    else:
+        duration = probe.duration_s
+    sample_rate = probe.sample_rate if probe is not None and decodes_natively(probe) else CONVERSION_SAMPLE_RATE
+    return duration, sample_rate
+
+
+def estimate_job_cost(duration_seconds, sample_rate, task_type, tier=None):
+    """{'duration_s', 'sample_rate', 'cpu_s', 'memory_mb'} of extracting one recording"""
+    from .feature_registry import get_extraction_plan
+
+    plan = get_extraction_plan(task_type, tier=tier)
+    return {
+        'duration_s': round(duration_seconds, 2),
+        'sample_rate': sample_rate,
+        'cpu_s': round(plan.estimate_cost(duration_seconds), 2),
+        'memory_mb': round(config.ADMISSION_JOB_BASE_MB
+                           + plan.estimate_memory(duration_seconds, sample_rate) / 2**20, 1),
+    }
+
+
+def job_class(cost):
+    """Scheduling class of a job: 'short' up to SHORT_JOB_MAX_CPU_SECONDS estimated, else 'long'"""
+    return 'short' if cost['cpu_s'] <= config.SHORT_JOB_MAX_CPU_SECONDS else 'long'
+
+
+def available_memory_mb():
+    """Memory this process may still use: the container's cgroup limit if it has one, else the host's"""
+    available = psutil.virtual_memory().available
+    try:
+        with open('/sys/fs/cgroup/memory.max') as f:
+            limit = f.read().strip()
+        if limit != 'max':
+            with open('/sys/fs/cgroup/memory.current') as f:
+                available = min(available, int(limit) - int(f.read()))
+    except (OSError, ValueError):
+        pass  # No cgroup v2 memory controller
+    return max(0, available) / 2**20
+
+
+class AdmissionController:
+    """
+    Memory-budget scheduler for running extractions. A job is admitted while the
+    estimated memory of the admitted jobs plus its own fits the budget, and while
+    fewer than `max_jobs` run; otherwise it waits. The budget is re-read while waiting:
+    what the admitted jobs hold plus what is still free (minus a reserve), capped by
+    `budget_mb` when one is configured. Concurrency therefore grows and shrinks with
+    the memory available. A job is always admitted when nothing else runs, so one
+    estimated over budget still makes progress.
+    """
+
+    def __init__(self, max_jobs, budget_mb=0, reserve_mb=256):
+        self.max_jobs = max_jobs
+        self.budget_mb = budget_mb
+        self.reserve_mb = reserve_mb
+        self.admitted_mb = 0.0
+        self.running = 0
+        self._condition = threading.Condition()
+
+    def memory_budget_mb(self):
+        budget = self.admitted_mb + available_memory_mb() - self.reserve_mb
+        if self.budget_mb:
+            budget = min(budget, self.budget_mb)
+        return max(0.0, budget)
+
+    def _fits(self, memory_mb):
+        if self.running == 0:
+            return True
+        return self.running < self.max_jobs and self.admitted_mb + memory_mb <= self.memory_budget_mb()
+
+    def acquire(self, memory_mb):
+        """Block until a job of memory_mb is admitted; returns the seconds waited"""
+        start = time.perf_counter()
+        with self._condition:
+            while not self._fits(memory_mb):
+                self._condition.wait(1.0)  # Also re-checks memory freed outside this process
+            self.running += 1
+            self.admitted_mb += memory_mb
+        return time.perf_counter() - start
+
+    def release(self, memory_mb):
+        with self._condition:
+            self.running -= 1
+            self.admitted_mb -= memory_mb
+            self._condition.notify_all()
+
+
+def retry_after_seconds(backlog_cpu_seconds, job_cpu_seconds, workers):
+    """
+    Seconds until the queued CPU work (plus this job's) is back under
+    ADMISSION_MAX_BACKLOG_CPU_SECONDS with `workers` working it off, or None if it is already.
+    With nothing queued a job is accepted however large it is.
+    """
+    limit = config.ADMISSION_MAX_BACKLOG_CPU_SECONDS
+    excess = backlog_cpu_seconds + job_cpu_seconds - limit
+    if not limit or backlog_cpu_seconds <= 0 or excess <= 0:
+        return None
+    return max(1, math.ceil(excess / max(workers, 1)))
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller():
+    """Process-wide admission controller configured in config.py"""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController(config.EXTRACTION_WORKERS,
+                                              budget_mb=config.ADMISSION_MEMORY_BUDGET_MB,
+                                              reserve_mb=config.ADMISSION_MEMORY_RESERVE_MB)
+        return _controller
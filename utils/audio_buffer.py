@@ -0,0 +1,162 @@
+#audio_buffer.py
+
+import io
+import subprocess
+import tempfile
+
+import numpy as np
+import librosa
+import parselmouth
+
+import config
+from .audio_probe import probe_audio
+
+
+# Sample rate used when an upload has to be transcoded (WebM, MP4, Ogg)
+CONVERSION_SAMPLE_RATE = 44100
+
+
+class AudioBuffer:
+    """
+    Immutable decoded recording shared by every feature extractor.
+
+    Holds mono float32 samples and the sample rate. Derived views (int16 PCM,
+    parselmouth.Sound and its Praat analyses, spectral analyses, resampled copies) are built lazily from the array the first
+    time they are requested and cached, so a recording is decoded once and never
+    re-read from disk.
+    """
+
+    __slots__ = ('samples', 'sr', '_views')
+
+    def __init__(self, samples, sr):
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        if samples.ndim != 1:
+            raise ValueError(f"AudioBuffer expects mono samples, got shape {samples.shape}")
+        samples.setflags(write=False)
+
+        object.__setattr__(self, 'samples', samples)
+        object.__setattr__(self, 'sr', int(sr))
+        object.__setattr__(self, '_views', {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("AudioBuffer is immutable")
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __repr__(self):
+        return f"AudioBuffer({len(self.samples)} samples at {self.sr}Hz, {self.duration:.2f}s)"
+
+    @property
+    def duration(self):
+        """Duration in seconds"""
+        return len(self.samples) / self.sr if self.sr > 0 else 0
+
+    def _cached(self, key, build):
+        if key not in self._views:
+            self._views[key] = build()
+        return self._views[key]
+
+    @property
+    def pcm16(self):
+        """16-bit PCM view (little-endian int16), as expected by webrtcvad"""
+        def build():
+            pcm = np.clip(np.floor(self.samples * 32768.0), -32768, 32767).astype('<i2')
+            pcm.setflags(write=False)
+            return pcm
+        return self._cached('pcm16', build)
+
+    @property
+    def sound(self):
+        """parselmouth.Sound built from the samples (no file round-trip)"""
+        # Praat objects are mutable; callers must treat the shared Sound as read-only
+        return self._cached('sound', lambda: parselmouth.Sound(self.samples.astype(np.float64), sampling_frequency=self.sr))
+
+    @property
+    def praat(self):
+        """PraatContext over the shared Sound (pitch, point process, intensity, harmonicity, formant)"""
+        from .praat_context import PraatContext
+        return self._cached('praat', lambda: PraatContext(self.sound))
+
+    @property
+    def spectral(self):
+        """SpectralContext over the samples (STFT, mel spectrogram, harmonic component)"""
+        from .spectral_context import SpectralContext
+        return self._cached('spectral', lambda: SpectralContext(self.samples, self.sr))
+
+    def at_rate(self, sr):
+        """
+        Resampled view of this recording at `sr` (cached, so each rate of the
+        analysis pyramid is computed at most once). Returns self at the native rate.
+        """
+        sr = int(sr)
+        if sr == self.sr:
+            return self
+        return self._cached(
+            ('rate', sr),
+            lambda: AudioBuffer(librosa.resample(self.samples, orig_sr=self.sr, target_sr=sr), sr)
+        )
+
+    @classmethod
+    def from_bytes(cls, audio_data, filename):
+        """Decode uploaded audio bytes into an AudioBuffer"""
+        y, sr = decode_audio(audio_data, filename)
+        return cls(y, sr)
+
+
+def quantize_pcm16(y):
+    """
+    Round samples to the 16-bit grid. Transcoded uploads used to be written to a
+    PCM_16 WAV before analysis; quantizing keeps feature values comparable with
+    recordings already in the database.
+    """
+    pcm = np.clip(np.floor(y * 32768.0), -32768, 32767)  # Same rounding libsndfile applies when writing PCM_16
+    return (pcm / 32768.0).astype(np.float32)
+
+
+# WAV codecs libsndfile decodes; any other WAV payload goes to ffmpeg
+LIBSNDFILE_WAV_CODECS = ('pcm', 'pcm_float', 'extensible', 'alaw', 'mulaw')
+
+
+def decodes_natively(probe):
+    """Whether an upload is decoded at its own sample rate (WAV libsndfile reads) rather than converted"""
+    return probe.container == 'wav' and probe.codec in LIBSNDFILE_WAV_CODECS
+
+
+def decode_audio(audio_data, filename):
+    """
+    Decode audio bytes to mono float32 entirely in memory, with the decoder for the
+    container its magic bytes name (the extension isn't trusted): libsndfile for WAV
+    (at its native sample rate) and Ogg, ffmpeg for WebM and MP4. Everything but WAV
+    is resampled to 44.1kHz. Raises ProbeError for anything else.
+    """
+    probe = probe_audio(audio_data)
+
+    if decodes_natively(probe):
+        return librosa.load(io.BytesIO(audio_data), sr=None)
+    if probe.container == 'ogg':
+        y, sr = librosa.load(io.BytesIO(audio_data), sr=CONVERSION_SAMPLE_RATE)
+        return quantize_pcm16(y), sr
+    return decode_with_ffmpeg(audio_data, probe.container), CONVERSION_SAMPLE_RATE
+
+
+def decode_with_ffmpeg(audio_data, container):
+    """
+    Mono 16-bit PCM at CONVERSION_SAMPLE_RATE from ffmpeg, as float32. The audio is piped
+    in, except MP4, which needs a seekable input (its index may come after the audio).
+    """
+    def run(source, stdin=None):
+        return subprocess.run([config.FFMPEG_PATH, '-nostdin', '-v', 'error', '-i', source,
+                               '-f', 's16le', '-ac', '1', '-ar', str(CONVERSION_SAMPLE_RATE), 'pipe:1'],
+                              input=stdin, capture_output=True)
+
+    if container == 'mp4':
+        with tempfile.NamedTemporaryFile(suffix='.mp4') as source:
+            source.write(audio_data)
+            source.flush()
+            result = run(source.name)
+    else:
+        result = run('pipe:0', stdin=audio_data)
+    if result.returncode != 0:
+        raise Exception(f"Could not decode {container} audio with ffmpeg: {result.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
@@ -0,0 +1,458 @@
+#audio_probe.py - Container sniffing and header probing of uploads, without decoding them
+#
+# Reads only container metadata (WAV chunks, Ogg pages, Matroska/WebM elements, MP4
+# boxes): milliseconds even for the largest upload, so it can run in the request.
+
+import io
+import math
+import os
+import struct
+
+# Magic bytes -> container; MP4 is recognised by its 'ftyp' box at offset 4
+CONTAINERS = ('wav', 'webm', 'ogg', 'mp4')
+
+# File extensions of recordings in those containers (.opus is Ogg, .m4a is MP4)
+AUDIO_EXTENSIONS = ('.wav', '.webm', '.ogg', '.opus', '.mp4', '.m4a')
+
+
+class ProbeError(ValueError):
+    """The upload is not in a supported container, or its header is broken"""
+
+
+class AudioProbe:
+    """
+    What the container says about an upload. duration_s is None when the container
+    doesn't record it (the upload is still decodable); sample_rate is the coded rate.
+    """
+
+    def __init__(self, container, codec, duration_s, channels, sample_rate):
+        self.container = container
+        self.codec = codec
+        self.duration_s = duration_s
+        self.channels = channels
+        self.sample_rate = sample_rate
+
+    def as_dict(self):
+        return {
+            'container': self.container,
+            'codec': self.codec,
+            'duration_s': round(self.duration_s, 3) if self.duration_s is not None else None,
+            'channels': self.channels,
+            'sample_rate': self.sample_rate,
+        }
+
+    def __repr__(self):
+        return f"<AudioProbe {self.as_dict()}>"
+
+
+def sniff_container(head):
+    """Container of an upload from its first 12 bytes, or None if unrecognised"""
+    head = bytes(head[:12])
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'wav'
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return 'webm'  # EBML: WebM or Matroska
+    if head[:4] == b'OggS':
+        return 'ogg'
+    if head[4:8] == b'ftyp':
+        return 'mp4'
+    return None
+
+
+class _BufferReader:
+    """Seekable reader over a bytes-like object (e.g. a memory map) without copying it"""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer)
+        self._position = 0
+
+    def read(self, size=-1):
+        end = len(self._view) if size < 0 else min(len(self._view), self._position + size)
+        data = bytes(self._view[self._position:end])
+        self._position = end
+        return data
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+
+def probe_audio(source, head=None):
+    """
+    AudioProbe of an upload given as a file path, a binary file object or a bytes-like
+    object. `head`, the upload's leading bytes when they were already captured (e.g.
+    SpooledUpload.head), is sniffed instead of reading them again.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return _probe(f, os.fstat(f.fileno()).st_size, head)
+    if hasattr(source, 'read'):
+        source.seek(0, io.SEEK_END)
+        size = source.tell()
+        source.seek(0)
+        try:
+            return _probe(source, size, head)
+        finally:
+            source.seek(0)
+    return _probe(_BufferReader(source), len(source), head)
+
+
+def probe_or_none(source):
+    """probe_audio(source), or None if the upload can't be probed"""
+    try:
+        return probe_audio(source)
+    except ProbeError:
+        return None
+
+
+def _probe(f, size, head=None):
+    container = sniff_container(head if head is not None else f.read(12))
+    if container is None:
+        raise ProbeError('Unrecognised audio container (expected WAV, WebM, Ogg or MP4)')
+    f.seek(0)
+    try:
+        probe = {'wav': _probe_wav, 'webm': _probe_matroska, 'ogg': _probe_ogg, 'mp4': _probe_mp4}[container](f, size)
+    except ProbeError:
+        raise
+    except (struct.error, IndexError, KeyError, ValueError, OverflowError, ZeroDivisionError) as e:
+        raise ProbeError(f"Broken {container} header: {e}") from e
+    if probe.duration_s is not None and not math.isfinite(probe.duration_s):
+        raise ProbeError(f"Broken {container} header: duration {probe.duration_s}")
+    return probe
+
+
+# --- WAV ----------------------------------------------------------------------
+
+WAV_CODECS = {1: 'pcm', 3: 'pcm_float', 6: 'alaw', 7: 'mulaw', 0xFFFE: 'extensible'}
+
+
+def _probe_wav(f, size):
+    f.seek(12)
+    fmt = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise ProbeError('WAV file without a data chunk')
+        chunk_id, chunk_size = header[:4], struct.unpack('<I', header[4:])[0]
+        start = f.tell()
+        if chunk_id == b'fmt ':
+            fmt = struct.unpack('<HHIIH', f.read(14))
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ProbeError('WAV data chunk before its fmt chunk')
+            # Streamed writers leave the size at 0 or 0xFFFFFFFF; a truncated upload has less than it says
+            data_size = chunk_size if 0 < chunk_size <= size - start else size - start
+            break
+        f.seek(start + chunk_size + (chunk_size & 1))  # Chunks are word-aligned
+
+    codec, channels, sample_rate, byte_rate, _ = fmt
+    if not channels or not sample_rate or not byte_rate:
+        raise ProbeError('WAV fmt chunk without channels, sample rate or byte rate')
+    return AudioProbe('wav', WAV_CODECS.get(codec, f"0x{codec:04x}"), data_size / byte_rate, channels, sample_rate)
+
+
+# --- Ogg ----------------------------------------------------------------------
+
+OGG_TAIL_BYTES = 65536  # The last page (with the final granule position) is within this many bytes of the end
+
+
+def _probe_ogg(f, size):
+    header = f.read(27)
+    segments = f.read(header[26])
+    packet = f.read(min(sum(segments), 64))
+    serial = header[14:18]
+
+    if packet.startswith(b'OpusHead'):
+        codec, channels, rate = 'opus', packet[9], 48000  # Opus always decodes at 48 kHz
+        pre_skip = struct.unpack('<H', packet[10:12])[0]
+    elif packet.startswith(b'\x01vorbis'):
+        codec, channels, rate = 'vorbis', packet[11], struct.unpack('<I', packet[12:16])[0]
+        pre_skip = 0
+    else:
+        raise ProbeError('Ogg stream is neither Opus nor Vorbis')
+    if not rate:
+        raise ProbeError('Vorbis header without a sample rate')
+
+    # Duration from the granule position (samples) of the stream's last complete page
+    f.seek(max(0, size - OGG_TAIL_BYTES))
+    tail = f.read(OGG_TAIL_BYTES)
+    position = tail.rfind(b'OggS')
+    duration = None
+    while position >= 0:
+        granule = struct.unpack('<q', tail[position + 6:position + 14])[0]
+        if tail[position + 14:position + 18] == serial and granule >= 0:
+            duration = max(0, granule - pre_skip) / rate
+            break
+        position = tail.rfind(b'OggS', 0, position)
+    return AudioProbe('ogg', codec, duration, channels, rate)
+
+
+# --- Matroska / WebM ----------------------------------------------------------
+
+EBML_SEGMENT = 0x18538067
+EBML_INFO, EBML_TRACKS, EBML_CLUSTER = 0x1549A966, 0x1654AE6B, 0x1F43B675
+EBML_TIMECODE_SCALE, EBML_DURATION = 0x2AD7B1, 0x4489
+EBML_TRACK_ENTRY, EBML_TRACK_TYPE, EBML_CODEC_ID, EBML_AUDIO = 0xAE, 0x83, 0x86, 0xE1
+EBML_SAMPLING_FREQUENCY, EBML_CHANNELS = 0xB5, 0x9F
+EBML_CLUSTER_TIMECODE, EBML_SIMPLE_BLOCK, EBML_BLOCK_GROUP, EBML_BLOCK = 0xE7, 0xA3, 0xA0, 0xA1
+
+# Elements that can only appear at the top of a segment: they end an unknown-size cluster
+EBML_SEGMENT_CHILDREN = {0x114D9B74, EBML_INFO, EBML_TRACKS, EBML_CLUSTER, 0x1C53BB6B, 0x1043A770,
+                         0x1941A469, 0x1254C367}
+
+
+def _read_vint(f, keep_marker):
+    first = f.read(1)
+    if not first:
+        return None, 0
+    length = 9 - first[0].bit_length()
+    if length > 8:
+        raise ProbeError('Invalid EBML variable-length integer')
+    data = first + f.read(length - 1)
+    value = int.from_bytes(data, 'big')
+    if not keep_marker:
+        value &= (1 << (7 * length)) - 1
+        if value == (1 << (7 * length)) - 1:
+            return -1, length  # Unknown size (live recordings)
+    return value, length
+
+
+def _read_element(f):
+    """(id, size, data start) of the next element; size -1 if unknown, id None at the end of the file"""
+    element_id, _ = _read_vint(f, keep_marker=True)
+    if element_id is None:
+        return None, 0, f.tell()
+    element_size, _ = _read_vint(f, keep_marker=False)
+    if element_size is None:
+        raise ProbeError('Truncated EBML element header')
+    return element_id, element_size, f.tell()
+
+
+def _children(f, start, size, file_size, stop_ids=()):
+    """Child elements of a master element; an unknown-size one ends at the first of `stop_ids`"""
+    end = file_size if size < 0 else min(start + size, file_size)
+    f.seek(start)
+    while f.tell() < end:
+        element_start = f.tell()
+        element_id, element_size, data_start = _read_element(f)
+        if element_id is None:
+            return
+        if size < 0 and element_id in stop_ids:
+            f.seek(element_start)
+            return
+        yield element_id, element_size, data_start
+        if element_size < 0:
+            continue  # Unknown-size child: the caller walked into it
+        f.seek(data_start + element_size)
+
+
+def _uint(f, size):
+    if not 0 <= size <= 8:
+        raise ProbeError(f"EBML integer of {size} bytes")
+    return int.from_bytes(f.read(size), 'big')
+
+
+def _float(f, size):
+    if size not in (4, 8):
+        raise ProbeError(f"EBML float of {size} bytes")
+    return struct.unpack('>f' if size == 4 else '>d', f.read(size))[0]
+
+
+def _probe_matroska(f, size):
+    element_id, element_size, data_start = _read_element(f)
+    f.seek(data_start + element_size)  # EBML header
+    element_id, segment_size, segment_start = _read_element(f)
+    if element_id != EBML_SEGMENT:
+        raise ProbeError('Matroska file without a segment')
+
+    timecode_scale, duration = 1000000, None
+    codec = channels = sample_rate = None
+    last_timecode = None
+    for element_id, element_size, data_start in _children(f, segment_start, segment_size, size):
+        if element_id == EBML_INFO:
+            for child_id, child_size, _ in _children(f, data_start, element_size, size):
+                if child_id == EBML_TIMECODE_SCALE:
+                    timecode_scale = _uint(f, child_size)
+                elif child_id == EBML_DURATION:
+                    duration = _float(f, child_size)
+        elif element_id == EBML_TRACKS:
+            for entry_id, entry_size, entry_start in _children(f, data_start, element_size, size):
+                if entry_id != EBML_TRACK_ENTRY or codec is not None:
+                    continue
+                track = {}
+                for child_id, child_size, child_start in _children(f, entry_start, entry_size, size):
+                    if child_id == EBML_TRACK_TYPE:
+                        track['type'] = _uint(f, child_size)
+                    elif child_id == EBML_CODEC_ID:
+                        track['codec'] = f.read(min(child_size, 64)).rstrip(b'\0').decode('ascii', 'replace')
+                    elif child_id == EBML_AUDIO:
+                        for audio_id, audio_size, _ in _children(f, child_start, child_size, size):
+                            if audio_id == EBML_SAMPLING_FREQUENCY:
+                                track['sample_rate'] = int(_float(f, audio_size))
+                            elif audio_id == EBML_CHANNELS:
+                                track['channels'] = _uint(f, audio_size)
+                if track.get('type') == 2:  # Audio
+                    codec = track.get('codec', 'unknown').replace('A_', '', 1).lower()
+                    channels, sample_rate = track.get('channels', 1), track.get('sample_rate', 8000)
+        elif element_id == EBML_CLUSTER and duration is None:
+            # MediaRecorder writes no duration: take the timestamp of the last block instead
+            cluster_timecode = 0
+            for child_id, child_size, child_start in _children(f, data_start, element_size, size,
+                                                               EBML_SEGMENT_CHILDREN):
+                if child_id == EBML_CLUSTER_TIMECODE:
+                    cluster_timecode = _uint(f, child_size)
+                elif child_id in (EBML_SIMPLE_BLOCK, EBML_BLOCK_GROUP):
+                    if child_id == EBML_BLOCK_GROUP:
+                        block_id, _, _ = _read_element(f)
+                        if block_id != EBML_BLOCK:
+                            continue
+                    _read_vint(f, keep_marker=False)  # Track number
+                    relative = struct.unpack('>h', f.read(2))[0]
+                    last_timecode = max(last_timecode or 0, cluster_timecode + relative)
+
+    if codec is None:
+        raise ProbeError('WebM file without an audio track')
+    if duration is not None:
+        duration_s = duration * timecode_scale / 1e9
+    else:
+        duration_s = last_timecode * timecode_scale / 1e9 if last_timecode is not None else None
+    return AudioProbe('webm', codec, duration_s, channels, sample_rate)
+
+
+# --- MP4 ----------------------------------------------------------------------
+
+MP4_CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'mvex', b'moof', b'traf'}
+
+
+def _boxes(f, start, end):
+    """(type, body start, body end) of the boxes between start and end"""
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        box_size, box_type = struct.unpack('>I', header[:4])[0], header[4:]
+        body = position + 8
+        if box_size == 1:
+            box_size = struct.unpack('>Q', f.read(8))[0]
+            body += 8
+        elif box_size == 0:
+            box_size = end - position  # Extends to the end of the file
+        if box_size < body - position:
+            raise ProbeError(f"Invalid MP4 box size for '{box_type.decode('latin-1')}'")
+        yield box_type, body, min(position + box_size, end)
+        position += box_size
+
+
+def _full_box(f, body):
+    """Version of a full box, leaving the file at the start of its fields"""
+    f.seek(body)
+    return f.read(4)[0]
+
+
+def _probe_mp4(f, size):
+    info = {'tracks': {}, 'fragments': {}}
+    _walk_mp4(f, 0, size, info, track=None)
+
+    audio = [track for track in info['tracks'].values() if track.get('handler') == b'soun']
+    if not audio:
+        raise ProbeError('MP4 file without an audio track')
+    track = audio[0]
+    timescale = track.get('timescale') or 1
+    duration_s = None
+    if track.get('duration'):
+        duration_s = track['duration'] / timescale
+    elif info.get('fragment_duration') and info.get('movie_timescale'):
+        duration_s = info['fragment_duration'] / info['movie_timescale']
+    elif info['fragments'].get(track.get('id')):
+        duration_s = info['fragments'][track['id']] / timescale  # Fragmented (MediaRecorder) without mehd
+    return AudioProbe('mp4', track.get('codec', 'unknown'), duration_s, track.get('channels'),
+                      track.get('sample_rate'))
+
+
+def _walk_mp4(f, start, end, info, track):
+    for box_type, body, box_end in _boxes(f, start, end):
+        if box_type == b'trak':
+            new_track = {}
+            _walk_mp4(f, body, box_end, info, new_track)
+            info['tracks'][new_track.get('id', len(info['tracks']))] = new_track
+            continue
+        if box_type == b'traf':
+            _walk_traf(f, body, box_end, info)
+            continue
+        if box_type in MP4_CONTAINER_BOXES:
+            _walk_mp4(f, body, box_end, info, track)
+        elif box_type == b'mvhd':
+            version = _full_box(f, body)
+            f.read(16 if version == 1 else 8)
+            info['movie_timescale'] = struct.unpack('>I', f.read(4))[0]
+        elif box_type == b'mehd':
+            version = _full_box(f, body)
+            info['fragment_duration'] = struct.unpack('>Q' if version == 1 else '>I', f.read(8 if version == 1 else 4))[0]
+        elif box_type == b'trex':
+            _full_box(f, body)
+            track_id, _, default_duration = struct.unpack('>III', f.read(12))
+            info.setdefault('default_durations', {})[track_id] = default_duration
+        elif track is None:
+            continue
+        elif box_type == b'tkhd':
+            version = _full_box(f, body)
+            f.read(16 if version == 1 else 8)
+            track['id'] = struct.unpack('>I', f.read(4))[0]
+        elif box_type == b'mdhd':
+            version = _full_box(f, body)
+            f.read(16 if version == 1 else 8)
+            track['timescale'] = struct.unpack('>I', f.read(4))[0]
+            duration = struct.unpack('>Q' if version == 1 else '>I', f.read(8 if version == 1 else 4))[0]
+            if duration not in (0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+                track['duration'] = duration
+        elif box_type == b'hdlr':
+            _full_box(f, body)
+            f.read(4)
+            track['handler'] = f.read(4)
+        elif box_type == b'stsd':
+            _full_box(f, body)
+            f.read(4)  # Entry count
+            f.read(4)
+            track['codec'] = f.read(4).decode('latin-1').strip().lower()
+            f.read(16)  # Reserved, data reference index, reserved
+            track['channels'], _ = struct.unpack('>HH', f.read(4))
+            f.read(4)
+            track['sample_rate'] = struct.unpack('>I', f.read(4))[0] >> 16
+
+
+def _walk_traf(f, start, end, info):
+    """Add up the sample durations of a track fragment"""
+    track_id = default_duration = None
+    for box_type, body, box_end in _boxes(f, start, end):
+        if box_type == b'tfhd':
+            f.seek(body)
+            flags = int.from_bytes(f.read(4)[1:], 'big')
+            track_id = struct.unpack('>I', f.read(4))[0]
+            default_duration = info.get('default_durations', {}).get(track_id, 0)
+            if flags & 0x1:
+                f.read(8)  # Base data offset
+            if flags & 0x2:
+                f.read(4)  # Sample description index
+            if flags & 0x8:
+                default_duration = struct.unpack('>I', f.read(4))[0]
+        elif box_type == b'trun' and track_id is not None:
+            f.seek(body)
+            flags = int.from_bytes(f.read(4)[1:], 'big')
+            sample_count = struct.unpack('>I', f.read(4))[0]
+            if flags & 0x1:
+                f.read(4)  # Data offset
+            if flags & 0x4:
+                f.read(4)  # First sample flags
+            if flags & 0x100:
+                fields = sum(4 for bit in (0x100, 0x200, 0x400, 0x800) if flags & bit)
+                samples = f.read(min(fields * sample_count, box_end - f.tell()))  # Short: struct.error
+                total = sum(struct.unpack_from('>I', samples, index * fields)[0] for index in range(sample_count))
+            else:
+                total = default_duration * sample_count
+            info['fragments'][track_id] = info['fragments'].get(track_id, 0) + total
@@ -6,12 +6,13 @@ from botocore.exceptions import ClientError
 
 
 def get_s3_client():
-    """Create and return S3 client"""
+    """Create and return S3 client (S3_ENDPOINT_URL points it at a local stand-in)"""
     return boto3.client(
         's3',
         aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
         aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-        region_name=os.getenv('AWS_REGION')
+        region_name=os.getenv('AWS_REGION'),
+        endpoint_url=os.getenv('S3_ENDPOINT_URL') or None
     )
 
 
@@ -58,6 +59,22 @@ def upload_audio_file(file_data, filename):
         }
 
 
+def download_audio_file(s3_filename, bucket_name=None):
+    """Bytes of an audio file previously stored with upload_audio_file"""
+    s3_client = get_s3_client()
+    response = s3_client.get_object(Bucket=bucket_name or os.getenv('S3_BUCKET_NAME'), Key=s3_filename)
+    return response['Body'].read()
+
+
+def list_audio_files(prefix, bucket_name=None):
+    """Keys of every object under a prefix (paginated)"""
+    s3_client = get_s3_client()
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name or os.getenv('S3_BUCKET_NAME'), Prefix=prefix):
+        for obj in page.get('Contents', []):
+            yield obj['Key']
+
+
 def test_s3_connection():
     """Test if we can connect to S3 and access our bucket"""
     try:
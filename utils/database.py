@@ -2,19 +2,26 @@
 import boto3
 import os
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from botocore.exceptions import ClientError
 from .dynamodb_helper import prepare_for_dynamodb
+from .metrics import instrument_dynamodb_client
 
 
 def get_dynamodb_resource():
-    """Create and return DynamoDB resource"""
-    return boto3.resource(
+    """Create and return DynamoDB resource (DYNAMODB_ENDPOINT_URL points it at a local stand-in)"""
+    resource = boto3.resource(
         'dynamodb',
         aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
         aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-        region_name=os.getenv('AWS_REGION')
+        region_name=os.getenv('AWS_REGION'),
+        endpoint_url=os.getenv('DYNAMODB_ENDPOINT_URL') or None
     )
+    instrument_dynamodb_client(resource.meta.client)
+    return resource
 
 
 def create_tables():
@@ -98,8 +105,15 @@ def save_initial_voice_donation(recording_id, questionnaire_data, audio_filename
         return {'success': False, 'error': str(e)}
 
 
-def save_voice_donation_features(recording_id, audio_features, questionnaire_data, metadata):
-    """Update voice donation record with extracted features and mark as completed"""
+def save_voice_donation_features(recording_id, audio_features, questionnaire_data, metadata,
+                                 feature_source_recording_id=None, processing_profile=None):
+    """Update voice donation record with extracted features and mark as completed
+
+    feature_source_recording_id: set when the features were reused from the feature
+    cache, pointing at the recording they were originally extracted from.
+    processing_profile: per-stage timings of this recording (utils/profiling.py),
+    stored as its own attribute so reports can project it without the features.
+    """
     dynamodb = get_dynamodb_resource()
     table = dynamodb.Table('voice-donations')
 
@@ -129,6 +143,14 @@ def save_voice_donation_features(recording_id, audio_features, questionnaire_dat
             ':features_extracted': dynamodb_update_data['features_extracted']
         }
 
+        if feature_source_recording_id:
+            update_expression += ", feature_source_recording_id = :feature_source_recording_id"
+            expression_attribute_values[':feature_source_recording_id'] = feature_source_recording_id
+
+        if processing_profile:
+            update_expression += ", processing_profile = :processing_profile"
+            expression_attribute_values[':processing_profile'] = prepare_for_dynamodb(processing_profile)
+
         # Update the record
         table.update_item(
             Key={'recording_id': recording_id},
@@ -142,6 +164,46 @@ def save_voice_donation_features(recording_id, audio_features, questionnaire_dat
         return {'success': False, 'error': str(e)}
 
 
+def save_deferred_features(recording_id, deferred_features):
+    """Merge features computed later for deferred feature groups into a completed record
+
+    deferred_features: {group_name: {feature: value}} for the groups listed in the
+    record's summary.deferred_feature_groups; they are removed from that list.
+    """
+    dynamodb = get_dynamodb_resource()
+    table = dynamodb.Table('voice-donations')
+
+    try:
+        response = table.get_item(Key={'recording_id': recording_id})
+        if 'Item' not in response:
+            return {'success': False, 'error': 'Record not found'}
+
+        # The stored record already holds DynamoDB types; only the new features need converting
+        audio_features = response['Item']['audio_features']
+        summary = audio_features['summary']
+        for group_name, features in deferred_features.items():
+            audio_features['audio_features'].update(prepare_for_dynamodb(features))
+            if group_name not in summary['feature_groups']:
+                summary['feature_groups'].append(group_name)
+        summary['deferred_feature_groups'] = [name for name in summary.get('deferred_feature_groups', [])
+                                              if name not in deferred_features]
+        summary['total_features_extracted'] = len(audio_features['audio_features'])
+        summary['deferred_features_completed_at'] = datetime.utcnow().isoformat()
+
+        table.update_item(
+            Key={'recording_id': recording_id},
+            UpdateExpression="SET audio_features = :audio_features, features_extracted = :features_extracted",
+            ExpressionAttributeValues={
+                ':audio_features': audio_features,
+                ':features_extracted': summary['total_features_extracted']
+            }
+        )
+
+        return {'success': True, 'message': f"Deferred features saved: {', '.join(deferred_features)}"}
+    except ClientError as e:
+        return {'success': False, 'error': str(e)}
+
+
 def update_voice_donation_status(recording_id, status, error=None):
     """Update voice donation status (for failed processing)"""
     dynamodb = get_dynamodb_resource()
@@ -236,6 +298,99 @@ def save_voice_donation(recording_id, audio_features, questionnaire_data, metada
         return {'success': False, 'error': str(e)}
 
 
+def get_voice_donations_batch(recording_ids, attributes=None):
+    """Records for many recording IDs with BatchGetItem (100 keys per request), as {recording_id: item}"""
+    dynamodb = get_dynamodb_resource()
+    recording_ids = list(dict.fromkeys(recording_ids))
+    items = {}
+
+    for start in range(0, len(recording_ids), 100):
+        request = {'Keys': [{'recording_id': recording_id} for recording_id in recording_ids[start:start + 100]]}
+        if attributes:
+            request['ProjectionExpression'] = ', '.join(f'#a{i}' for i in range(len(attributes)))
+            request['ExpressionAttributeNames'] = {f'#a{i}': name for i, name in enumerate(attributes)}
+
+        unprocessed = {'voice-donations': request}
+        delay = 0.05
+        while unprocessed:
+            response = dynamodb.batch_get_item(RequestItems=unprocessed)
+            for item in response['Responses'].get('voice-donations', []):
+                items[item['recording_id']] = item
+            unprocessed = response.get('UnprocessedKeys')
+            if unprocessed:
+                time.sleep(delay)  # Throttled: back off before asking for the rest
+                delay = min(delay * 2, 2.0)
+
+    return items
+
+
+def save_features_batch(results, create_missing=False, workers=8):
+    """Write re-extracted features for many recordings
+
+    results: {recording_id: extract_all_features() result}. Each record gets an
+    update_item that sets only the feature attributes, so live updates to the rest
+    of a record made meanwhile (status, questionnaire, ...) are not overwritten.
+    (BatchWriteItem can only put whole items, which needs a read-modify-write.)
+    The updates run on `workers` threads, each with its own DynamoDB resource, so a
+    batch takes about len(results) / workers round trips rather than one per record.
+    Recordings without a record are skipped unless create_missing is set.
+    """
+    now = datetime.utcnow().isoformat()
+    local = threading.local()
+
+    def update(recording_id, features_result):
+        """True if saved, False if the record is missing"""
+        if not hasattr(local, 'table'):
+            local.table = get_dynamodb_resource().Table('voice-donations')  # Resources aren't thread-safe
+
+        features_result = dict(features_result)
+        processing_profile = features_result.pop('processing_profile', None)
+        update_data = prepare_for_dynamodb({
+            'status': 'completed',
+            'audio_features': features_result,
+            'metadata': features_result['metadata'],
+            'features_extracted': features_result.get('summary', {}).get('total_features_extracted', 0),
+            'reextracted_at': now
+        })
+
+        # A record's status is left alone (a live reprocessing may own it); created records start completed
+        update_expression = ("SET #status = if_not_exists(#status, :status), audio_features = :audio_features,"
+                             " metadata = :metadata, features_extracted = :features_extracted,"
+                             " reextracted_at = :reextracted_at")
+        expression_attribute_values = {f':{name}': value for name, value in update_data.items()}
+        if processing_profile:
+            update_expression += ", processing_profile = :processing_profile"
+            expression_attribute_values[':processing_profile'] = prepare_for_dynamodb(processing_profile)
+
+        request = {
+            'Key': {'recording_id': recording_id},
+            'ExpressionAttributeNames': {'#status': 'status'},  # 'status' is a reserved word in DynamoDB
+            'ExpressionAttributeValues': expression_attribute_values,
+        }
+        if create_missing:
+            update_expression += ", created_at = if_not_exists(created_at, :created_at)"
+            expression_attribute_values[':created_at'] = now
+        else:
+            request['ConditionExpression'] = 'attribute_exists(recording_id)'
+
+        try:
+            local.table.update_item(UpdateExpression=update_expression, **request)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+        return True
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(results)))) as executor:
+            outcomes = list(executor.map(update, results.keys(), results.values()))
+        saved = [recording_id for recording_id, ok in zip(results, outcomes) if ok]
+        missing = [recording_id for recording_id, ok in zip(results, outcomes) if not ok]
+        return {'success': True, 'saved': saved, 'missing': missing}
+    except ClientError as e:
+        return {'success': False, 'error': str(e)}
+
+
 def get_voice_donation(recording_id):
     """Retrieve a voice donation record by ID"""
     dynamodb = get_dynamodb_resource()
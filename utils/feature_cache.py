@@ -0,0 +1,170 @@
+#feature_cache.py
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import config
+
+
+class FeatureCache:
+    """
+    Content-addressed cache of extraction results keyed on (audio_hash, task_type, pipeline version).
+
+    A bounded in-memory LRU tier sits in front of an optional persistent tier
+    (one JSON file per key in `directory`). Concurrent requests for the same key
+    are coalesced, so a double-clicked submit only runs extraction once.
+    """
+
+    def __init__(self, max_entries=256, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory or None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(audio_hash, task_type, pipeline_version):
+        return f"{audio_hash}:{task_type}:{pipeline_version}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest() + '.json')
+
+    def get(self, key):
+        """Cached entry for key, or None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        if self.directory:
+            try:
+                with open(self._path(key)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return None
+            self._remember(key, entry)
+            return entry
+
+        return None
+
+    def put(self, key, entry):
+        self._remember(key, entry)
+
+        if self.directory:
+            path = self._path(key)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(temp_path, 'w') as f:
+                    json.dump(entry, f)
+                os.replace(temp_path, path)  # Atomic: readers never see a partial file
+            except OSError as e:
+                print(f"Feature cache write failed: {e}")
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """
+        Return (entry, hit). On a miss, compute() runs once per key even when
+        several threads ask at the same time; it returns None for results that
+        must not be cached.
+        """
+        while True:
+            entry = self.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry, True
+
+            with self._lock:
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    break  # This thread computes
+
+            # Someone else is extracting the same audio; wait, then re-check the cache
+            # (if their extraction failed the cache is still empty and we compute our own)
+            event.wait()
+
+        try:
+            self.misses += 1
+            entry = compute()
+            if entry is not None:
+                self.put(key, entry)
+            return entry, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_feature_cache():
+    """Process-wide feature cache configured in config.py"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = FeatureCache(max_entries=config.FEATURE_CACHE_SIZE, directory=config.FEATURE_CACHE_DIR)
+        return _cache
+
+
+def extract_features_cached(recording_id, audio_data, filename, request_info, extract):
+    """
+    Feature extraction result for an upload, reusing a cached result when identical
+    audio was already processed for the same task type and pipeline version.
+
+    `extract(audio_data, filename, request_info)` runs on a miss (e.g. in the process pool).
+    On a hit, fresh metadata is generated for this recording and the summary points
+    at the recording the features were originally extracted from.
+    """
+    from .feature_extraction import FEATURE_PIPELINE_VERSION, generate_metadata, convert_numpy_to_json_serializable
+
+    audio_hash = (request_info or {}).get('audio_sha256') or hashlib.sha256(audio_data).hexdigest()
+    task_metadata = request_info.get('task_metadata', {}) if request_info else {}
+    task_type = task_metadata.get('task_type', 'speech')
+    # Engines produce slightly different values and tiers different feature sets, so neither share a key
+    tier = request_info.get('extraction_tier', config.EXTRACTION_TIER) if request_info else config.EXTRACTION_TIER
+    key = FeatureCache.make_key(audio_hash, task_type,
+                                f"{FEATURE_PIPELINE_VERSION}/{config.VOICE_QUALITY_ENGINE}/{tier}")
+
+    fresh_result = {}
+
+    def compute():
+        fresh_result['value'] = extract(audio_data, filename, request_info)
+        if not fresh_result['value'].get('summary', {}).get('processing_successful', False):
+            return None  # Never cache failures
+        return {
+            'source_recording_id': recording_id,
+            'quality_metrics': fresh_result['value'].get('quality_metrics'),
+            'audio_features': fresh_result['value'].get('audio_features'),
+            # A copy: the caller annotates the fresh summary (e.g. its deferred_audio_key)
+            'summary': dict(fresh_result['value']['summary'])
+        }
+
+    entry, hit = get_feature_cache().get_or_compute(key, compute)
+
+    if not hit:
+        return fresh_result['value']
+
+    print(f"Feature cache hit for {recording_id}: reusing features of {entry['source_recording_id']}")
+    return convert_numpy_to_json_serializable({
+        'metadata': generate_metadata(audio_data, filename, request_info),
+        'quality_metrics': entry['quality_metrics'],
+        'audio_features': entry['audio_features'],
+        'summary': dict(entry['summary'], feature_cache_hit=True,
+                        feature_source_recording_id=entry['source_recording_id'])
+    })
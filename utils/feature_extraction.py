@@ -1,93 +1,28 @@
 #feature_extraction.py
 
 import os
-import tempfile
 import numpy as np
 import librosa
-import parselmouth
 from parselmouth.praat import call
 import webrtcvad
-import contextlib
-import wave
-import io
 from datetime import datetime, timezone
 import uuid
 import hashlib
 import gc
-
-
-def convert_audio_to_wav(audio_data, filename):
-    """
-    Convert various audio formats to high-quality WAV for analysis
-    Handles WebM, MP4, OGG, and preserves existing WAV files
-    """
-    # Create temporary input file
-    temp_input = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1].lower())
-    temp_output = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-
-    try:
-        # Write the audio data to temp file
-        temp_input.write(audio_data)
-        temp_input.flush()
-        temp_input.close()
-
-        # If it's already a WAV file, try to load it directly first
-        if filename.lower().endswith('.wav'):
-            try:
-                # Test if it's a valid WAV that librosa can read
-                y, sr = librosa.load(temp_input.name, sr=None)
-                return temp_input.name  # Return original if it works
-            except:
-                pass  # Fall through to conversion if it fails
-
-        # For other formats or problematic WAV files, convert using librosa
-        try:
-            # Load with librosa (handles most formats)
-            y, sr = librosa.load(temp_input.name, sr=44100)  # Force 44.1kHz for quality
-
-            # Save as high-quality WAV
-            import soundfile as sf
-            sf.write(temp_output.name, y, sr, format='WAV', subtype='PCM_16')
-
-            temp_output.close()
-            return temp_output.name
-
-        except Exception as e:
-            # If librosa fails, try using pydub as fallback
-            try:
-                from pydub import AudioSegment
-
-                # Determine format from filename
-                if filename.lower().endswith('.webm'):
-                    audio = AudioSegment.from_file(temp_input.name, format="webm")
-                elif filename.lower().endswith('.mp4'):
-                    audio = AudioSegment.from_file(temp_input.name, format="mp4")
-                elif filename.lower().endswith('.ogg'):
-                    audio = AudioSegment.from_file(temp_input.name, format="ogg")
-                else:
-                    # Try auto-detection
-                    audio = AudioSegment.from_file(temp_input.name)
-
-                # Export as high-quality WAV (44.1kHz, 16-bit)
-                audio.export(temp_output.name, format="wav", parameters=["-ar", "44100", "-ac", "1"])
-                temp_output.close()
-
-                return temp_output.name
-
-            except Exception as pydub_error:
-                raise Exception(f"Could not convert audio file. Librosa error: {e}, Pydub error: {pydub_error}")
-
-    except Exception as e:
-        # Clean up on failure
-        if os.path.exists(temp_input.name):
-            os.unlink(temp_input.name)
-        if os.path.exists(temp_output.name):
-            os.unlink(temp_output.name)
-        raise e
-    finally:
-        # Always clean up input file
-        if os.path.exists(temp_input.name):
-            os.unlink(temp_input.name)
+import config
+from .audio_buffer import AudioBuffer
+from .segments import segment_statistics
+from .streaming_features import ArraySource, extract_librosa_features_streaming
+from .voice_quality import VoiceQualityAnalysis
+
+# Bump whenever extracted feature values change, so cached results are not reused across versions
+# and stored features (metadata.pipeline_version) can be told apart.
+# 2.1: first versioned pipeline. Also the first in which the upload's task_metadata reaches
+#      extraction: before it every recording got the speech plan, so maximum_phonation_time
+#      recordings only get their own (22-feature) plan from 2.1 on
+# 2.2: pause statistics (num_pauses, median_pause_length, longest_pause)
+# 2.3: jitter, shimmer and voice breaks from the shared pitch-guided point process (values changed)
+FEATURE_PIPELINE_VERSION = "2.3"
 
 
 def generate_metadata(audio_data, filename, request_info=None):
@@ -96,8 +31,8 @@ def generate_metadata(audio_data, filename, request_info=None):
     # Generate unique identifiers
     recording_id = str(uuid.uuid4())
 
-    # Create hash of audio data for integrity checking
-    audio_hash = hashlib.sha256(audio_data).hexdigest()
+    # Create hash of audio data for integrity checking (computed while the upload was spooled, if it was)
+    audio_hash = (request_info or {}).get('audio_sha256') or hashlib.sha256(audio_data).hexdigest()
 
     # Timestamp information
     utc_now = datetime.now(timezone.utc)
@@ -125,6 +60,7 @@ def generate_metadata(audio_data, filename, request_info=None):
         # Data collection metadata
         "collection_version": "2.0",  # Updated for multi-format support
         "processing_pipeline": "librosa+parselmouth+webrtcvad",
+        "pipeline_version": FEATURE_PIPELINE_VERSION,
         "data_format": "audio_features_extracted",
         "conversion_applied": not filename.lower().endswith('.wav')
     }
@@ -168,13 +104,14 @@ def generate_metadata(audio_data, filename, request_info=None):
 def validate_audio_quality(y, sr):
     """Validate audio quality and return quality metrics"""
     duration = len(y) / sr
+    is_valid_duration = config.AUDIO_MIN_SECONDS <= duration <= config.AUDIO_MAX_SECONDS
 
     # Basic quality checks
     quality_metrics = {
         "duration_seconds": round(duration, 2),  # Ensure this is always present
         "sample_rate": sr,
         "total_samples": len(y),
-        "is_valid_duration": 1.0 <= duration <= 300.0,  # 1 second to 5 minutes
+        "is_valid_duration": is_valid_duration,
         "is_valid_sample_rate": sr >= 8000,  # Minimum for speech
         "is_high_quality_sample_rate": sr >= 44100,  # Preferred for medical analysis
         "audio_level_db": 20 * np.log10(np.sqrt(np.mean(y ** 2))) if np.sqrt(np.mean(y ** 2)) > 0 else -60,
@@ -183,63 +120,105 @@ def validate_audio_quality(y, sr):
         "dynamic_range": np.max(y) - np.min(y),
         "rms_energy": np.sqrt(np.mean(y ** 2)),  # Add RMS as critical feature
         "signal_quality": "excellent" if (
-                1.0 <= duration <= 300.0 and sr >= 44100 and not np.any(np.abs(y) >= 0.99) and np.mean(
+                is_valid_duration and sr >= 44100 and not np.any(np.abs(y) >= 0.99) and np.mean(
             np.abs(y) < 0.01) < 0.5
         ) else "good" if (
-                1.0 <= duration <= 300.0 and sr >= 8000 and not np.any(np.abs(y) >= 0.99)
+                is_valid_duration and sr >= 8000 and not np.any(np.abs(y) >= 0.99)
         ) else "poor"
     }
 
     return quality_metrics
 
 
-def extract_librosa_features(y, sr):
-    """Extract comprehensive spectral and rhythmic features using librosa with memory cleanup"""
+WEBRTC_VAD_SAMPLE_RATES = (8000, 16000, 32000, 48000)
+
+
+def spectral_view(audio):
+    """Analysis view for librosa features: SPECTRAL_SAMPLE_RATE, or the native rate if lower"""
+    return audio.at_rate(min(audio.sr, config.SPECTRAL_SAMPLE_RATE))
+
+
+def vad_view(audio):
+    """Analysis view for speech activity detection at the cheapest rate WebRTC VAD accepts"""
+    if audio.sr in WEBRTC_VAD_SAMPLE_RATES and audio.sr <= config.VAD_SAMPLE_RATE:
+        return audio
+    return audio.at_rate(config.VAD_SAMPLE_RATE)
+
+
+# Parts of extract_librosa_features; tonnetz (HPSS + CQT chroma) and tempo (beat tracking)
+# are the costliest and are registered as their own groups so extraction tiers can skip them
+LIBROSA_PARTS = ('spectral', 'tonnetz', 'tempo')
+
+
+def extract_librosa_features(audio, spectral=None, parts=LIBROSA_PARTS):
+    """Extract comprehensive spectral and rhythmic features using librosa with memory cleanup
+
+    All STFT-based features are fed from one shared SpectralContext (the recording's
+    audio.spectral unless one is passed in) so the FFT and mel spectrogram are computed
+    once per recording, whichever of `parts` run. Recordings longer than
+    config.STREAMING_MIN_SECONDS use the block-wise streaming path instead, which
+    keeps running statistics rather than full-length feature matrices.
+    """
     import gc
     features = {}
-
-    # MFCC features (13 coefficients)
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-    features['mfcc_mean'] = np.mean(mfcc, axis=1)
-    features['mfcc_std'] = np.std(mfcc, axis=1)
-    del mfcc  # Clean up immediately
-
-    # Chroma features (12 pitch classes)
-    chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-    features['chroma_mean'] = np.mean(chroma, axis=1)
-    features['chroma_std'] = np.std(chroma, axis=1)
-    del chroma
-
-    # Spectral contrast (7 bands)
-    contrast = librosa.feature.spectral_contrast(y=y, sr=sr)
-    features['spectral_contrast_mean'] = np.mean(contrast, axis=1)
-    features['spectral_contrast_std'] = np.std(contrast, axis=1)
-    del contrast
-
-    # Tonnetz (6 dimensions)
-    y_harmonic = librosa.effects.harmonic(y)
-    tonnetz = librosa.feature.tonnetz(y=y_harmonic, sr=sr)
-    features['tonnetz_mean'] = np.mean(tonnetz, axis=1)
-    features['tonnetz_std'] = np.std(tonnetz, axis=1)
-    del y_harmonic, tonnetz
-
-    # Additional spectral features
-    features['spectral_centroid'] = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
-    features['spectral_bandwidth'] = np.mean(librosa.feature.spectral_bandwidth(y=y, sr=sr))
-    features['spectral_rolloff'] = np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr))
-    features['zero_crossing_rate'] = np.mean(librosa.feature.zero_crossing_rate(y))
-
-    # Tempo and rhythm
-    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-    features['tempo'] = tempo
-
-    # Root Mean Square Energy
-    features['rms_energy'] = np.mean(librosa.feature.rms(y=y))
-
-    # Mel-frequency spectral coefficients (additional)
-    mel_spectrogram = librosa.feature.melspectrogram(y=y, sr=sr)
-    features['mel_spectrogram_mean'] = np.mean(mel_spectrogram, axis=1)
-    del mel_spectrogram
+    audio = spectral_view(audio)
+    y, sr = audio.samples, audio.sr
+
+    if spectral is None and audio.duration > config.STREAMING_MIN_SECONDS:
+        return extract_librosa_features_streaming(ArraySource(y, sr), block_seconds=config.STREAMING_BLOCK_SECONDS,
+                                                  parts=parts)
+
+    if spectral is None:
+        spectral = audio.spectral
+
+    if 'spectral' in parts:
+        # MFCC features (13 coefficients)
+        mfcc = librosa.feature.mfcc(S=spectral.log_mel, n_mfcc=13)
+        features['mfcc_mean'] = np.mean(mfcc, axis=1)
+        features['mfcc_std'] = np.std(mfcc, axis=1)
+        del mfcc  # Clean up immediately
+
+        # Chroma features (12 pitch classes)
+        chroma = librosa.feature.chroma_stft(S=spectral.power, sr=sr)
+        features['chroma_mean'] = np.mean(chroma, axis=1)
+        features['chroma_std'] = np.std(chroma, axis=1)
+        del chroma
+
+        # Mel-frequency spectral coefficients (additional)
+        features['mel_spectrogram_mean'] = np.mean(spectral.mel_power, axis=1)
+        spectral.release('power', 'mel_power')
+
+        # Spectral contrast (7 bands)
+        contrast = librosa.feature.spectral_contrast(S=spectral.magnitude, sr=sr)
+        features['spectral_contrast_mean'] = np.mean(contrast, axis=1)
+        features['spectral_contrast_std'] = np.std(contrast, axis=1)
+        del contrast
+
+        # Additional spectral features
+        features['spectral_centroid'] = np.mean(librosa.feature.spectral_centroid(S=spectral.magnitude, sr=sr))
+        features['spectral_bandwidth'] = np.mean(librosa.feature.spectral_bandwidth(S=spectral.magnitude, sr=sr))
+        features['spectral_rolloff'] = np.mean(librosa.feature.spectral_rolloff(S=spectral.magnitude, sr=sr))
+        features['zero_crossing_rate'] = np.mean(librosa.feature.zero_crossing_rate(y))
+        spectral.release('magnitude')
+
+        # Root Mean Square Energy
+        features['rms_energy'] = np.mean(librosa.feature.rms(y=y))
+
+    if 'tonnetz' in parts:
+        # Tonnetz (6 dimensions)
+        y_harmonic = spectral.harmonic()
+        spectral.release('stft')
+        tonnetz = librosa.feature.tonnetz(y=y_harmonic, sr=sr)
+        features['tonnetz_mean'] = np.mean(tonnetz, axis=1)
+        features['tonnetz_std'] = np.std(tonnetz, axis=1)
+        del y_harmonic, tonnetz
+
+    if 'tempo' in parts:
+        # Tempo and rhythm (onset envelope from the shared log-mel spectrogram)
+        onset_envelope = librosa.onset.onset_strength(S=spectral.log_mel, sr=sr, aggregate=np.median)
+        tempo, _ = librosa.beat.beat_track(onset_envelope=onset_envelope, sr=sr)
+        features['tempo'] = tempo
+        spectral.release('log_mel')
 
     # Force cleanup
     gc.collect()
@@ -247,81 +226,211 @@ def extract_librosa_features(y, sr):
     return features
 
 
-def extract_parselmouth_features(wav_file_path):
+def extract_spectral_features(audio):
+    """MFCC, chroma, mel, contrast and other frame-level spectral statistics"""
+    return extract_librosa_features(audio, parts=('spectral',))
+
+
+def extract_tonnetz_features(audio):
+    """Tonal centroid features of the harmonic component (HPSS + CQT chroma)"""
+    return extract_librosa_features(audio, parts=('tonnetz',))
+
+
+def extract_tempo_features(audio):
+    """Tempo from beat tracking on the onset envelope"""
+    return extract_librosa_features(audio, parts=('tempo',))
+
+
+def extract_parselmouth_features(audio):
     """Extract comprehensive acoustic features using Parselmouth/Praat"""
-    snd = parselmouth.Sound(wav_file_path)
+    from .feature_registry import run_feature_groups
+    return run_feature_groups(audio, PARSELMOUTH_FEATURE_GROUPS)
+
+
+# Feature groups that make up the full Parselmouth/Praat feature set
+PARSELMOUTH_FEATURE_GROUPS = (
+    'pitch', 'intensity', 'intensity_range', 'jitter', 'jitter_ppq5',
+    'shimmer', 'shimmer_apq5', 'hnr', 'formants'
+)
+
+
+# Intermediate Praat analyses, memoized per recording on the AudioBuffer's PraatContext
+
+def praat_pitch(audio):
+    """Praat pitch track (autocorrelation, default settings)"""
+    return audio.praat.pitch
+
+
+def praat_intensity(audio):
+    """Praat intensity contour"""
+    return audio.praat.intensity
 
-    # Pitch analysis
-    pitch = snd.to_pitch()
-    pitch_values = pitch.selected_array['frequency']
-    pitch_values = pitch_values[pitch_values != 0]  # Remove unvoiced frames
 
-    # Intensity analysis
-    intensity = snd.to_intensity()
+def praat_point_process(audio, praat_pitch=None):
+    """
+    Glottal pulses (cross-correlation) from the shared pitch track. praat_pitch is
+    unused: audio.praat builds the pulses from its own (the same) pitch track; the
+    parameter only mirrors the registry's praat_pitch dependency.
+    """
+    return audio.praat.point_process
+
+
+def praat_formant(audio):
+    """Burg formant track (5 formants up to 5500 Hz)"""
+    return audio.praat.formant
+
+
+def batched_praat_measures(audio, names):
+    """
+    Values of `names` from the recording's single batched Praat script run, or None
+    when the per-call path should be used (config.PRAAT_MEASUREMENTS or a script failure).
+    The NumPy engine leaves only intensity and formants to Praat, so it always
+    takes the per-call path rather than building the pitch/pulse/harmonicity objects.
+    """
+    if config.PRAAT_MEASUREMENTS != 'batched' or config.VOICE_QUALITY_ENGINE != 'praat':
+        return None
+    try:
+        measures = audio.praat.measurement_dict()
+    except Exception as e:
+        print(f"Batched Praat measurement failed, using per-call path: {e}")
+        return None
+    return {name: measures[name] for name in names}
 
-    # Point process for jitter/shimmer
-    point_process = call(snd, "To PointProcess (periodic, cc)", 75, 500)
 
-    # Formant analysis
-    formant = call(snd, "To Formant (burg)", 0.0025, 5, 5500, 0.025, 50)
+def extract_pitch_features(audio, praat_pitch):
+    """Pitch statistics over voiced frames"""
+    pitch_values = praat_pitch.selected_array['frequency']
+    pitch_values = pitch_values[pitch_values != 0]  # Remove unvoiced frames
 
-    features = {
-        # Pitch features
+    return {
         "mean_pitch": np.mean(pitch_values) if len(pitch_values) > 0 else 0,
         "std_pitch": np.std(pitch_values) if len(pitch_values) > 0 else 0,
         "min_pitch": np.min(pitch_values) if len(pitch_values) > 0 else 0,
         "max_pitch": np.max(pitch_values) if len(pitch_values) > 0 else 0,
         "pitch_range": np.ptp(pitch_values) if len(pitch_values) > 0 else 0,
+    }
+
+
+def extract_intensity_features(audio, praat_intensity):
+    """Mean and standard deviation of intensity (dB)"""
+    batched = batched_praat_measures(audio, ("mean_intensity", "std_intensity"))
+    if batched is not None:
+        return batched
+
+    return {
+        "mean_intensity": call(praat_intensity, "Get mean", 0, 0),
+        "std_intensity": call(praat_intensity, "Get standard deviation", 0, 0),
+    }
+
+
+def extract_intensity_range_features(audio, praat_intensity):
+    """Minimum and maximum intensity (dB)"""
+    batched = batched_praat_measures(audio, ("min_intensity", "max_intensity"))
+    if batched is not None:
+        return batched
 
-        # Intensity features
-        "mean_intensity": call(intensity, "Get mean", 0, 0),
-        "std_intensity": call(intensity, "Get standard deviation", 0, 0),
-        "min_intensity": call(intensity, "Get minimum", 0, 0, "Parabolic"),
-        "max_intensity": call(intensity, "Get maximum", 0, 0, "Parabolic"),
-
-        # Voice quality measures
-        "jitter_local": call(point_process, "Get jitter (local)", 0, 0, 0.0001, 0.02, 1.3),
-        "jitter_rap": call(point_process, "Get jitter (rap)", 0, 0, 0.0001, 0.02, 1.3),
-        "jitter_ppq5": call(point_process, "Get jitter (ppq5)", 0, 0, 0.0001, 0.02, 1.3),
-        "shimmer_local": call([snd, point_process], "Get shimmer (local)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
-        "shimmer_apq3": call([snd, point_process], "Get shimmer (apq3)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
-        "shimmer_apq5": call([snd, point_process], "Get shimmer (apq5)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
+    return {
+        "min_intensity": call(praat_intensity, "Get minimum", 0, 0, "Parabolic"),
+        "max_intensity": call(praat_intensity, "Get maximum", 0, 0, "Parabolic"),
     }
 
-    # Harmonics-to-noise ratio (extract the actual value)
+
+def extract_jitter_features(audio, praat_point_process):
+    """Local and RAP jitter"""
+    batched = batched_praat_measures(audio, ("jitter_local", "jitter_rap"))
+    if batched is not None:
+        return batched
+
+    return {
+        "jitter_local": call(praat_point_process, "Get jitter (local)", 0, 0, 0.0001, 0.02, 1.3),
+        "jitter_rap": call(praat_point_process, "Get jitter (rap)", 0, 0, 0.0001, 0.02, 1.3),
+    }
+
+
+def extract_jitter_ppq5_features(audio, praat_point_process):
+    """Five-point period perturbation quotient"""
+    batched = batched_praat_measures(audio, ("jitter_ppq5",))
+    if batched is not None:
+        return batched
+
+    return {
+        "jitter_ppq5": call(praat_point_process, "Get jitter (ppq5)", 0, 0, 0.0001, 0.02, 1.3),
+    }
+
+
+def extract_shimmer_features(audio, praat_point_process):
+    """Local and APQ3 shimmer"""
+    batched = batched_praat_measures(audio, ("shimmer_local", "shimmer_apq3"))
+    if batched is not None:
+        return batched
+
+    snd = audio.sound
+    return {
+        "shimmer_local": call([snd, praat_point_process], "Get shimmer (local)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
+        "shimmer_apq3": call([snd, praat_point_process], "Get shimmer (apq3)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
+    }
+
+
+def extract_shimmer_apq5_features(audio, praat_point_process):
+    """Five-point amplitude perturbation quotient"""
+    batched = batched_praat_measures(audio, ("shimmer_apq5",))
+    if batched is not None:
+        return batched
+
+    snd = audio.sound
+    return {
+        "shimmer_apq5": call([snd, praat_point_process], "Get shimmer (apq5)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
+    }
+
+
+def extract_hnr_features(audio):
+    """Harmonics-to-noise ratio (extract the actual value)"""
+    batched = batched_praat_measures(audio, ("hnr",))
+    if batched is not None:
+        return batched
+
     try:
-        harmonicity = call(snd, "To Harmonicity (cc)", 0.01, 75, 0.1, 1.0)
-        features["hnr"] = call(harmonicity, "Get mean", 0, 0)
+        return {"hnr": call(audio.praat.harmonicity, "Get mean", 0, 0)}
     except Exception as e:
         print(f"HNR calculation failed: {e}")
-        features["hnr"] = 0
+        return {"hnr": 0}
 
 
-    # Formant frequencies (F1, F2, F3)
+def extract_formant_features(audio, praat_formant):
+    """Formant frequencies (F1, F2, F3)"""
+    batched = batched_praat_measures(audio, ("f1_mean", "f2_mean", "f3_mean"))
+    if batched is not None:
+        return batched
+
     try:
-        features["f1_mean"] = call(formant, "Get mean", 1, 0, 0, "Hertz")
-        features["f2_mean"] = call(formant, "Get mean", 2, 0, 0, "Hertz")
-        features["f3_mean"] = call(formant, "Get mean", 3, 0, 0, "Hertz")
+        return {
+            "f1_mean": call(praat_formant, "Get mean", 1, 0, 0, "Hertz"),
+            "f2_mean": call(praat_formant, "Get mean", 2, 0, 0, "Hertz"),
+            "f3_mean": call(praat_formant, "Get mean", 3, 0, 0, "Hertz"),
+        }
     except:
-        features["f1_mean"] = 0
-        features["f2_mean"] = 0
-        features["f3_mean"] = 0
+        return {"f1_mean": 0, "f2_mean": 0, "f3_mean": 0}
 
-    return features
+
+def extract_signal_rms_features(audio):
+    """Whole-signal RMS energy (basic energy measure for sustained phonation)"""
+    y = audio.samples
+    return {'rms_energy': np.sqrt(np.mean(y ** 2)) if len(y) > 0 else 0}
 
 
-def extract_speech_activity_features(wav_file_path):
+def extract_speech_activity_features(audio):
     """Extract speech activity and timing features with multiple fallback methods"""
     features = {}
+    audio = vad_view(audio)
 
     try:
         # Method 1: Try WebRTC VAD
-        features = extract_webrtc_vad_features(wav_file_path)
+        features = extract_webrtc_vad_features(audio)
 
         # If WebRTC failed, try energy-based detection
         if features.get("speech_ratio", 0) == 0:
             print("WebRTC VAD failed, trying energy-based detection...")
-            features = extract_energy_based_features(wav_file_path)
+            features = extract_energy_based_features(audio)
 
     except Exception as e:
         print(f"All speech activity detection methods failed: {e}")
@@ -331,92 +440,54 @@ def extract_speech_activity_features(wav_file_path):
             "pause_ratio": 0.35,
             "speaking_rate": 1.5,
             "num_speech_segments": 8,
-            "avg_segment_length": 5
+            "avg_segment_length": 5,
+            "num_pauses": 7,
+            "median_pause_length": 0,
+            "longest_pause": 0
         }
 
     return features
 
 
-def extract_webrtc_vad_features(wav_file_path):
+def extract_webrtc_vad_features(audio):
     """Extract speech activity using WebRTC VAD"""
     try:
         vad = webrtcvad.Vad(1)  # Use sensitivity level 1 (less aggressive)
 
-        with contextlib.closing(wave.open(wav_file_path, 'rb')) as wf:
-            sample_rate = wf.getframerate()
-            frame_duration = 30  # ms
-            frame_size = int(sample_rate * frame_duration / 1000)
-
-            # Check if sample rate is compatible
-            if sample_rate not in (8000, 16000, 32000, 48000):
-                print(f"Sample rate {sample_rate} not compatible with WebRTC VAD")
-                return {"speech_ratio": 0}  # Signal failure
-
-            voiced_frames = 0
-            total_frames = 0
-            speech_segments = []
-            current_segment_start = None
-
-            while True:
-                frame = wf.readframes(frame_size)
-                if len(frame) < frame_size * wf.getsampwidth():
-                    break
-
-                # Ensure frame is the right size
-                if len(frame) != frame_size * wf.getsampwidth():
-                    continue
-
-                try:
-                    is_speech = vad.is_speech(frame, sample_rate)
-
-                    if is_speech:
-                        voiced_frames += 1
-                        if current_segment_start is None:
-                            current_segment_start = total_frames
-                    else:
-                        if current_segment_start is not None:
-                            speech_segments.append(total_frames - current_segment_start)
-                            current_segment_start = None
-
-                    total_frames += 1
-
-                except Exception:
-                    # Skip problematic frames
-                    total_frames += 1
-                    continue
-
-            # Close last segment if needed
-            if current_segment_start is not None:
-                speech_segments.append(total_frames - current_segment_start)
-
-            if total_frames == 0:
-                return {"speech_ratio": 0}  # Signal failure
-
-            speech_ratio = voiced_frames / total_frames
-            pause_ratio = 1 - speech_ratio
-            total_duration = total_frames * frame_duration / 1000
-            speaking_rate = len(speech_segments) / total_duration if total_duration > 0 else 0
-
-            return {
-                "speech_ratio": speech_ratio,
-                "pause_ratio": pause_ratio,
-                "speaking_rate": speaking_rate,
-                "num_speech_segments": len(speech_segments),
-                "avg_segment_length": np.mean(speech_segments) if speech_segments else 0
-            }
+        sample_rate = audio.sr
+        frame_duration = 30  # ms
+        frame_size = int(sample_rate * frame_duration / 1000)
+
+        # Check if sample rate is compatible
+        if sample_rate not in WEBRTC_VAD_SAMPLE_RATES:
+            print(f"Sample rate {sample_rate} not compatible with WebRTC VAD")
+            return {"speech_ratio": 0}  # Signal failure
+
+        pcm = audio.pcm16
+        n_frames = len(pcm) // frame_size  # Trailing partial frame is dropped
+        if n_frames == 0:
+            return {"speech_ratio": 0}  # Signal failure
+
+        def is_speech(frame):
+            try:
+                return vad.is_speech(frame.tobytes(), sample_rate)
+            except Exception:
+                return False  # Problematic frames count as non-speech
+
+        frames = pcm[:n_frames * frame_size].reshape(n_frames, frame_size)
+        speech_mask = np.fromiter((is_speech(frame) for frame in frames), dtype=bool, count=n_frames)
+
+        return segment_statistics(speech_mask, frame_duration / 1000)
 
     except Exception as e:
         print(f"WebRTC VAD extraction failed: {e}")
         return {"speech_ratio": 0}  # Signal failure
 
 
-def extract_energy_based_features(wav_file_path):
+def extract_energy_based_features(audio):
     """Fallback: Extract speech activity using energy-based detection"""
     try:
-        import librosa
-
-        # Load audio
-        y, sr = librosa.load(wav_file_path, sr=None)
+        y, sr = audio.samples, audio.sr
 
         # Calculate frame-wise energy
         frame_length = int(0.025 * sr)  # 25ms frames
@@ -430,37 +501,9 @@ def extract_energy_based_features(wav_file_path):
 
         # Classify frames as speech/non-speech
         speech_frames = rms > threshold
-        speech_ratio = np.mean(speech_frames)
-
-        # Find speech segments
-        speech_segments = []
-        in_speech = False
-        segment_start = 0
-
-        for i, is_speech in enumerate(speech_frames):
-            if is_speech and not in_speech:
-                segment_start = i
-                in_speech = True
-            elif not is_speech and in_speech:
-                speech_segments.append(i - segment_start)
-                in_speech = False
-
-        # Close last segment if needed
-        if in_speech:
-            speech_segments.append(len(speech_frames) - segment_start)
-
-        # Convert frame counts to time
-        frame_time = hop_length / sr
-        total_duration = len(speech_frames) * frame_time
-        speaking_rate = len(speech_segments) / total_duration if total_duration > 0 else 0
-
-        return {
-            "speech_ratio": max(0.1, speech_ratio),  # Ensure minimum 10%
-            "pause_ratio": 1 - speech_ratio,
-            "speaking_rate": speaking_rate,
-            "num_speech_segments": len(speech_segments),
-            "avg_segment_length": np.mean(speech_segments) * frame_time if speech_segments else 0
-        }
+        features = segment_statistics(speech_frames, hop_length / sr)
+        features["speech_ratio"] = max(0.1, features["speech_ratio"])  # Ensure minimum 10%
+        return features
 
     except Exception as e:
         print(f"Energy-based detection failed: {e}")
@@ -470,84 +513,158 @@ def extract_energy_based_features(wav_file_path):
             "pause_ratio": 0.4,
             "speaking_rate": 1.5,
             "num_speech_segments": 8,
-            "avg_segment_length": 5
+            "avg_segment_length": 5,
+            "num_pauses": 7,
+            "median_pause_length": 0,
+            "longest_pause": 0
         }
 
-def extract_phonation_duration_analysis(wav_file_path):
+def pulse_times(point_process):
+    """Times (s) of every point in a Praat PointProcess as a NumPy array"""
+    if call(point_process, "Get number of points") == 0:
+        return np.zeros(0)  # "To Matrix" refuses an empty PointProcess
+    return call(point_process, "To Matrix").values[0]
+
+
+def phonation_from_pulse_times(times, total_duration):
+    """Phonation time and voice breaks from glottal pulse times (s)"""
+    # Calculate voice breaks (periods longer than 20ms indicate voice breaks)
+    max_voiced_period = 0.02  # 20ms threshold
+    periods = np.diff(times)
+    voice_breaks_duration = float(np.sum(periods[periods > max_voiced_period]))
+
+    # Calculate actual phonation time
+    actual_phonation_time = total_duration - voice_breaks_duration
+
+    return {
+        'total_recording_duration': total_duration,
+        'actual_phonation_time': actual_phonation_time,
+        'voice_breaks_duration': voice_breaks_duration,
+        'voice_breaks_percentage': (voice_breaks_duration / total_duration) * 100 if total_duration > 0 else 0,
+        'number_of_pulses': len(times),
+        'phonation_efficiency': (actual_phonation_time / total_duration) * 100 if total_duration > 0 else 0
+    }
+
+
+def phonation_failure(error):
+    print(f"Phonation analysis failed: {error}")
+    return {
+        'total_recording_duration': 0,
+        'actual_phonation_time': 0,
+        'voice_breaks_duration': 0,
+        'voice_breaks_percentage': 0,
+        'number_of_pulses': 0,
+        'phonation_efficiency': 0,
+        'error': str(error)
+    }
+
+
+def extract_phonation_duration_analysis(audio, praat_point_process=None):
     """Extract maximum phonation time and voice quality metrics for sustained vowel tasks"""
     try:
-        sound = parselmouth.Sound(wav_file_path)
-        pitch = sound.to_pitch()
+        # Glottal pulses shared with jitter/shimmer
+        point_process = praat_point_process if praat_point_process is not None else audio.praat.point_process
 
-        # Create point process for voice pulse detection
-        point_process = parselmouth.praat.call([sound, pitch], "To PointProcess (cc)")
+        # All pulse times in one call instead of two Praat round trips per pulse
+        return phonation_from_pulse_times(pulse_times(point_process), audio.sound.duration)
 
-        # Get basic counts
-        n_pulses = parselmouth.praat.call(point_process, "Get number of points")
+    except Exception as e:
+        return phonation_failure(e)
 
-        # Calculate voice breaks (periods longer than 20ms indicate voice breaks)
-        max_voiced_period = 0.02  # 20ms threshold
-        voice_breaks_duration = 0
 
-        if n_pulses > 1:
-            periods = []
-            for i in range(1, n_pulses):
-                period = parselmouth.praat.call(point_process, "Get time from index", i + 1) - \
-                         parselmouth.praat.call(point_process, "Get time from index", i)
-                periods.append(period)
-                if period > max_voiced_period:
-                    voice_breaks_duration += period
+# NumPy voice-quality engine (config.VOICE_QUALITY_ENGINE = 'numpy'): same features as the
+# Praat extractors above, computed by VoiceQualityAnalysis from the decoded samples
 
-        # Calculate actual phonation time
-        total_duration = sound.duration
-        actual_phonation_time = total_duration - voice_breaks_duration
+def numpy_voice_analysis(audio):
+    """Pitch track and glottal pulses from the NumPy engine"""
+    return VoiceQualityAnalysis(audio.samples, audio.sr)
+
+
+def extract_numpy_pitch_features(audio, numpy_voice_analysis):
+    """Pitch statistics over voiced frames (NumPy engine)"""
+    return numpy_voice_analysis.pitch_features()
 
-        return {
-            'total_recording_duration': total_duration,
-            'actual_phonation_time': actual_phonation_time,
-            'voice_breaks_duration': voice_breaks_duration,
-            'voice_breaks_percentage': (voice_breaks_duration / total_duration) * 100 if total_duration > 0 else 0,
-            'number_of_pulses': n_pulses,
-            'phonation_efficiency': (actual_phonation_time / total_duration) * 100 if total_duration > 0 else 0
-        }
 
+def extract_numpy_jitter_features(audio, numpy_voice_analysis):
+    """Local and RAP jitter (NumPy engine)"""
+    return {
+        "jitter_local": numpy_voice_analysis.jitter(2),
+        "jitter_rap": numpy_voice_analysis.jitter(3),
+    }
+
+
+def extract_numpy_jitter_ppq5_features(audio, numpy_voice_analysis):
+    """Five-point period perturbation quotient (NumPy engine)"""
+    return {"jitter_ppq5": numpy_voice_analysis.jitter(5)}
+
+
+def extract_numpy_shimmer_features(audio, numpy_voice_analysis):
+    """Local and APQ3 shimmer (NumPy engine)"""
+    return {
+        "shimmer_local": numpy_voice_analysis.shimmer(2),
+        "shimmer_apq3": numpy_voice_analysis.shimmer(3),
+    }
+
+
+def extract_numpy_shimmer_apq5_features(audio, numpy_voice_analysis):
+    """Five-point amplitude perturbation quotient (NumPy engine)"""
+    return {"shimmer_apq5": numpy_voice_analysis.shimmer(5)}
+
+
+def extract_numpy_hnr_features(audio, numpy_voice_analysis):
+    """Harmonics-to-noise ratio (NumPy engine)"""
+    return {"hnr": numpy_voice_analysis.hnr()}
+
+
+def extract_numpy_phonation_analysis(audio, numpy_voice_analysis):
+    """Phonation time and voice breaks from the NumPy engine's glottal pulses"""
+    try:
+        return phonation_from_pulse_times(numpy_voice_analysis.pulse_times(), audio.duration)
     except Exception as e:
-        print(f"Phonation analysis failed: {e}")
-        return {
-            'total_recording_duration': 0,
-            'actual_phonation_time': 0,
-            'voice_breaks_duration': 0,
-            'voice_breaks_percentage': 0,
-            'number_of_pulses': 0,
-            'phonation_efficiency': 0,
-            'error': str(e)
-        }
+        return phonation_failure(e)
+
 
+def extract_all_features(audio_data, filename, request_info=None, profiler=None):
+    """Extract task-appropriate audio features from voice recording with memory management
 
-def extract_all_features(audio_data, filename, request_info=None):
-    """Extract task-appropriate audio features from voice recording with memory management"""
+    profiler: optional StageProfiler (utils/profiling.py) that times decoding,
+    metadata, quality checks, every feature group and serialization. The stages
+    are also returned as a compact "processing_profile" next to the summary.
+    """
     import os
+    import time
     import traceback
+    from .profiling import StageProfiler, processing_profile
+
+    profiler = profiler if profiler is not None else StageProfiler()
+    stage = profiler.stage
+    profile_context = {
+        "started_at": round(time.time(), 3),  # Lets the caller derive how long the job queued
+        "task_type": ((request_info or {}).get('task_metadata') or {}).get('task_type', 'speech'),
+        "format": os.path.splitext(filename)[1].lower().lstrip('.') or 'unknown',
+        "file_bytes": len(audio_data),
+        "pid": os.getpid(),
+    }
 
     print(f"Processing {filename} ({len(audio_data) / 1024 / 1024:.1f} MB)")
 
-    converted_wav_path = None
-    y = None
+    audio = None
 
     try:
-        # Convert audio to high-quality WAV for analysis
-        print("Converting to WAV...")
-        converted_wav_path = convert_audio_to_wav(audio_data, filename)
-
-        # Load the converted/original WAV with librosa
-        print("Loading audio...")
-        y, sr = librosa.load(converted_wav_path, sr=None)
+        # Decode once into memory; every extractor shares this buffer
+        print("Decoding audio...")
+        with stage('decode'):
+            audio = AudioBuffer.from_bytes(audio_data, filename)
+        y, sr = audio.samples, audio.sr
+        profile_context["duration_s"] = round(len(y) / sr, 2)
         print(f"Audio loaded: {len(y)} samples at {sr}Hz ({len(y) / sr:.2f} seconds)")
 
         # Generate metadata and quality metrics
         print("Generating metadata...")
-        metadata = generate_metadata(audio_data, filename, request_info)
-        quality_metrics = validate_audio_quality(y, sr)
+        with stage('metadata'):
+            metadata = generate_metadata(audio_data, filename, request_info)
+        with stage('quality'):
+            quality_metrics = validate_audio_quality(y, sr)
 
         # Determine task type for appropriate feature extraction
         task_metadata = request_info.get('task_metadata', {}) if request_info else {}
@@ -555,69 +672,20 @@ def extract_all_features(audio_data, filename, request_info=None):
 
         print(f"Task type detected: {task_type}")
 
-        # Extract features based on task type
-        audio_features = {}
-
-        if task_type == 'maximum_phonation_time':
-            print("Extracting MPT-specific features...")
-
-            # 1. Basic voice quality features from Parselmouth (essential for MPT)
-            parselmouth_features = extract_parselmouth_features(converted_wav_path)
-
-            # Filter to keep only relevant features for sustained phonation
-            mpt_relevant_features = {
-                # Pitch features (important for sustained vowel)
-                'mean_pitch': parselmouth_features.get('mean_pitch', 0),
-                'std_pitch': parselmouth_features.get('std_pitch', 0),
-                'min_pitch': parselmouth_features.get('min_pitch', 0),
-                'max_pitch': parselmouth_features.get('max_pitch', 0),
-                'pitch_range': parselmouth_features.get('pitch_range', 0),
-
-                # Intensity features
-                'mean_intensity': parselmouth_features.get('mean_intensity', 0),
-                'std_intensity': parselmouth_features.get('std_intensity', 0),
-
-                # Voice quality (crucial for MPT analysis)
-                'jitter_local': parselmouth_features.get('jitter_local', 0),
-                'jitter_rap': parselmouth_features.get('jitter_rap', 0),
-                'shimmer_local': parselmouth_features.get('shimmer_local', 0),
-                'shimmer_apq3': parselmouth_features.get('shimmer_apq3', 0),
-                'hnr': parselmouth_features.get('hnr', 0),
-
-                # Formants (vowel quality)
-                'f1_mean': parselmouth_features.get('f1_mean', 0),
-                'f2_mean': parselmouth_features.get('f2_mean', 0),
-                'f3_mean': parselmouth_features.get('f3_mean', 0),
-
-                # Basic energy
-                'rms_energy': np.sqrt(np.mean(y ** 2)) if len(y) > 0 else 0
-            }
-
-            audio_features.update(mpt_relevant_features)
-
-            # 2. MPT-specific phonation analysis
-            phonation_analysis = extract_phonation_duration_analysis(converted_wav_path)
-            audio_features.update(phonation_analysis)
-
-            print(f"MPT features extracted: {len(audio_features)} features")
+        # Extract only the feature groups this task type keeps, at the tier the scheduler chose
+        from .feature_registry import get_extraction_plan
+        plan = get_extraction_plan(task_type, tier=request_info.get('extraction_tier') if request_info else None)
+        profile_context.update(engine=plan.engine, tier=plan.tier)
+        print(f"Extracting {plan.method} features ({plan.engine} engine, {plan.tier} tier): "
+              f"{', '.join(plan.group_names)}")
 
-        else:
-            print("Extracting full speech analysis features...")
+        audio_features = plan.run(audio, profiler)
+        analysis_sample_rates = plan.analysis_sample_rates(audio)
 
-            # For speech tasks: extract comprehensive feature set
-            # 1. Spectral and rhythmic features (librosa)
-            audio_features.update(extract_librosa_features(y, sr))
-
-            # 2. Voice quality features (Parselmouth)
-            audio_features.update(extract_parselmouth_features(converted_wav_path))
-
-            # 3. Speech activity analysis
-            audio_features.update(extract_speech_activity_features(converted_wav_path))
-
-            print(f"Speech analysis features extracted: {len(audio_features)} features")
+        print(f"{plan.method} features extracted: {len(audio_features)} features")
 
         # MEMORY CLEANUP - Clear large arrays immediately
-        del y
+        del y, audio
         gc.collect()
 
         # Combine everything into structured output
@@ -636,17 +704,24 @@ def extract_all_features(audio_data, filename, request_info=None):
                 "total_features_extracted": len(audio_features),
                 "processing_successful": True,
                 "task_type": task_type,
-                "feature_extraction_method": "mpt_specific" if task_type == 'maximum_phonation_time' else "full_speech",
+                "feature_extraction_method": plan.method,
+                "voice_quality_engine": plan.engine,
+                "extraction_tier": plan.tier,
+                "feature_groups": list(plan.group_names),
+                "deferred_feature_groups": list(plan.deferred_groups),
                 "data_completeness": calculate_completeness(audio_features),
                 "recommended_for_analysis": quality_metrics["signal_quality"] in ["good", "excellent"],
                 "audio_format_converted": not filename.lower().endswith('.wav'),
                 "final_sample_rate": sr,
+                "analysis_sample_rates": analysis_sample_rates,
                 "final_duration": round(quality_metrics.get('total_samples', 0) / sr, 2) if sr > 0 else 0
             }
         }
 
         # Convert numpy arrays to lists for JSON serialization
-        complete_data = convert_numpy_to_json_serializable(complete_data)
+        with stage('serialize'):
+            complete_data = convert_numpy_to_json_serializable(complete_data)
+        complete_data["processing_profile"] = processing_profile(profiler, **profile_context)
         print(f"Feature extraction successful: {len(audio_features)} features extracted for {task_type}")
 
         return complete_data
@@ -664,7 +739,10 @@ def extract_all_features(audio_data, filename, request_info=None):
             "summary": {
                 "processing_successful": False,
                 "error_type": type(e).__name__
-            }
+            },
+            # Stages completed before the failure
+            "processing_profile": processing_profile(profiler, error_type=type(e).__name__,
+                                                     **profile_context)
         }
 
     finally:
@@ -673,10 +751,8 @@ def extract_all_features(audio_data, filename, request_info=None):
             # Clean up audio arrays
             if 'y' in locals() and y is not None:
                 del y
-
-            # Clean up converted WAV file
-            if converted_wav_path and os.path.exists(converted_wav_path):
-                os.remove(converted_wav_path)
+            if 'audio' in locals() and audio is not None:
+                del audio
 
             # Force garbage collection
             gc.collect()
@@ -686,6 +762,26 @@ def extract_all_features(audio_data, filename, request_info=None):
             print(f"Cleanup error: {cleanup_error}")
 
 
+def extract_spooled_features(audio_path, filename, request_info=None):
+    """
+    extract_all_features() for audio spooled to disk. The worker maps the file
+    itself, so only the path crosses the process boundary.
+    """
+    import mmap
+    with open(audio_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as audio_data:
+        return extract_all_features(audio_data, filename, request_info)
+
+
+def extract_deferred_features(audio_data, filename, group_names):
+    """
+    Features of the groups a cheaper extraction tier deferred, computed from the
+    archived audio, as {group_name: {feature: value}}
+    """
+    from .feature_registry import run_feature_groups
+    audio = AudioBuffer.from_bytes(audio_data, filename)
+    return convert_numpy_to_json_serializable({name: run_feature_groups(audio, [name]) for name in group_names})
+
+
 def calculate_completeness(features_dict):
     """Calculate what percentage of features were successfully extracted"""
     total_features = len(features_dict)
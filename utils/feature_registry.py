@@ -0,0 +1,319 @@
+#feature_registry.py
+
+from contextlib import nullcontext
+
+import config
+from . import feature_extraction as fx
+
+
+class FeatureGroup:
+    """
+    One unit of feature extraction.
+
+    name:       registry key
+    extractor:  fn(audio, **dependency_results) -> dict of features (or an
+                intermediate analysis object when `features` is empty)
+    view:       analysis view the extractor runs on: 'native', 'spectral' or 'vad'
+    cost:       estimated CPU seconds per second of audio at the view's rate
+    memory:     estimated peak working set as a multiple of the view's float32 signal
+    depends_on: names of groups whose results are passed to the extractor as keyword arguments
+    features:   output feature keys (empty for intermediate analysis steps)
+    """
+
+    def __init__(self, name, extractor, view='native', cost=0.0, depends_on=(), features=(), memory=0.0):
+        self.name = name
+        self.extractor = extractor
+        self.view = view
+        self.cost = cost
+        self.memory = memory
+        self.depends_on = tuple(depends_on)
+        self.features = tuple(features)
+
+    @property
+    def is_intermediate(self):
+        return not self.features
+
+    def __repr__(self):
+        return f"FeatureGroup({self.name!r}, view={self.view!r}, cost={self.cost})"
+
+
+FEATURE_GROUPS = {}
+
+ANALYSIS_VIEWS = {
+    'native': lambda audio: audio,
+    'spectral': fx.spectral_view,
+    'vad': fx.vad_view,
+}
+
+
+def register_feature_group(name, extractor, view='native', cost=0.0, depends_on=(), features=(), memory=0.0):
+    """Add a feature group to the registry"""
+    if view not in ANALYSIS_VIEWS:
+        raise ValueError(f"Unknown analysis view '{view}' for feature group '{name}'")
+    for dependency in depends_on:
+        if dependency not in FEATURE_GROUPS:
+            raise ValueError(f"Feature group '{name}' depends on unregistered group '{dependency}'")
+    FEATURE_GROUPS[name] = FeatureGroup(name, extractor, view, cost, depends_on, features, memory)
+    return FEATURE_GROUPS[name]
+
+
+def resolve_feature_groups(names):
+    """Expand requested groups with their dependencies, in execution order"""
+    ordered = []
+    visiting = set()
+
+    def visit(name):
+        if name in ordered:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependency cycle at feature group '{name}'")
+        if name not in FEATURE_GROUPS:
+            raise KeyError(f"Unknown feature group '{name}'")
+        visiting.add(name)
+        for dependency in FEATURE_GROUPS[name].depends_on:
+            visit(dependency)
+        visiting.discard(name)
+        ordered.append(name)
+
+    for name in names:
+        visit(name)
+    return [FEATURE_GROUPS[name] for name in ordered]
+
+
+def run_feature_groups(audio, names, profiler=None):
+    """
+    Run the requested groups (and their dependencies) once each; return the merged features.
+    A StageProfiler records one stage per group (building the analysis view included).
+    """
+    results = {}
+    features = {}
+
+    for group in resolve_feature_groups(names):
+        with profiler.stage(group.name) if profiler is not None else nullcontext():
+            view = ANALYSIS_VIEWS[group.view](audio)
+            dependencies = {name: results[name] for name in group.depends_on}
+            results[group.name] = group.extractor(view, **dependencies)
+        if not group.is_intermediate:
+            features.update(results[group.name])
+
+    return features
+
+
+class ExtractionPlan:
+    """
+    The feature groups a task type needs, with an inspectable cost estimate.
+    `engine` swaps voice-quality groups for their implementation in that engine
+    (see VOICE_QUALITY_ENGINES); the features produced are the same. `tier` drops
+    the groups EXTRACTION_TIERS skips, which are kept in `deferred_groups`.
+    """
+
+    def __init__(self, task_type, method, group_names, engine='praat', tier='full'):
+        if engine not in VOICE_QUALITY_ENGINES:
+            raise ValueError(f"Unknown voice quality engine '{engine}'")
+        if tier not in EXTRACTION_TIERS:
+            raise ValueError(f"Unknown extraction tier '{tier}'")
+        self.task_type = task_type
+        self.method = method
+        self.engine = engine
+        self.tier = tier
+        substitutions = VOICE_QUALITY_ENGINES[engine]
+        group_names = [substitutions.get(name, name) for name in group_names]
+        self.group_names = tuple(name for name in group_names if name not in EXTRACTION_TIERS[tier])
+        self.deferred_groups = tuple(name for name in group_names if name in EXTRACTION_TIERS[tier])
+        self.groups = resolve_feature_groups(self.group_names)
+
+    @property
+    def features(self):
+        return [key for group in self.groups for key in group.features]
+
+    @property
+    def views(self):
+        return sorted({group.view for group in self.groups})
+
+    def estimate_cost(self, duration_seconds):
+        """Estimated CPU seconds to run the plan on a recording of the given length"""
+        return sum(group.cost for group in self.groups) * duration_seconds
+
+    def estimate_memory(self, duration_seconds, sample_rate):
+        """
+        Estimated peak memory in bytes of running the plan on a recording of the given
+        length and native sample rate: the decoded signal with its Praat analyses, plus
+        the working set of the spectral groups (bounded by the block length on the
+        streaming path)
+        """
+        native_bytes = duration_seconds * sample_rate * 4 * NATIVE_WORKSET
+        spectral_seconds = duration_seconds
+        if duration_seconds > config.STREAMING_MIN_SECONDS:
+            spectral_seconds = config.STREAMING_BLOCK_SECONDS
+        spectral_signal = spectral_seconds * min(sample_rate, config.SPECTRAL_SAMPLE_RATE) * 4
+        return native_bytes + spectral_signal * sum(group.memory for group in self.groups if group.view == 'spectral')
+
+    def analysis_sample_rates(self, audio):
+        """Sample rate each analysis view of the plan runs at"""
+        return {view: ANALYSIS_VIEWS[view](audio).sr for view in self.views}
+
+    def describe(self, duration_seconds=None, sample_rate=48000):
+        """JSON-friendly description of the plan (and its cost for a given duration and sample rate)"""
+        description = {
+            'task_type': self.task_type,
+            'feature_extraction_method': self.method,
+            'voice_quality_engine': self.engine,
+            'extraction_tier': self.tier,
+            'deferred_groups': list(self.deferred_groups),
+            'groups': [
+                {
+                    'name': group.name,
+                    'view': group.view,
+                    'cost_per_second': group.cost,
+                    'memory_multiple': group.memory,
+                    'depends_on': list(group.depends_on),
+                    'features': list(group.features)
+                }
+                for group in self.groups
+            ],
+            'total_features': len(self.features),
+            'cost_per_second': round(sum(group.cost for group in self.groups), 4)
+        }
+        if duration_seconds is not None:
+            description['duration_seconds'] = duration_seconds
+            description['estimated_cpu_seconds'] = round(self.estimate_cost(duration_seconds), 2)
+            description['sample_rate'] = sample_rate
+            description['estimated_memory_mb'] = round(self.estimate_memory(duration_seconds, sample_rate) / 2**20, 1)
+        return description
+
+    def run(self, audio, profiler=None):
+        """Extract the plan's features from an AudioBuffer"""
+        return run_feature_groups(audio, self.group_names, profiler)
+
+
+# --- Registry ---------------------------------------------------------------
+# Costs are CPU seconds per second of audio, measured on a single core with
+# tools/benchmark_feature_extraction.py; they only need to be right relative to each other.
+# Memory multiples come from peak RSS deltas of 30-60 s recordings at 16 and 48 kHz.
+
+# Decoded signal, its Praat copy and the native-rate analyses, as a multiple of the float32 signal
+NATIVE_WORKSET = 7.5
+
+# Intermediate Praat analyses shared by several feature groups (memoized on audio.praat)
+register_feature_group('praat_pitch', fx.praat_pitch, cost=0.007)
+register_feature_group('praat_intensity', fx.praat_intensity, cost=0.001)
+register_feature_group('praat_point_process', fx.praat_point_process, cost=0.017, depends_on=['praat_pitch'])
+register_feature_group('praat_formant', fx.praat_formant, cost=0.024)
+
+# Praat voice-quality features
+register_feature_group('pitch', fx.extract_pitch_features, depends_on=['praat_pitch'],
+                       features=['mean_pitch', 'std_pitch', 'min_pitch', 'max_pitch', 'pitch_range'])
+register_feature_group('intensity', fx.extract_intensity_features, depends_on=['praat_intensity'],
+                       features=['mean_intensity', 'std_intensity'])
+register_feature_group('intensity_range', fx.extract_intensity_range_features, depends_on=['praat_intensity'],
+                       features=['min_intensity', 'max_intensity'])
+register_feature_group('jitter', fx.extract_jitter_features, depends_on=['praat_point_process'],
+                       features=['jitter_local', 'jitter_rap'])
+register_feature_group('jitter_ppq5', fx.extract_jitter_ppq5_features, depends_on=['praat_point_process'],
+                       features=['jitter_ppq5'])
+register_feature_group('shimmer', fx.extract_shimmer_features, cost=0.0004, depends_on=['praat_point_process'],
+                       features=['shimmer_local', 'shimmer_apq3'])
+register_feature_group('shimmer_apq5', fx.extract_shimmer_apq5_features, cost=0.0002,
+                       depends_on=['praat_point_process'], features=['shimmer_apq5'])
+register_feature_group('hnr', fx.extract_hnr_features, cost=0.31, features=['hnr'])
+register_feature_group('formants', fx.extract_formant_features, depends_on=['praat_formant'],
+                       features=['f1_mean', 'f2_mean', 'f3_mean'])
+register_feature_group('signal_rms', fx.extract_signal_rms_features, cost=0.0001, features=['rms_energy'])
+
+# Sustained-vowel analysis
+register_feature_group('phonation', fx.extract_phonation_duration_analysis, cost=0.012,
+                       depends_on=['praat_point_process'],
+                       features=['total_recording_duration', 'actual_phonation_time', 'voice_breaks_duration',
+                                 'voice_breaks_percentage', 'number_of_pulses', 'phonation_efficiency'])
+
+# NumPy voice-quality engine: same features as the Praat groups above
+register_feature_group('numpy_voice_analysis', fx.numpy_voice_analysis, cost=0.035)
+register_feature_group('numpy_pitch', fx.extract_numpy_pitch_features, depends_on=['numpy_voice_analysis'],
+                       features=['mean_pitch', 'std_pitch', 'min_pitch', 'max_pitch', 'pitch_range'])
+register_feature_group('numpy_jitter', fx.extract_numpy_jitter_features, depends_on=['numpy_voice_analysis'],
+                       features=['jitter_local', 'jitter_rap'])
+register_feature_group('numpy_jitter_ppq5', fx.extract_numpy_jitter_ppq5_features,
+                       depends_on=['numpy_voice_analysis'], features=['jitter_ppq5'])
+register_feature_group('numpy_shimmer', fx.extract_numpy_shimmer_features, depends_on=['numpy_voice_analysis'],
+                       features=['shimmer_local', 'shimmer_apq3'])
+register_feature_group('numpy_shimmer_apq5', fx.extract_numpy_shimmer_apq5_features,
+                       depends_on=['numpy_voice_analysis'], features=['shimmer_apq5'])
+register_feature_group('numpy_hnr', fx.extract_numpy_hnr_features, depends_on=['numpy_voice_analysis'],
+                       features=['hnr'])
+register_feature_group('numpy_phonation', fx.extract_numpy_phonation_analysis, depends_on=['numpy_voice_analysis'],
+                       features=['total_recording_duration', 'actual_phonation_time', 'voice_breaks_duration',
+                                 'voice_breaks_percentage', 'number_of_pulses', 'phonation_efficiency'])
+
+# Group substitutions per voice-quality engine (Praat groups are the reference)
+VOICE_QUALITY_ENGINES = {
+    'praat': {},
+    'numpy': {
+        'pitch': 'numpy_pitch', 'jitter': 'numpy_jitter', 'jitter_ppq5': 'numpy_jitter_ppq5',
+        'shimmer': 'numpy_shimmer', 'shimmer_apq5': 'numpy_shimmer_apq5', 'hnr': 'numpy_hnr',
+        'phonation': 'numpy_phonation',
+    },
+}
+
+# Spectral and rhythmic features (librosa); tonnetz and tempo are split out so tiers can skip them
+register_feature_group('spectral', fx.extract_spectral_features, view='spectral', cost=0.02, memory=9,
+                       features=['mfcc_mean', 'mfcc_std', 'chroma_mean', 'chroma_std', 'mel_spectrogram_mean',
+                                 'spectral_contrast_mean', 'spectral_contrast_std', 'spectral_centroid',
+                                 'spectral_bandwidth', 'spectral_rolloff', 'zero_crossing_rate', 'rms_energy'])
+register_feature_group('tonnetz', fx.extract_tonnetz_features, view='spectral', cost=0.08, memory=8,
+                       features=['tonnetz_mean', 'tonnetz_std'])
+register_feature_group('tempo', fx.extract_tempo_features, view='spectral', cost=0.01, features=['tempo'])
+
+# Speech activity
+register_feature_group('speech_activity', fx.extract_speech_activity_features, view='vad', cost=0.0002,
+                       features=['speech_ratio', 'pause_ratio', 'speaking_rate', 'num_speech_segments',
+                                 'avg_segment_length', 'num_pauses', 'median_pause_length', 'longest_pause'])
+
+
+# --- Per-task plans ---------------------------------------------------------
+
+MPT_GROUPS = (
+    'pitch', 'intensity', 'jitter', 'shimmer', 'hnr', 'formants', 'signal_rms', 'phonation'
+)
+
+FULL_SPEECH_GROUPS = ('spectral', 'tonnetz', 'tempo') + fx.PARSELMOUTH_FEATURE_GROUPS + ('speech_activity',)
+
+# Extraction tiers, cheapest first: the groups each tier leaves out of a plan. Skipped
+# groups are recorded as deferred and can be computed later from the archived audio.
+EXTRACTION_TIERS = {
+    'fast': ('tonnetz', 'tempo'),
+    'standard': ('tempo',),
+    'full': (),
+}
+
+TASK_PLANS = {
+    'maximum_phonation_time': ('mpt_specific', MPT_GROUPS),
+    'picture_description': ('full_speech', FULL_SPEECH_GROUPS),
+    'weekend_question': ('full_speech', FULL_SPEECH_GROUPS),
+}
+
+
+def get_extraction_plan(task_type, engine=None, tier=None):
+    """
+    Plan for a task type with the given (or configured) voice-quality engine and
+    extraction tier; unknown or missing task types get the full speech plan
+    """
+    method, group_names = TASK_PLANS.get(task_type, ('full_speech', FULL_SPEECH_GROUPS))
+    return ExtractionPlan(task_type, method, group_names, engine or config.VOICE_QUALITY_ENGINE,
+                          tier or config.EXTRACTION_TIER)
+
+
+def select_extraction_tier(requested_tier, queue_depth):
+    """
+    Tier to run a job at: the requested (or configured) tier, downgraded when
+    `queue_depth` jobs are already waiting for a worker (config.TIER_DOWNGRADE_QUEUE_DEPTH)
+    """
+    tier = requested_tier or config.EXTRACTION_TIER
+    if tier not in EXTRACTION_TIERS:
+        raise ValueError(f"Unknown extraction tier '{tier}'")
+
+    order = list(EXTRACTION_TIERS)
+    for downgrade in order:  # Cheapest first, so the deepest threshold crossed wins
+        threshold = config.TIER_DOWNGRADE_QUEUE_DEPTH.get(downgrade)
+        if threshold and queue_depth >= threshold:
+            return min(tier, downgrade, key=order.index)
+    return tier
@@ -0,0 +1,734 @@
+#job_queue.py
+
+import collections
+import json
+import mmap
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+import config
+from .metrics import JOB_LATENCY_SECONDS, JOB_WAIT_SECONDS, JOBS_FINISHED
+
+# Job states: held jobs wait for the rest of their group (e.g. the other tasks of a donation),
+# dead jobs ran out of attempts and stay for inspection (dead-letter), expired jobs were held
+# in a group that was abandoned
+HELD, QUEUED, LEASED, DONE, DEAD, EXPIRED = 'held', 'queued', 'leased', 'done', 'dead', 'expired'
+
+# Suffix of a spool file still being written; recover() deletes these and no other files
+SPOOL_TEMP_SUFFIX = '.audio.tmp'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    audio_path TEXT,
+    group_key TEXT,
+    group_seq INTEGER,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_expires_at REAL,
+    leased_by TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    cost REAL,
+    job_class TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at);
+CREATE INDEX IF NOT EXISTS jobs_group ON jobs (group_key, status);
+CREATE TABLE IF NOT EXISTS groups (
+    group_key TEXT PRIMARY KEY,
+    expected INTEGER,
+    created_at REAL NOT NULL,
+    last_activity_at REAL NOT NULL,
+    closed_at REAL,
+    outcome TEXT
+);
+CREATE TABLE IF NOT EXISTS group_results (
+    group_key TEXT NOT NULL,
+    group_seq INTEGER NOT NULL,
+    outcome TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    PRIMARY KEY (group_key, group_seq)
+);
+"""
+
+# Columns added to existing queue databases since the table was introduced
+MIGRATIONS = {
+    'jobs': [('cost', 'REAL'), ('job_class', 'TEXT')],
+    'groups': [('closed_at', 'REAL'), ('outcome', 'TEXT')],
+}
+
+
+class Job:
+    """A job row; `payload` is the JSON-decoded payload"""
+
+    def __init__(self, row):
+        self.id = row['id']
+        self.kind = row['kind']
+        self.payload = json.loads(row['payload'])
+        self.audio_path = row['audio_path']
+        self.group_key = row['group_key']
+        self.group_seq = row['group_seq']
+        self.status = row['status']
+        self.attempts = row['attempts']
+        self.last_error = row['last_error']
+        self.created_at = row['created_at']
+        self.cost = row['cost']
+        self.job_class = row['job_class']
+        self.leased_at = None
+
+    @contextmanager
+    def map_audio(self):
+        """The spooled audio as a read-only memory map (pages come from the page cache, not the heap)"""
+        with open(self.audio_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as audio:
+            yield audio
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind} {self.status} attempt {self.attempts}>"
+
+
+class JobQueue:
+    """
+    Durable job queue: an SQLite database in `directory` plus a spool file per job's audio.
+
+    Jobs are leased rather than popped: a leased job whose lease runs out (the worker
+    died or stopped renewing it) becomes available again, so nothing is lost across
+    restarts. Failed jobs are retried with exponential backoff until max_attempts,
+    then kept in the dead state. One application process owns a queue directory.
+
+    Ready jobs are leased shortest first: by their estimated `cost` less `aging_rate`
+    for every second since they were submitted, so a costly job is overtaken by cheaper
+    ones for at most cost / aging_rate seconds and never starves (a retry or backoff
+    doesn't reset its aging). Jobs without a cost (and every job with aging_rate 0
+    and no costs) are leased in arrival order.
+    """
+
+    def __init__(self, directory, lease_seconds=120, max_attempts=5, retry_base_seconds=10,
+                 retry_max_seconds=600, aging_rate=0.0):
+        self.directory = directory
+        self.audio_directory = os.path.join(directory, 'audio')
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.aging_rate = aging_rate
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._stats = None
+        self._stats_at = 0.0
+        self._queued_since_stats = [0, 0.0]  # Jobs and estimated CPU seconds queued since the snapshot
+        self._stats_lock = threading.Lock()
+
+        os.makedirs(self.audio_directory, exist_ok=True)
+        connection = self._connection()
+        connection.executescript(SCHEMA)
+        for table, columns in MIGRATIONS.items():
+            existing = {row['name'] for row in connection.execute(f"PRAGMA table_info({table})")}
+            for column, column_type in columns:
+                if column not in existing:
+                    connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    def _connection(self):
+        """One connection per thread; transactions are explicit (BEGIN IMMEDIATE serializes writers)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(os.path.join(self.directory, 'jobs.sqlite3'), timeout=30,
+                                         isolation_level=None, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _spool(self, audio_data):
+        """Write audio to its own file and fsync it before the job row that points at it exists"""
+        path = os.path.join(self.audio_directory, f"{uuid.uuid4().hex}.audio")
+        temp_path = path + SPOOL_TEMP_SUFFIX
+        with open(temp_path, 'wb') as f:
+            f.write(audio_data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        return path
+
+    def _adopt(self, audio_file):
+        """
+        Keep an upload already streamed into the audio directory (utils/uploads.py):
+        fsync it and link it under a spool name, so it outlives the request's temporary file
+        """
+        path = os.path.join(self.audio_directory, f"{uuid.uuid4().hex}.audio")
+        audio_file.flush()
+        os.fsync(audio_file.fileno())
+        os.link(audio_file.name, path)
+        return path
+
+    def enqueue(self, kind, payload, audio_data=None, group_key=None, group_seq=None, hold=False, delay=0,
+                group_size=None, cost=None, job_class=None, audio_file=None):
+        """
+        Add a job; returns its id. Its audio is either `audio_data` (bytes, written to a
+        spool file) or `audio_file`, an upload spooled into the audio directory while it
+        was received. A held job waits for the rest of its group. Any job
+        with a group_seq is a group member: the group is indexed (expected size, last
+        activity for the abandoned-group reaper) until all its members have a result.
+        A held member arriving after its group was closed (e.g. as partial) reopens it,
+        so the reaper sees the group again instead of the member being held forever.
+        `cost` orders ready jobs (shortest first) and `job_class` is the class whose
+        concurrency limit and latency statistics the job counts towards.
+        """
+        audio_path = None
+        if audio_data is not None:
+            audio_path = self._spool(audio_data)
+        elif audio_file is not None:
+            audio_path = self._adopt(audio_file)
+        now = time.time()
+        try:
+            with self._transaction() as connection:
+                cursor = connection.execute(
+                    "INSERT INTO jobs (kind, payload, audio_path, group_key, group_seq, status, available_at,"
+                    " created_at, updated_at, cost, job_class) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (kind, json.dumps(payload), audio_path, group_key, group_seq, HELD if hold else QUEUED,
+                     now + delay, now, now, cost, job_class))
+                if group_seq is not None:
+                    connection.execute(
+                        "INSERT INTO groups (group_key, expected, created_at, last_activity_at) VALUES (?, ?, ?, ?)"
+                        " ON CONFLICT (group_key) DO UPDATE SET last_activity_at = excluded.last_activity_at,"
+                        " expected = COALESCE(excluded.expected, expected),"
+                        " closed_at = CASE WHEN ? THEN NULL ELSE closed_at END,"
+                        " outcome = CASE WHEN ? THEN NULL ELSE outcome END",
+                        (group_key, group_size, now, now, hold, hold))
+        except Exception:
+            if audio_path:
+                os.remove(audio_path)
+            raise
+        if not hold:
+            self._count_queued(1, cost or 0.0)
+        return cursor.lastrowid
+
+    def enqueue_when_complete(self, group_key, expected, kind, payload):
+        """
+        Queue a group job once `expected` distinct members of the group are held, unless
+        one is already queued or running. Returns True if this call queued it.
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            held = connection.execute(
+                "SELECT COUNT(DISTINCT group_seq) FROM jobs WHERE group_key = ? AND status = ?",
+                (group_key, HELD)).fetchone()[0]
+            if held < expected:
+                return False
+            existing = connection.execute(
+                "SELECT 1 FROM jobs WHERE group_key = ? AND kind = ? AND status IN (?, ?)",
+                (group_key, kind, QUEUED, LEASED)).fetchone()
+            if existing:
+                return False
+            connection.execute(
+                "INSERT INTO jobs (kind, payload, group_key, status, available_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)", (kind, json.dumps(payload), group_key, QUEUED, now, now, now))
+            return True
+
+    def record_result(self, group_key, group_seq, outcome):
+        """
+        Record the outcome of one group member (a resubmitted member's later result
+        replaces the earlier one). Returns the group's status if this result closed
+        the group (every expected member has a result), so callers see each group
+        complete exactly once; otherwise None.
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO group_results (group_key, group_seq, outcome, finished_at) VALUES (?, ?, ?, ?)",
+                (group_key, group_seq, outcome, now))
+            group = connection.execute("SELECT * FROM groups WHERE group_key = ?", (group_key,)).fetchone()
+            if group is None or group['closed_at'] is not None or group['expected'] is None:
+                return None
+            results = connection.execute("SELECT COUNT(*) FROM group_results WHERE group_key = ?",
+                                         (group_key,)).fetchone()[0]
+            if results < group['expected']:
+                return None
+            return self._close_group(connection, group_key, 'complete', now)
+
+    def close_group(self, group_key, outcome):
+        """Close a group that will not get all its members (e.g. 'partial', 'expired'); returns its status"""
+        with self._transaction() as connection:
+            return self._close_group(connection, group_key, outcome, time.time())
+
+    def _close_group(self, connection, group_key, outcome, now):
+        connection.execute("UPDATE groups SET closed_at = ?, outcome = ? WHERE group_key = ? AND closed_at IS NULL",
+                           (now, outcome, group_key))
+        return self._group_status(connection, group_key)
+
+    def group_status(self, group_key):
+        """Index entry and member results of a group, or None if it is unknown"""
+        return self._group_status(self._connection(), group_key)
+
+    @staticmethod
+    def _group_status(connection, group_key):
+        group = connection.execute("SELECT * FROM groups WHERE group_key = ?", (group_key,)).fetchone()
+        if group is None:
+            return None
+        results = connection.execute("SELECT group_seq, outcome FROM group_results WHERE group_key = ?",
+                                     (group_key,)).fetchall()
+        status = dict(group)
+        status['results'] = {row['group_seq']: row['outcome'] for row in results}
+        return status
+
+    def abandoned_groups(self, idle_seconds):
+        """[(group_key, expected, held)] of open groups with no new member for idle_seconds"""
+        rows = self._connection().execute(
+            "SELECT g.group_key, g.expected, COUNT(DISTINCT j.group_seq) FROM groups g"
+            " LEFT JOIN jobs j ON j.group_key = g.group_key AND j.status = ?"
+            " WHERE g.closed_at IS NULL AND g.last_activity_at < ? GROUP BY g.group_key",
+            (HELD, time.time() - idle_seconds)).fetchall()
+        return [tuple(row) for row in rows]
+
+    def group_in_progress(self, group_key):
+        """True while any member or group job is queued or running"""
+        return self._connection().execute(
+            "SELECT 1 FROM jobs WHERE group_key = ? AND status IN (?, ?) LIMIT 1",
+            (group_key, QUEUED, LEASED)).fetchone() is not None
+
+    def expire_group(self, group_key):
+        """Drop an abandoned group's held jobs and their audio and close it; returns the group's status"""
+        now = time.time()
+        with self._transaction() as connection:
+            rows = connection.execute("SELECT id, audio_path FROM jobs WHERE group_key = ? AND status = ?",
+                                      (group_key, HELD)).fetchall()
+            connection.execute(
+                "UPDATE jobs SET status = ?, audio_path = NULL, last_error = ?, updated_at = ?"
+                " WHERE group_key = ? AND status = ?", (EXPIRED, 'group abandoned', now, group_key, HELD))
+            status = self._close_group(connection, group_key, 'expired', now)
+        for row in rows:
+            if row['audio_path']:
+                try:
+                    os.remove(row['audio_path'])
+                except FileNotFoundError:
+                    pass
+        return status
+
+    def pending_group_count(self):
+        """Groups still waiting for members or results"""
+        return self._connection().execute("SELECT COUNT(*) FROM groups WHERE closed_at IS NULL").fetchone()[0]
+
+    def held_jobs(self, group_key):
+        """Held members of a group, newest submission per group_seq, in group_seq order"""
+        rows = self._connection().execute(
+            "SELECT * FROM jobs WHERE group_key = ? AND status = ? ORDER BY group_seq, id",
+            (group_key, HELD)).fetchall()
+        latest = {}
+        for row in rows:
+            latest[row['group_seq']] = row  # A resubmitted task replaces the earlier one
+        superseded = [row['id'] for row in rows if latest[row['group_seq']]['id'] != row['id']]
+        for job_id in superseded:
+            self._finish(job_id, DONE, 'superseded by a later submission')
+        return [Job(row) for row in latest.values()]
+
+    def release_held(self, jobs, kind):
+        """
+        Queue held group members as independent jobs of `kind`, with their payloads as
+        they are on the given Job objects, so they run in parallel like any other job
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            connection.executemany(
+                "UPDATE jobs SET kind = ?, payload = ?, status = ?, available_at = ?, updated_at = ?"
+                " WHERE id = ? AND status = ?",
+                [(kind, json.dumps(job.payload), QUEUED, now, now, job.id, HELD) for job in jobs])
+        self._count_queued(len(jobs), sum(job.cost or 0.0 for job in jobs))
+
+    def held_count(self, group_key):
+        return self._connection().execute(
+            "SELECT COUNT(DISTINCT group_seq) FROM jobs WHERE group_key = ? AND status = ?",
+            (group_key, HELD)).fetchone()[0]
+
+    def lease(self, exclude_classes=()):
+        """
+        Lease the ready job (or one whose lease expired) with the lowest aged cost,
+        skipping jobs of `exclude_classes` (classes at their concurrency limit), or None
+        """
+        now = time.time()
+        class_filter = ''
+        if exclude_classes:
+            class_filter = f" AND (job_class IS NULL OR job_class NOT IN ({', '.join('?' * len(exclude_classes))}))"
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE ((status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at <= ?))"
+                + class_filter + " ORDER BY COALESCE(cost, 0) - (? - created_at) * ?, created_at, id LIMIT 1",
+                (QUEUED, now, LEASED, now, *exclude_classes, now, self.aging_rate)).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_expires_at = ?, leased_by = ?,"
+                " updated_at = ? WHERE id = ?", (LEASED, now + self.lease_seconds, self.owner, now, row['id']))
+        job = Job(row)
+        job.status, job.attempts, job.leased_at = LEASED, job.attempts + 1, now
+        return job
+
+    def renew(self, job_ids):
+        """Extend the leases this process holds on the given jobs"""
+        if not job_ids:
+            return
+        now = time.time()
+        with self._transaction() as connection:
+            connection.executemany(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE id = ? AND status = ? AND leased_by = ?",
+                [(now + self.lease_seconds, now, job_id, LEASED, self.owner) for job_id in job_ids])
+
+    def complete(self, job):
+        self._finish(job.id, DONE)
+
+    def _finish(self, job_id, status, error=None):
+        with self._transaction() as connection:
+            row = connection.execute("SELECT audio_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            connection.execute(
+                "UPDATE jobs SET status = ?, last_error = ?, lease_expires_at = NULL, audio_path = NULL,"
+                " updated_at = ? WHERE id = ?", (status, error, time.time(), job_id))
+        if row and row['audio_path']:
+            try:
+                os.remove(row['audio_path'])
+            except FileNotFoundError:
+                pass
+
+    def fail(self, job, error):
+        """Schedule a retry with exponential backoff; returns False once the job is dead-lettered"""
+        now = time.time()
+        if job.attempts >= self.max_attempts:
+            with self._transaction() as connection:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, last_error = ?, lease_expires_at = NULL, updated_at = ? WHERE id = ?",
+                    (DEAD, error, now, job.id))
+            return False
+        delay = min(self.retry_base_seconds * 2 ** (job.attempts - 1), self.retry_max_seconds)
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, last_error = ?, lease_expires_at = NULL,"
+                " updated_at = ? WHERE id = ?", (QUEUED, now + delay, error, now, job.id))
+        return True
+
+    def release(self, job_ids):
+        """Hand leased jobs back without counting the attempt (shutdown before they finished)"""
+        now = time.time()
+        with self._transaction() as connection:
+            connection.executemany(
+                "UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0), available_at = ?,"
+                " lease_expires_at = NULL, updated_at = ? WHERE id = ? AND status = ? AND leased_by = ?",
+                [(QUEUED, now, now, job_id, LEASED, self.owner) for job_id in job_ids])
+
+    def recover(self):
+        """
+        Requeue jobs leased by an earlier run of this process (only one process owns the
+        queue) and delete the partial spool files that run left behind. Uploads streaming
+        into the directory (utils/uploads.py, upload-*.tmp) are left alone: they may belong
+        to a request in flight, and their temporary file deletes itself when it closes.
+        """
+        for name in os.listdir(self.audio_directory):
+            if name.endswith(SPOOL_TEMP_SUFFIX):
+                os.remove(os.path.join(self.audio_directory, name))
+        now = time.time()
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, lease_expires_at = NULL, updated_at = ?"
+                " WHERE status = ? AND leased_by != ?", (QUEUED, now, now, LEASED, self.owner))
+            return cursor.rowcount
+
+    def purge(self, older_than_seconds):
+        """Drop finished and expired jobs and closed groups older than the retention period (dead jobs are kept)"""
+        cutoff = time.time() - older_than_seconds
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (DONE, EXPIRED, cutoff))
+            connection.execute("DELETE FROM group_results WHERE group_key IN"
+                               " (SELECT group_key FROM groups WHERE closed_at < ?)", (cutoff,))
+            connection.execute("DELETE FROM groups WHERE closed_at < ?", (cutoff,))
+
+    def ready_count(self):
+        """Queued jobs a worker could start now (the backlog)"""
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ? AND available_at <= ?", (QUEUED, time.time())).fetchone()[0]
+
+    def pending_total(self, field):
+        """Sum of a numeric payload field (dotted path, e.g. 'cost.cpu_s') over queued and running jobs"""
+        return self._connection().execute(
+            "SELECT COALESCE(SUM(json_extract(payload, ?)), 0) FROM jobs WHERE status IN (?, ?)",
+            ('$.' + field, QUEUED, LEASED)).fetchone()[0]
+
+    def counts(self):
+        """{status: number of jobs}"""
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def _count_queued(self, jobs, cpu_seconds):
+        with self._stats_lock:
+            self._queued_since_stats[0] += jobs
+            self._queued_since_stats[1] += cpu_seconds
+
+    def stats(self, max_age_seconds):
+        """
+        {'counts', 'ready', 'pending_cpu_s', 'pending_groups'} (see counts(), ready_count(),
+        pending_total('cost.cpu_s'), pending_group_count()), re-read from the database at
+        most every max_age_seconds; for gauges, health checks and upload admission. Jobs
+        this process queued since the snapshot are added to 'ready' and 'pending_cpu_s'
+        straight away (jobs finished meanwhile are only subtracted at the next read), so
+        a burst of uploads can't slip past admission control between snapshots.
+        """
+        with self._stats_lock:
+            now = time.monotonic()
+            if self._stats is None or now - self._stats_at >= max_age_seconds:
+                self._stats = {
+                    'counts': self.counts(),
+                    'ready': self.ready_count(),
+                    'pending_cpu_s': self.pending_total('cost.cpu_s'),
+                    'pending_groups': self.pending_group_count(),
+                }
+                self._stats_at = now
+                self._queued_since_stats = [0, 0.0]
+            jobs, cpu_seconds = self._queued_since_stats
+            return dict(self._stats, ready=self._stats['ready'] + jobs,
+                        pending_cpu_s=self._stats['pending_cpu_s'] + cpu_seconds)
+
+    def dead_jobs(self, limit=100):
+        rows = self._connection().execute(
+            "SELECT * FROM jobs WHERE status = ? ORDER BY updated_at DESC LIMIT ?", (DEAD, limit)).fetchall()
+        return [Job(row) for row in rows]
+
+    def requeue(self, job_id):
+        """Give a dead job a fresh set of attempts"""
+        now = time.time()
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, available_at = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (QUEUED, now, now, job_id, DEAD))
+            return cursor.rowcount == 1
+
+
+class JobHandler:
+    """run(job) does the work (raise to retry); on_dead(job, error) runs once attempts are exhausted"""
+
+    def __init__(self, run, on_dead=None):
+        self.run = run
+        self.on_dead = on_dead
+
+
+class JobWorkers:
+    """
+    Threads that lease jobs from a JobQueue and run them with the handler for their kind.
+
+    Leases of running jobs are renewed by a heartbeat thread, which also runs the
+    periodic maintenance registered with every(). stop() drains: no new jobs are
+    leased, running ones get `drain_seconds` to finish and whatever is still
+    running after that is released back to the queue for the next start.
+
+    `class_limits` ({job_class: n}) caps how many jobs of a class run at once, e.g.
+    long jobs get one worker less than there are so one is always left for short ones.
+    Submission-to-completion latencies of the last `latency_window_seconds` are kept
+    in memory for latency_percentiles().
+    """
+
+    # Latencies kept at most, however many jobs finish within the window
+    MAX_LATENCY_SAMPLES = 10000
+
+    def __init__(self, queue, handlers, workers, poll_seconds=2.0, drain_seconds=60,
+                 retention_seconds=24 * 3600, class_limits=None, latency_window_seconds=3600):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.class_limits = class_limits or {}
+        self.poll_seconds = poll_seconds
+        self.drain_seconds = drain_seconds
+        self.retention_seconds = retention_seconds
+        self._stopping = threading.Event()
+        self._wake = threading.Condition()
+        self._active = {}
+        self._active_lock = threading.Lock()
+        self._lease_lock = threading.Lock()
+        self.latency_window_seconds = latency_window_seconds
+        self._latencies = collections.deque(maxlen=self.MAX_LATENCY_SAMPLES)  # (finished_at, job_class, seconds)
+        self._threads = []
+        self._periodic = [[retention_seconds / 24, 0.0, lambda: queue.purge(retention_seconds)]]
+
+    def start(self):
+        recovered = self.queue.recover()
+        if recovered:
+            print(f"Job queue: resuming {recovered} jobs interrupted by the last shutdown")
+        # Daemon threads: the interpreter does not wait for them, stop() drains them explicitly
+        self._threads = [threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+                         for index in range(self.workers)]
+        self._threads.append(threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True))
+        for thread in self._threads:
+            thread.start()
+        print(f"Job queue: {self.workers} workers on {self.queue.directory}")
+
+    def every(self, seconds, task):
+        """Run task() about every `seconds` from the heartbeat thread (first run one interval after start)"""
+        self._periodic.append([seconds, time.time() + seconds, task])
+
+    def notify(self, jobs=1):
+        """Wake idle workers for `jobs` new jobs (call after enqueueing)"""
+        with self._wake:
+            self._wake.notify(jobs)
+
+    @property
+    def active(self):
+        return len(self._active)
+
+    def latency_percentiles(self, percentiles=(50, 95, 99)):
+        """
+        {job_class: {'jobs': n, 'p50': seconds, ...}} of the time from submission to
+        completion of the jobs that completed in the last latency_window_seconds
+        """
+        cutoff = time.time() - self.latency_window_seconds
+        latencies = {}
+        for finished_at, job_class, seconds in list(self._latencies):
+            if finished_at >= cutoff:
+                latencies.setdefault(job_class, []).append(seconds)
+        report = {}
+        for job_class, values in latencies.items():
+            report[job_class] = {'jobs': len(values)}
+            for percentile in percentiles:
+                report[job_class][f'p{percentile}'] = float(np.percentile(values, percentile))
+        return report
+
+    def _full_classes(self):
+        with self._active_lock:
+            running = [job.job_class for job in self._active.values()]
+        return [job_class for job_class, limit in self.class_limits.items() if running.count(job_class) >= limit]
+
+    def _lease(self):
+        # One lease at a time so two workers can't both take the last slot of a class
+        with self._lease_lock:
+            job = self.queue.lease(self._full_classes())
+            if job is not None:
+                with self._active_lock:
+                    self._active[job.id] = job
+        return job
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._lease()
+            except sqlite3.Error as e:
+                print(f"Job queue: lease failed: {e}")
+                job = None
+            if job is None:
+                with self._wake:
+                    self._wake.wait(self.poll_seconds)
+                continue
+            if self._stopping.is_set():
+                self.queue.release([job.id])
+                with self._active_lock:
+                    self._active.pop(job.id, None)
+                break
+            self._run(job)
+
+    def _run(self, job):
+        job_class = job.job_class or 'none'
+        JOB_WAIT_SECONDS.observe(max(0.0, job.leased_at - job.created_at), kind=job.kind, job_class=job_class)
+        try:
+            handler = self.handlers[job.kind]
+            handler.run(job)
+            self.queue.complete(job)
+            JOBS_FINISHED.inc(kind=job.kind, outcome='done')
+            finished_at = time.time()
+            JOB_LATENCY_SECONDS.observe(finished_at - job.created_at, kind=job.kind, job_class=job_class)
+            if job.job_class is not None:
+                self._latencies.append((finished_at, job.job_class, finished_at - job.created_at))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if self.queue.fail(job, error):
+                JOBS_FINISHED.inc(kind=job.kind, outcome='retry')
+                print(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}, will retry: {error}")
+            else:
+                JOBS_FINISHED.inc(kind=job.kind, outcome='dead')
+                print(f"Job {job.id} ({job.kind}) dead after {job.attempts} attempts: {error}")
+                handler = self.handlers.get(job.kind)
+                if handler is not None and handler.on_dead is not None:
+                    try:
+                        handler.on_dead(job, error)
+                    except Exception as hook_error:
+                        print(f"Dead-letter hook for job {job.id} failed: {hook_error}")
+        finally:
+            with self._active_lock:
+                self._active.pop(job.id, None)
+
+    def _heartbeat(self):
+        interval = min([self.queue.lease_seconds / 3] + [seconds for seconds, _, _ in self._periodic])
+        while not self._stopping.wait(interval):
+            with self._active_lock:
+                job_ids = list(self._active)
+            try:
+                self.queue.renew(job_ids)
+            except sqlite3.Error as e:
+                print(f"Job queue: lease renewal failed: {e}")
+
+            now = time.time()
+            for periodic in self._periodic:
+                seconds, due, task = periodic
+                if now >= due:
+                    periodic[1] = now + seconds
+                    try:
+                        task()
+                    except Exception as e:
+                        print(f"Job queue: maintenance task failed: {e}")
+
+    def stop(self):
+        """Drain: stop leasing, wait up to drain_seconds for running jobs, release the rest"""
+        if self._stopping.is_set():
+            return
+        print(f"Job queue: draining {self.active} running jobs")
+        self._stopping.set()
+        with self._wake:
+            self._wake.notify_all()
+        deadline = time.time() + self.drain_seconds
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.time()))
+        with self._active_lock:
+            unfinished = list(self._active)
+        if unfinished:
+            self.queue.release(unfinished)
+            print(f"Job queue: released {len(unfinished)} unfinished jobs for the next start")
+
+    def install_signal_handlers(self):
+        """Drain on SIGTERM/SIGINT before exiting (call from the main thread)"""
+        def handle(signum, frame):
+            self.stop()
+            raise SystemExit(0)
+
+        signal.signal(signal.SIGTERM, handle)
+        signal.signal(signal.SIGINT, handle)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Process-wide durable job queue configured in config.py"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(config.JOB_QUEUE_DIR, lease_seconds=config.JOB_LEASE_SECONDS,
+                              max_attempts=config.JOB_MAX_ATTEMPTS,
+                              retry_base_seconds=config.JOB_RETRY_BASE_SECONDS,
+                              retry_max_seconds=config.JOB_RETRY_MAX_SECONDS,
+                              aging_rate=config.JOB_AGING_RATE)
+        return _queue
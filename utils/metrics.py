@@ -0,0 +1,251 @@
+#metrics.py - Process-local metrics in the Prometheus text exposition format
+
+import bisect
+import collections
+import threading
+import time
+
+# Buckets in seconds for extraction stages and jobs (sub-millisecond stages up to the job time limit)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Buckets in seconds for DynamoDB calls
+DYNAMODB_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Buckets in seconds for job queue waits and submission-to-completion latency
+JOB_LATENCY_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600, 1800, 3600)
+
+# Buckets in bytes for uploads (50 KB .. 100 MB)
+UPLOAD_BUCKETS = (50e3, 100e3, 250e3, 500e3, 1e6, 2.5e6, 5e6, 10e6, 25e6, 50e6, 100e6)
+
+# Pending events folded into totals once this many accumulate, even between scrapes
+FOLD_THRESHOLD = 1024
+
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    """
+    Recording never takes a lock: events go onto a deque (append is atomic) and are
+    folded into the totals by whoever renders, or by a recorder once FOLD_THRESHOLD
+    events are pending and no other thread is already folding.
+    """
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._pending = collections.deque()
+        self._fold_lock = threading.Lock()
+
+    def _record(self, labels, value):
+        self._pending.append((tuple(str(labels.get(name, '')) for name in self.labelnames), value))
+        if len(self._pending) > FOLD_THRESHOLD and self._fold_lock.acquire(blocking=False):
+            try:
+                self._fold_pending()
+            finally:
+                self._fold_lock.release()
+
+    def _fold_pending(self):
+        while True:
+            try:
+                labels, value = self._pending.popleft()
+            except IndexError:
+                return
+            self._fold(labels, value)
+
+    def _fold(self, labels, value):
+        raise NotImplementedError
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        with self._fold_lock:
+            self._fold_pending()
+            samples = self._samples()
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in samples)
+        return lines
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        self._record(labels, amount)
+
+    def _fold(self, labels, value):
+        self._values[labels] = self._values.get(labels, 0) + value
+
+    def _samples(self):
+        return [(self.name, _label_text(self.labelnames, labels), value)
+                for labels, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        self._record(labels, value)
+
+    def _fold(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def _samples(self):
+        samples = []
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                samples.append((f"{self.name}_bucket",
+                                _label_text(self.labelnames, labels, [('le', _number(bound))]), cumulative))
+            samples.append((f"{self.name}_sum", _label_text(self.labelnames, labels), series[-1]))
+            samples.append((f"{self.name}_count", _label_text(self.labelnames, labels), cumulative))
+        return samples
+
+
+class Gauge(_Metric):
+    """Read at scrape time from `read()`, which returns a number or {label values tuple: number}"""
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, read, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.read = read
+
+    def _samples(self):
+        value = self.read()
+        if not isinstance(value, dict):
+            return [(self.name, '', value)]
+        return [(self.name, _label_text(self.labelnames, labels), sample)
+                for labels, sample in sorted(value.items())]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def add(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        return self.add(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, read, labelnames=()):
+        return self.add(Gauge(name, documentation, read, labelnames))
+
+    def render(self):
+        """All metrics in the Prometheus text format; a gauge that fails to read is left out"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                print(f"Metric {metric.name} failed: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Pipeline metrics recorded by the web process
+UPLOAD_BYTES = REGISTRY.histogram('voice_upload_bytes', 'Size of uploaded recordings',
+                                  ['task_type'], buckets=UPLOAD_BUCKETS)
+UPLOADS_REJECTED = REGISTRY.counter('voice_uploads_rejected_total', 'Uploads refused before processing (backlog, invalid audio)',
+                                    ['reason'])
+EXTRACTION_STAGE_SECONDS = REGISTRY.histogram('voice_extraction_stage_seconds',
+                                              'Wall time of each processing stage of a recording', ['stage'])
+EXTRACTION_JOB_SECONDS = REGISTRY.histogram('voice_extraction_job_seconds',
+                                            'Summed stage wall time of a recording (queue wait to database write)',
+                                            ['task_type', 'format'])
+EXTRACTION_CPU_SECONDS = REGISTRY.counter('voice_extraction_cpu_seconds_total',
+                                          'CPU time spent extracting features', ['task_type', 'format'])
+EXTRACTION_JOBS = REGISTRY.counter('voice_extraction_jobs_total', 'Finished extraction jobs by outcome',
+                                   ['outcome'])
+DYNAMODB_CALL_SECONDS = REGISTRY.histogram('voice_dynamodb_call_seconds', 'DynamoDB call latency including retries',
+                                           ['operation'], buckets=DYNAMODB_BUCKETS)
+DYNAMODB_THROTTLES = REGISTRY.counter('voice_dynamodb_throttles_total', 'Throttled DynamoDB attempts',
+                                      ['operation'])
+DYNAMODB_ERRORS = REGISTRY.counter('voice_dynamodb_errors_total', 'DynamoDB calls that ended in an error',
+                                   ['operation', 'code'])
+DONATION_COMPLETION_SECONDS = REGISTRY.histogram('voice_donation_completion_seconds',
+                                                'Time from the last task of a donation arriving to the donation '
+                                                'completing', ['outcome'])
+JOB_WAIT_SECONDS = REGISTRY.histogram('voice_job_wait_seconds', 'Time from submission until a worker took the job',
+                                      ['kind', 'job_class'], buckets=JOB_LATENCY_BUCKETS)
+JOB_LATENCY_SECONDS = REGISTRY.histogram('voice_job_latency_seconds', 'Time from submission until the job completed',
+                                         ['kind', 'job_class'], buckets=JOB_LATENCY_BUCKETS)
+JOBS_FINISHED = REGISTRY.counter('voice_jobs_finished_total', 'Job attempts by outcome (done, retry, dead)',
+                                 ['kind', 'outcome'])
+
+DYNAMODB_THROTTLE_CODES = ('ProvisionedThroughputExceededException', 'ThrottlingException',
+                           'RequestLimitExceeded')
+
+
+def record_processing_profile(profile, outcome='success'):
+    """Feed a recording's processing_profile (utils/profiling.py) into the extraction metrics"""
+    EXTRACTION_JOBS.inc(outcome=outcome)
+    if not profile:
+        return
+    labels = {'task_type': profile.get('task_type', 'unknown'), 'format': profile.get('format', 'unknown')}
+    for stage, timing in profile.get('stages', {}).items():
+        EXTRACTION_STAGE_SECONDS.observe(timing['wall_s'], stage=stage)
+    EXTRACTION_JOB_SECONDS.observe(profile.get('wall_s', 0), **labels)
+    EXTRACTION_CPU_SECONDS.inc(profile.get('cpu_s', 0), **labels)
+
+
+def _before_dynamodb_call(context, **kwargs):
+    context['metrics_started'] = time.perf_counter()
+
+
+def _dynamodb_retry_check(response, operation, **kwargs):
+    # Runs after every attempt; response is (http_response, parsed) or None on a connection error
+    if response is not None and response[1].get('Error', {}).get('Code') in DYNAMODB_THROTTLE_CODES:
+        DYNAMODB_THROTTLES.inc(operation=operation.name)
+
+
+def _after_dynamodb_call(parsed, model, context, **kwargs):
+    started = context.get('metrics_started')
+    if started is not None:
+        DYNAMODB_CALL_SECONDS.observe(time.perf_counter() - started, operation=model.name)
+    code = parsed.get('Error', {}).get('Code')
+    if code:
+        DYNAMODB_ERRORS.inc(operation=model.name, code=code)
+
+
+def instrument_dynamodb_client(client):
+    """Record latency, throttled attempts and errors of every call made through a boto3 DynamoDB client"""
+    events = client.meta.events
+    events.register_first('before-call.dynamodb', _before_dynamodb_call, unique_id='voice-metrics-before')
+    events.register('needs-retry.dynamodb', _dynamodb_retry_check, unique_id='voice-metrics-retry')
+    events.register('after-call.dynamodb', _after_dynamodb_call, unique_id='voice-metrics-after')
+    return client
@@ -0,0 +1,139 @@
+#praat_context.py
+
+import numpy as np
+from parselmouth.praat import call, run
+
+
+# Voice-quality measures produced by MEASUREMENT_SCRIPT, in vector order
+VOICE_QUALITY_MEASURES = (
+    'mean_intensity', 'std_intensity', 'min_intensity', 'max_intensity',
+    'jitter_local', 'jitter_rap', 'jitter_ppq5',
+    'shimmer_local', 'shimmer_apq3', 'shimmer_apq5',
+    'hnr', 'f1_mean', 'f2_mean', 'f3_mean',
+)
+
+# One script run per recording instead of a call() per measure. Arguments match the
+# per-call extractors in feature_extraction.py (the reference implementation).
+MEASUREMENT_SCRIPT = """
+sound = selected("Sound")
+intensity = selected("Intensity")
+pulses = selected("PointProcess")
+harmonicity = selected("Harmonicity")
+formant = selected("Formant")
+
+selectObject: intensity
+meanIntensity = Get mean: 0, 0, "dB"
+stdIntensity = Get standard deviation: 0, 0
+minIntensity = Get minimum: 0, 0, "Parabolic"
+maxIntensity = Get maximum: 0, 0, "Parabolic"
+
+selectObject: pulses
+jitterLocal = Get jitter (local): 0, 0, 0.0001, 0.02, 1.3
+jitterRap = Get jitter (rap): 0, 0, 0.0001, 0.02, 1.3
+jitterPpq5 = Get jitter (ppq5): 0, 0, 0.0001, 0.02, 1.3
+
+selectObject: sound, pulses
+shimmerLocal = Get shimmer (local): 0, 0, 0.0001, 0.02, 1.3, 1.6
+shimmerApq3 = Get shimmer (apq3): 0, 0, 0.0001, 0.02, 1.3, 1.6
+shimmerApq5 = Get shimmer (apq5): 0, 0, 0.0001, 0.02, 1.3, 1.6
+
+selectObject: harmonicity
+hnr = Get mean: 0, 0
+
+selectObject: formant
+f1 = Get mean: 1, 0, 0, "hertz"
+f2 = Get mean: 2, 0, 0, "hertz"
+f3 = Get mean: 3, 0, 0, "hertz"
+
+measures# = {meanIntensity, stdIntensity, minIntensity, maxIntensity,
+... jitterLocal, jitterRap, jitterPpq5, shimmerLocal, shimmerApq3, shimmerApq5,
+... hnr, f1, f2, f3}
+"""
+
+
+class PraatContext:
+    """
+    Shared Praat analyses for one recording.
+    Each Praat object (pitch, point process, intensity, harmonicity, formant) is
+    created on first use and memoized, so every Praat-based feature draws on the
+    same pitch track and glottal pulses instead of re-running the analysis.
+    Praat objects are mutable; callers must treat them as read-only.
+    """
+
+    def __init__(self, sound):
+        self.sound = sound
+
+        self._pitch = None
+        self._point_process = None
+        self._intensity = None
+        self._harmonicity = None
+        self._formant = None
+        self._measurements = None
+        self._measurements_error = None
+
+    @property
+    def pitch(self):
+        """Pitch track (autocorrelation, Praat defaults: 75-600 Hz)"""
+        if self._pitch is None:
+            self._pitch = self.sound.to_pitch()
+        return self._pitch
+
+    @property
+    def point_process(self):
+        """
+        Glottal pulses (cross-correlation) guided by the shared pitch track (jitter, shimmer,
+        voice breaks). Not identical to the "To PointProcess (periodic, cc)" 75-500 Hz pulses
+        used before pipeline 2.3, even below 500 Hz: pulse counts, jitter and shimmer shift
+        slightly (e.g. 563 vs 560 pulses, shimmer 0.0504 vs 0.0497 on a jittery 120 Hz vowel).
+        """
+        if self._point_process is None:
+            self._point_process = call([self.sound, self.pitch], "To PointProcess (cc)")
+        return self._point_process
+
+    @property
+    def intensity(self):
+        """Intensity contour"""
+        if self._intensity is None:
+            self._intensity = self.sound.to_intensity()
+        return self._intensity
+
+    @property
+    def harmonicity(self):
+        """Harmonicity (cross-correlation, 10 ms steps, 75 Hz floor)"""
+        if self._harmonicity is None:
+            self._harmonicity = call(self.sound, "To Harmonicity (cc)", 0.01, 75, 0.1, 1.0)
+        return self._harmonicity
+
+    @property
+    def formant(self):
+        """Burg formant track (5 formants up to 5500 Hz)"""
+        if self._formant is None:
+            self._formant = call(self.sound, "To Formant (burg)", 0.0025, 5, 5500, 0.025, 50)
+        return self._formant
+
+    @property
+    def measurements(self):
+        """
+        Every voice-quality measure from one MEASUREMENT_SCRIPT run, as a vector
+        ordered like VOICE_QUALITY_MEASURES (undefined measures are NaN)
+        """
+        if self._measurements_error is not None:
+            raise self._measurements_error  # Don't re-run a script that already failed for this recording
+        if self._measurements is None:
+            try:
+                objects = [self.sound, self.intensity, self.point_process, self.harmonicity, self.formant]
+                _, variables = run(objects, MEASUREMENT_SCRIPT, return_variables=True)
+            except Exception as e:
+                self._measurements_error = e
+                raise
+            self._measurements = np.asarray(variables['measures#'], dtype=np.float64)
+        return self._measurements
+
+    def measurement_dict(self):
+        """measurements keyed by feature name"""
+        return dict(zip(VOICE_QUALITY_MEASURES, self.measurements.tolist()))
+
+    def release(self, *names):
+        """Drop cached Praat objects that are no longer needed"""
+        for name in names:
+            setattr(self, f"_{name}", None)
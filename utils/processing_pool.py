@@ -0,0 +1,186 @@
+#processing_pool.py
+
+import atexit
+import multiprocessing
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import config
+
+
+class JobTimeoutError(Exception):
+    """Raised when an extraction job runs past its time limit"""
+
+
+def _init_worker():
+    """Import the heavy audio stack once per worker instead of on the first job"""
+    # Let the parent handle Ctrl+C / SIGTERM and shut the pool down cleanly
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import utils.feature_extraction  # noqa: F401
+
+
+class _AlarmInterrupt(BaseException):
+    """
+    Raised by SIGALRM inside a job. A BaseException so the job's own `except Exception`
+    handlers (extract_all_features returns failures as results) can't swallow it;
+    _run_with_alarm turns it into JobTimeoutError, which the job queue retries.
+    """
+
+
+def _raise_timeout(signum, frame):
+    raise _AlarmInterrupt()
+
+
+def _run_with_alarm(fn, args, kwargs, timeout):
+    """Run a job inside a worker process, interrupting it with SIGALRM after `timeout` seconds"""
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.alarm(int(timeout) if timeout else 0)
+    try:
+        return fn(*args, **kwargs)
+    except _AlarmInterrupt:
+        raise JobTimeoutError(f"Extraction job exceeded its time limit of {int(timeout)}s") from None
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+class InFlightCounter:
+    """Counts submitted jobs that have not finished yet (running or waiting for a worker)"""
+
+    def _init_counter(self):
+        self._in_flight = 0
+        self._counter_lock = threading.Lock()
+
+    def _track(self, future):
+        with self._counter_lock:
+            self._in_flight += 1
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future):
+        with self._counter_lock:
+            self._in_flight -= 1
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    @property
+    def queue_depth(self):
+        """Jobs waiting for a free worker"""
+        return max(0, self._in_flight - self.max_workers)
+
+
+class ProcessExtractionExecutor(InFlightCounter):
+    """
+    Runs extraction jobs in a pool of worker processes so librosa/Praat work
+    uses every core instead of contending for the GIL. Workers are recycled
+    after `max_tasks_per_child` jobs and each job is bounded by a time limit.
+    """
+
+    def __init__(self, max_workers, max_tasks_per_child=None, timeout=None):
+        self.max_workers = max_workers
+        self.max_tasks_per_child = max_tasks_per_child or None
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pool = None
+        self._init_counter()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # max_tasks_per_child requires a non-fork start method; spawn also avoids
+                # inheriting the Flask process's threads and open sockets
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    max_tasks_per_child=self.max_tasks_per_child
+                )
+            return self._pool
+
+    def submit(self, fn, *args, timeout=None, **kwargs):
+        """Schedule fn(*args, **kwargs) in a worker and return a Future"""
+        timeout = timeout or self.timeout
+        pool = self._get_pool()
+        try:
+            return self._track(pool.submit(_run_with_alarm, fn, args, kwargs, timeout))
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); the jobs it took down have failed, start a fresh pool
+            print("Extraction pool broken, restarting it")
+            self._discard(pool)
+            return self._track(self._get_pool().submit(_run_with_alarm, fn, args, kwargs, timeout))
+
+    def _discard(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn, *args, timeout=None, **kwargs):
+        """Run a job in the pool and wait for its result in the calling thread"""
+        timeout = timeout or self.timeout
+        future = self.submit(fn, *args, timeout=timeout, **kwargs)
+        try:
+            # Grace period: the worker raises JobTimeoutError itself at `timeout`
+            return future.result(timeout=timeout + 30 if timeout else None)
+        except FutureTimeoutError:
+            future.cancel()
+            raise JobTimeoutError(f"Extraction job did not return within {timeout}s")
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=True)
+                self._pool = None
+
+
+class ThreadExtractionExecutor(InFlightCounter):
+    """In-process fallback with the same interface (no isolation, time limit only bounds the wait)"""
+
+    def __init__(self, max_workers, timeout=None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extraction')
+        self._init_counter()
+
+    def submit(self, fn, *args, timeout=None, **kwargs):
+        return self._track(self._pool.submit(fn, *args, **kwargs))
+
+    def run(self, fn, *args, timeout=None, **kwargs):
+        timeout = timeout or self.timeout
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise JobTimeoutError(f"Extraction job did not return within {timeout}s")
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_extraction_executor():
+    """Return the process-wide extraction executor configured in config.py"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if config.EXTRACTION_EXECUTOR == 'thread':
+                _executor = ThreadExtractionExecutor(
+                    max_workers=config.EXTRACTION_WORKERS,
+                    timeout=config.EXTRACTION_JOB_TIMEOUT
+                )
+            else:
+                _executor = ProcessExtractionExecutor(
+                    max_workers=config.EXTRACTION_WORKERS,
+                    max_tasks_per_child=config.EXTRACTION_MAX_TASKS_PER_CHILD,
+                    timeout=config.EXTRACTION_JOB_TIMEOUT
+                )
+            print(f"Extraction executor: {config.EXTRACTION_EXECUTOR} with {config.EXTRACTION_WORKERS} workers")
+            atexit.register(_executor.shutdown, False)
+        return _executor
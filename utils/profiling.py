@@ -0,0 +1,150 @@
+#profiling.py
+
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import psutil
+
+# Bump when the processing_profile layout changes
+PROFILE_VERSION = 1
+
+
+def max_rss_bytes():
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KiB
+
+
+def rss_bytes():
+    """Current resident set size of this process"""
+    return psutil.Process().memory_info().rss
+
+
+class StageProfiler:
+    """
+    Wall time, CPU time and memory of the named stages of one extraction.
+
+    Each stage records its wall and CPU seconds and how much the process's RSS
+    grew (or shrank) across it. If tracemalloc is tracing, the stage's own peak
+    of traced Python/NumPy allocations above what was live when it started is
+    recorded too. A stage entered more than once accumulates.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._open_peaks = []  # Traced peak seen so far by each enclosing stage
+
+    @contextmanager
+    def stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # reset_peak() is global: fold the current peak into the enclosing stages first
+            current_peak = tracemalloc.get_traced_memory()[1]
+            self._open_peaks = [max(peak, current_peak) for peak in self._open_peaks]
+            traced_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            self._open_peaks.append(traced_start)
+        rss_start = rss_bytes()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            entry = self.add(name, time.perf_counter() - wall_start, time.process_time() - cpu_start,
+                             rss_bytes() - rss_start)
+            if tracing:
+                peak = max(self._open_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._open_peaks:
+                    self._open_peaks[-1] = max(self._open_peaks[-1], peak)
+                entry['peak_traced_bytes'] = max(entry.get('peak_traced_bytes', 0), peak - traced_start)
+
+    def add(self, name, seconds, cpu_seconds=0.0, rss_delta_bytes=0):
+        """Record a stage measured elsewhere (e.g. queue wait in the parent process)"""
+        entry = self.stages.setdefault(name, {'seconds': 0.0, 'cpu_seconds': 0.0, 'rss_delta_bytes': 0})
+        entry['seconds'] += seconds
+        entry['cpu_seconds'] += cpu_seconds
+        entry['rss_delta_bytes'] += rss_delta_bytes
+        return entry
+
+    @property
+    def total_seconds(self):
+        return sum(entry['seconds'] for entry in self.stages.values())
+
+    def as_dict(self):
+        return {name: dict(entry) for name, entry in self.stages.items()}
+
+
+def compact_stages(profiler):
+    """Stage entries rounded for storage: {stage: {'wall_s', 'cpu_s', 'rss_delta_mb'}}"""
+    return {
+        name: {
+            'wall_s': round(entry['seconds'], 4),
+            'cpu_s': round(entry['cpu_seconds'], 4),
+            'rss_delta_mb': round(entry['rss_delta_bytes'] / 2 ** 20, 1),
+        }
+        for name, entry in profiler.stages.items()
+    }
+
+
+def processing_profile(profiler, **context):
+    """
+    Compact per-recording profile stored next to the summary: the job's context
+    (task type, input format, duration, ...) and every stage's wall time, CPU
+    time and RSS delta
+    """
+    stages = compact_stages(profiler)
+    return dict(context, **{
+        'profile_version': PROFILE_VERSION,
+        'wall_s': round(sum(stage['wall_s'] for stage in stages.values()), 4),
+        'cpu_s': round(sum(stage['cpu_s'] for stage in stages.values()), 4),
+        'stages': stages,
+    })
+
+
+def add_stages(profile, profiler):
+    """Merge stages measured outside the worker (queue wait, database writes) into a stored profile"""
+    for name, stage in compact_stages(profiler).items():
+        profile['stages'][name] = stage
+        profile['wall_s'] = round(profile.get('wall_s', 0) + stage['wall_s'], 4)
+        profile['cpu_s'] = round(profile.get('cpu_s', 0) + stage['cpu_s'], 4)
+    return profile
+
+
+def aggregate_profiles(profiles, keys=('task_type', 'format')):
+    """
+    Compute bill per combination of `keys`: recordings, total and per-recording
+    CPU seconds, wall-time percentiles and CPU seconds per stage, sorted by total
+    CPU (largest first). Profiles are dicts as produced by processing_profile().
+    """
+    import numpy as np
+
+    buckets = {}
+    for profile in profiles:
+        bucket = buckets.setdefault(tuple(profile.get(key, 'unknown') for key in keys), [])
+        bucket.append(profile)
+
+    total_cpu = sum(float(profile.get('cpu_s', 0)) for profile in profiles) or 1.0
+    rows = []
+    for bucket_key, bucket in buckets.items():
+        cpu = np.array([float(profile.get('cpu_s', 0)) for profile in bucket])
+        wall = np.array([float(profile.get('wall_s', 0)) for profile in bucket])
+        audio_seconds = sum(float(profile.get('duration_s', 0)) for profile in bucket)
+        stage_cpu = {}
+        for profile in bucket:
+            for name, stage in profile.get('stages', {}).items():
+                stage_cpu[name] = stage_cpu.get(name, 0.0) + float(stage.get('cpu_s', 0))
+
+        rows.append(dict(zip(keys, bucket_key), **{
+            'recordings': len(bucket),
+            'cpu_s': float(cpu.sum()),
+            'cpu_share': float(cpu.sum() / total_cpu),
+            'cpu_s_per_recording': float(cpu.mean()),
+            'cpu_s_per_audio_second': float(cpu.sum() / audio_seconds) if audio_seconds else None,
+            'wall_s_p50': float(np.percentile(wall, 50)),
+            'wall_s_p95': float(np.percentile(wall, 95)),
+            'stage_cpu_s': dict(sorted(stage_cpu.items(), key=lambda item: -item[1])),
+        }))
+
+    return sorted(rows, key=lambda row: -row['cpu_s'])
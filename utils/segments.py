@@ -0,0 +1,43 @@
+#segments.py
+
+import numpy as np
+
+
+def find_runs(mask):
+    """
+    Start and end (exclusive) frame indices of every run of True values in a
+    boolean mask, found from the rising and falling edges of the mask.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return starts, ends
+
+
+def segment_statistics(mask, frame_seconds):
+    """
+    Speech/pause timing from a per-frame speech mask.
+
+    Speech segments are runs of speech frames; pauses are the gaps between
+    consecutive segments (leading and trailing silence is not a pause).
+    Lengths are in seconds.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    starts, ends = find_runs(mask)
+    segment_lengths = (ends - starts) * frame_seconds
+    pause_lengths = (starts[1:] - ends[:-1]) * frame_seconds
+
+    total_duration = len(mask) * frame_seconds
+    speech_ratio = float(np.mean(mask)) if len(mask) else 0.0
+
+    return {
+        "speech_ratio": speech_ratio,
+        "pause_ratio": 1 - speech_ratio,
+        "speaking_rate": len(starts) / total_duration if total_duration > 0 else 0,
+        "num_speech_segments": len(starts),
+        "avg_segment_length": float(np.mean(segment_lengths)) if len(segment_lengths) else 0,
+        "num_pauses": len(pause_lengths),
+        "median_pause_length": float(np.median(pause_lengths)) if len(pause_lengths) else 0,
+        "longest_pause": float(np.max(pause_lengths)) if len(pause_lengths) else 0
+    }
@@ -0,0 +1,71 @@
+#spectral_context.py
+
+import numpy as np
+import librosa
+
+
+class SpectralContext:
+    """
+    Shared spectral analysis for one signal.
+    Computes the STFT and mel spectrogram once (lazily) so every librosa
+    feature can be fed from the same matrices instead of recomputing the FFT.
+    Parameters match librosa defaults so results are unchanged.
+    """
+
+    def __init__(self, y, sr, n_fft=2048, hop_length=512, n_mels=128):
+        self.y = y
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mels = n_mels
+
+        self._stft = None
+        self._magnitude = None
+        self._power = None
+        self._mel_power = None
+        self._log_mel = None
+
+    @property
+    def stft(self):
+        """Complex STFT matrix"""
+        if self._stft is None:
+            self._stft = librosa.stft(self.y, n_fft=self.n_fft, hop_length=self.hop_length)
+        return self._stft
+
+    @property
+    def magnitude(self):
+        """Magnitude spectrogram |STFT| (spectral contrast, centroid, bandwidth, rolloff)"""
+        if self._magnitude is None:
+            self._magnitude = np.abs(self.stft)
+        return self._magnitude
+
+    @property
+    def power(self):
+        """Power spectrogram |STFT|^2 (chroma, mel)"""
+        if self._power is None:
+            self._power = self.magnitude ** 2
+        return self._power
+
+    @property
+    def mel_power(self):
+        """Mel power spectrogram"""
+        if self._mel_power is None:
+            self._mel_power = librosa.feature.melspectrogram(S=self.power, sr=self.sr, n_mels=self.n_mels)
+        return self._mel_power
+
+    @property
+    def log_mel(self):
+        """Log-power (dB) mel spectrogram (MFCC, onset strength)"""
+        if self._log_mel is None:
+            self._log_mel = librosa.power_to_db(self.mel_power)
+        return self._log_mel
+
+    def harmonic(self, margin=1.0):
+        """Harmonic component of the signal via HPSS on the shared STFT (same as librosa.effects.harmonic)"""
+        stft_harm = librosa.decompose.hpss(self.stft, margin=margin)[0]
+        return librosa.istft(stft_harm, hop_length=self.hop_length, dtype=self.y.dtype, length=len(self.y))
+
+    def release(self, *names):
+        """Drop cached matrices that are no longer needed to keep peak memory down"""
+        for name in names:
+            setattr(self, f"_{name}", None)
@@ -0,0 +1,379 @@
+#streaming_features.py
+
+import tempfile
+
+import numpy as np
+import librosa
+import scipy.fftpack
+
+
+class RunningStats:
+    """
+    Mergeable per-coefficient mean/std (Welford / Chan et al. parallel update).
+    std is the population standard deviation, matching np.std(..., axis=1).
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = None
+        self.m2 = None
+
+    def update(self, frames):
+        """Add a (coefficients x frames) block, or a 1-D block of scalar frames"""
+        frames = np.asarray(frames, dtype=np.float64)
+        if frames.ndim == 1:
+            frames = frames[np.newaxis, :]
+        n_b = frames.shape[1]
+        if n_b == 0:
+            return
+
+        mean_b = frames.mean(axis=1)
+        m2_b = ((frames - mean_b[:, np.newaxis]) ** 2).sum(axis=1)
+        self._merge(n_b, mean_b, m2_b)
+
+    def merge(self, other):
+        """Combine with statistics accumulated elsewhere (e.g. another block range)"""
+        if other.n:
+            self._merge(other.n, other.mean, other.m2)
+
+    def _merge(self, n_b, mean_b, m2_b):
+        if self.n == 0:
+            self.n, self.mean, self.m2 = n_b, mean_b.copy(), m2_b.copy()
+            return
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * (n_b / n)
+        self.m2 = self.m2 + m2_b + delta ** 2 * (self.n * n_b / n)
+        self.n = n
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / self.n) if self.n else None
+
+    def scalar_mean(self):
+        return float(self.mean[0]) if self.n else 0.0
+
+
+class ArraySource:
+    """Random-access sample reader over an in-memory signal"""
+
+    def __init__(self, y, sr):
+        self.y = y
+        self.sr = sr
+        self.n_samples = len(y)
+
+    def read(self, start, stop):
+        return self.y[max(start, 0):min(stop, self.n_samples)]
+
+
+class SoundFileSource:
+    """Random-access sample reader over a WAV/FLAC file (mono mixdown), reading only the requested range"""
+
+    def __init__(self, path):
+        import soundfile as sf
+        self._file = sf.SoundFile(path)
+        self.sr = self._file.samplerate
+        self.n_samples = self._file.frames
+
+    def read(self, start, stop):
+        start, stop = max(start, 0), min(stop, self.n_samples)
+        self._file.seek(start)
+        block = self._file.read(stop - start, dtype='float32', always_2d=True)
+        return block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+
+    def close(self):
+        self._file.close()
+
+
+def _padded_segment(source, start, stop, mode='constant'):
+    """Samples [start, stop) of the source, padded outside the signal like librosa's center=True framing"""
+    data = np.asarray(source.read(start, stop), dtype=np.float32)
+    pad_before = max(0, -start)
+    pad_after = (stop - start) - pad_before - len(data)
+    if pad_before or pad_after:
+        data = np.pad(data, (pad_before, pad_after), mode=mode if len(data) else 'constant')
+    return data
+
+
+def iter_frame_blocks(n_frames, block_frames):
+    """Yield (first_frame, end_frame) for consecutive blocks of STFT frames"""
+    for k0 in range(0, n_frames, block_frames):
+        yield k0, min(k0 + block_frames, n_frames)
+
+
+def _frames_segment(source, k0, k1, n_fft, hop_length, mode='constant'):
+    """
+    Samples covering frames [k0, k1) for center=False analysis. Frame k is
+    centered on sample k * hop_length, as with librosa's default center=True.
+    """
+    start = k0 * hop_length - n_fft // 2
+    stop = (k1 - 1) * hop_length + n_fft // 2
+    return _padded_segment(source, start, stop, mode=mode)
+
+
+class TuningEstimator:
+    """
+    librosa.estimate_tuning over a spectrogram seen one block at a time.
+
+    estimate_tuning keeps piptrack peaks at or above the median peak magnitude
+    and returns the most common tuning residual among them. The median is found
+    exactly in two passes: the first histograms peak magnitudes (with their
+    residuals), the second collects the exact values in the bins holding the median.
+    """
+
+    LOG_MAG_EDGES = np.linspace(-20, 10, 1201)
+    RESIDUAL_EDGES = np.linspace(-0.5, 0.5, 101)  # estimate_tuning(resolution=0.01)
+
+    def __init__(self, sr, n_fft, bins_per_octave):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.bins_per_octave = bins_per_octave
+        self.counts = np.zeros((len(self.LOG_MAG_EDGES) - 1, len(self.RESIDUAL_EDGES) - 1))
+        self._median_bins = None
+        self._candidates = []
+
+    def _peaks(self, spectrogram):
+        pitch, mag = librosa.piptrack(S=spectrogram, sr=self.sr, n_fft=self.n_fft)
+        peaks = pitch > 0
+        mag = mag[peaks]
+        residual = np.mod(self.bins_per_octave * librosa.hz_to_octs(pitch[peaks]), 1.0)
+        residual[residual >= 0.5] -= 1.0
+        log_mag = np.clip(np.log10(np.maximum(mag, 1e-20)), self.LOG_MAG_EDGES[0], self.LOG_MAG_EDGES[-1] - 1e-9)
+        bins = np.searchsorted(self.LOG_MAG_EDGES, log_mag, side='right') - 1
+        return mag, residual, bins
+
+    def add_histogram(self, spectrogram):
+        """First pass: histogram the block's peaks"""
+        mag, residual, bins = self._peaks(spectrogram)
+        residual_bins = np.clip(np.searchsorted(self.RESIDUAL_EDGES, residual, side='right') - 1,
+                                0, len(self.RESIDUAL_EDGES) - 2)
+        np.add.at(self.counts, (bins, residual_bins), 1)
+
+    @property
+    def median_bins(self):
+        """Magnitude bins holding the median peak(s), fixed once the first pass is done"""
+        if self._median_bins is None:
+            cumulative = np.cumsum(self.counts.sum(axis=1))
+            total = int(cumulative[-1])
+            ranks = [(total - 1) // 2, total // 2]
+            self._median_bins = tuple(int(np.searchsorted(cumulative, rank, side='right')) for rank in ranks)
+        return self._median_bins
+
+    def add_median_candidates(self, spectrogram):
+        """Second pass: keep the exact peaks that fall in the median bins"""
+        if not self.counts.any():
+            return
+        low, high = self.median_bins
+        mag, residual, bins = self._peaks(spectrogram)
+        keep = (bins >= low) & (bins <= high)
+        if keep.any():
+            self._candidates.append((mag[keep], residual[keep]))
+
+    @property
+    def tuning(self):
+        total = int(self.counts.sum())
+        if total == 0:
+            return 0.0
+        low, high = self.median_bins
+        if self._candidates:
+            mag = np.concatenate([m for m, _ in self._candidates])
+            residual = np.concatenate([r for _, r in self._candidates])
+        else:
+            mag = residual = np.zeros(0)
+
+        # np.median over all peaks, from the candidates' ranks
+        below = int(self.counts[:low].sum())
+        ordered = np.sort(mag)
+        median = 0.5 * (ordered[(total - 1) // 2 - below] + ordered[total // 2 - below])
+
+        residual_counts = self.counts[high + 1:].sum(axis=0)
+        residual_counts += np.histogram(residual[mag >= median], self.RESIDUAL_EDGES)[0]
+        return float(self.RESIDUAL_EDGES[np.argmax(residual_counts)])
+
+
+def _tempo_from_onset_envelope(onset_envelope, sr, hop_length, block_frames):
+    """
+    The tempo librosa.beat.beat_track(onset_envelope=...) reports, with the
+    autocorrelation tempogram averaged block by block. The full tempogram costs
+    ~27 KB per frame (hundreds of MB for a 300 s recording); only its mean is needed.
+    """
+    if not onset_envelope.any():
+        return 0.0  # beat_track's answer for an envelope without onsets
+
+    # Same window and centering (linear ramp to zero) as librosa.feature.tempo / tempogram
+    win_length = int(librosa.time_to_frames(8.0, sr=sr, hop_length=hop_length))
+    padded = np.pad(onset_envelope, win_length // 2, mode='linear_ramp', end_values=[0, 0])
+
+    tempogram_sum = np.zeros(win_length)
+    for k0, k1 in iter_frame_blocks(len(onset_envelope), block_frames):
+        tempogram = librosa.feature.tempogram(onset_envelope=padded[k0:k1 + win_length - 1], sr=sr,
+                                              hop_length=hop_length, win_length=win_length, center=False)
+        tempogram_sum += tempogram.sum(axis=1)
+
+    mean_tempogram = (tempogram_sum / len(onset_envelope))[:, np.newaxis]
+    return librosa.feature.tempo(tg=mean_tempogram, sr=sr, hop_length=hop_length)[0]
+
+
+def extract_librosa_features_streaming(source, block_seconds=10.0, n_fft=2048, hop_length=512, n_mels=128,
+                                       parts=('spectral', 'tonnetz', 'tempo')):
+    """
+    Bounded-memory equivalent of extract_librosa_features.
+
+    Reads the signal in blocks of STFT frames and keeps only running statistics,
+    so peak memory is set by the block size instead of the recording length.
+    Passes over the signal:
+      1-3. global quantities librosa derives from the whole spectrogram (mel
+           maximum for the 80 dB floor, chroma and CQT tuning) and the harmonic
+           component, which is spooled to a temporary file
+      4.   every feature
+    Only the work the requested `parts` need is done (the harmonic spool and CQT
+    tuning passes exist for tonnetz alone).
+
+    Values match the batch path to floating-point precision (tonnetz to ~1e-5,
+    from HPSS block edges).
+    """
+    spectral_wanted, tonnetz_wanted, tempo_wanted = ('spectral' in parts), ('tonnetz' in parts), ('tempo' in parts)
+    sr = source.sr
+    block_frames = max(1, int(block_seconds * sr / hop_length))
+    n_frames = 1 + source.n_samples // hop_length
+
+    mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+    # chroma_stft tunes on the power spectrogram; chroma_cqt (tonnetz) on the harmonic component's magnitude
+    chroma_tuning = TuningEstimator(sr, n_fft, bins_per_octave=12)
+    cqt_tuning = TuningEstimator(sr, n_fft, bins_per_octave=36)
+
+    # HPSS median filtering and the longest CQT filter (~1.6 s at 22 kHz) need context around each block
+    context_frames = int(np.ceil(2.0 * sr / hop_length))
+
+    def power_blocks(signal):
+        for k0, k1 in iter_frame_blocks(n_frames, block_frames):
+            segment = _frames_segment(signal, k0, k1, n_fft, hop_length)
+            yield k0, k1, np.abs(librosa.stft(segment, n_fft=n_fft, hop_length=hop_length, center=False)) ** 2
+
+    with tempfile.TemporaryFile(prefix='harmonic-') as spool:
+        # --- Pass 1: mel maximum, chroma tuning histogram, harmonic component to the spool ---
+        mel_max = 0.0
+        if spectral_wanted or tempo_wanted:
+            for k0, k1, power in power_blocks(source):
+                mel_max = max(mel_max, float(np.max(mel_basis @ power)))
+                if spectral_wanted:
+                    chroma_tuning.add_histogram(power)
+                del power
+
+        harmonic_source = None
+        if tonnetz_wanted:
+            for k0, k1 in iter_frame_blocks(n_frames, block_frames):
+                # librosa.effects.harmonic on the block plus context; keep the block's own samples
+                t0 = max(k0 - context_frames, 0) * hop_length
+                t1 = min((k1 + context_frames) * hop_length, source.n_samples)
+                harmonic = librosa.effects.harmonic(np.asarray(source.read(t0, t1), dtype=np.float32))
+                core_stop = min(k1 * hop_length, source.n_samples)
+                spool.write(harmonic[k0 * hop_length - t0:core_stop - t0].astype(np.float32).tobytes())
+                del harmonic
+
+            spool.flush()
+            if source.n_samples:
+                harmonic_source = ArraySource(
+                    np.memmap(spool, dtype=np.float32, mode='r', shape=(source.n_samples,)), sr)
+            else:
+                harmonic_source = ArraySource(np.zeros(0, dtype=np.float32), sr)
+
+        # --- Pass 2: chroma tuning median, CQT tuning histogram ---
+        if spectral_wanted:
+            for _, _, power in power_blocks(source):
+                chroma_tuning.add_median_candidates(power)
+        if tonnetz_wanted:
+            for _, _, power in power_blocks(harmonic_source):
+                cqt_tuning.add_histogram(np.sqrt(power))
+
+            # --- Pass 3: CQT tuning median ---
+            for _, _, power in power_blocks(harmonic_source):
+                cqt_tuning.add_median_candidates(np.sqrt(power))
+
+        chroma_tuning = chroma_tuning.tuning if spectral_wanted else None
+        cqt_tuning = cqt_tuning.tuning if tonnetz_wanted else None
+        log_mel_floor = 10.0 * np.log10(max(mel_max, 1e-10)) - 80.0  # power_to_db(top_db=80)
+
+        # --- Pass 4: accumulate features ---
+        stats = {name: RunningStats() for name in (
+            'mfcc', 'chroma', 'mel', 'contrast', 'tonnetz', 'centroid', 'bandwidth', 'rolloff', 'zcr', 'rms'
+        )}
+        onset_envelope = np.zeros(n_frames if tempo_wanted else 0, dtype=np.float32)  # 4 bytes per frame
+        previous_log_mel = None
+
+        for k0, k1 in iter_frame_blocks(n_frames, block_frames):
+            if spectral_wanted or tempo_wanted:
+                segment = _frames_segment(source, k0, k1, n_fft, hop_length)
+                magnitude = np.abs(librosa.stft(segment, n_fft=n_fft, hop_length=hop_length, center=False))
+                power = magnitude ** 2
+
+                mel = mel_basis @ power
+                log_mel = np.maximum(librosa.power_to_db(mel, top_db=None), log_mel_floor)
+
+            if spectral_wanted:
+                stats['mel'].update(mel)
+                stats['mfcc'].update(scipy.fftpack.dct(log_mel, axis=0, type=2, norm='ortho')[:13])
+                stats['chroma'].update(librosa.feature.chroma_stft(S=power, sr=sr, tuning=chroma_tuning))
+                stats['contrast'].update(librosa.feature.spectral_contrast(S=magnitude, sr=sr))
+                stats['centroid'].update(librosa.feature.spectral_centroid(S=magnitude, sr=sr)[0])
+                stats['bandwidth'].update(librosa.feature.spectral_bandwidth(S=magnitude, sr=sr)[0])
+                stats['rolloff'].update(librosa.feature.spectral_rolloff(S=magnitude, sr=sr)[0])
+
+                # Time-domain frame features (ZCR pads with edge values, RMS with zeros)
+                edge_segment = _frames_segment(source, k0, k1, n_fft, hop_length, mode='edge')
+                stats['zcr'].update(librosa.feature.zero_crossing_rate(edge_segment, center=False)[0])
+                stats['rms'].update(librosa.feature.rms(y=segment, center=False)[0])
+
+            if tempo_wanted:
+                # Onset strength (lag 1, median over mel bands) needs the previous block's last frame
+                if previous_log_mel is not None:
+                    log_mel_with_lag = np.concatenate([previous_log_mel, log_mel], axis=1)
+                else:
+                    log_mel_with_lag = log_mel
+                flux = np.median(np.maximum(0.0, np.diff(log_mel_with_lag, axis=1)), axis=0)
+                # The difference between frames j and j+1 lands at envelope index j + lag + n_fft // (2 * hop)
+                first_diff_frame = k0 - 1 if previous_log_mel is not None else k0
+                offset = first_diff_frame + 1 + n_fft // (2 * hop_length)
+                end = min(offset + len(flux), n_frames)
+                if end > offset:
+                    onset_envelope[offset:end] = flux[:end - offset]
+                previous_log_mel = log_mel[:, -1:]
+                del log_mel_with_lag
+
+            if spectral_wanted or tempo_wanted:
+                del segment, magnitude, power, mel, log_mel
+
+            if tonnetz_wanted:
+                # Tonnetz of the spooled harmonic component, with context on both sides
+                t0 = max(k0 - context_frames, 0)
+                harmonic = np.asarray(harmonic_source.read(t0 * hop_length, (k1 + context_frames) * hop_length))
+                if len(harmonic):
+                    tonnetz = librosa.feature.tonnetz(y=harmonic, sr=sr, tuning=cqt_tuning)
+                    stats['tonnetz'].update(tonnetz[:, k0 - t0:k1 - t0])
+                    del tonnetz
+                del harmonic
+
+        del harmonic_source
+
+    features = {}
+    if spectral_wanted:
+        features.update({
+            'mfcc_mean': stats['mfcc'].mean,
+            'mfcc_std': stats['mfcc'].std,
+            'chroma_mean': stats['chroma'].mean,
+            'chroma_std': stats['chroma'].std,
+            'mel_spectrogram_mean': stats['mel'].mean,
+            'spectral_contrast_mean': stats['contrast'].mean,
+            'spectral_contrast_std': stats['contrast'].std,
+            'spectral_centroid': stats['centroid'].scalar_mean(),
+            'spectral_bandwidth': stats['bandwidth'].scalar_mean(),
+            'spectral_rolloff': stats['rolloff'].scalar_mean(),
+            'zero_crossing_rate': stats['zcr'].scalar_mean(),
+            'rms_energy': stats['rms'].scalar_mean(),
+        })
+    if tonnetz_wanted:
+        features['tonnetz_mean'] = stats['tonnetz'].mean
+        features['tonnetz_std'] = stats['tonnetz'].std
+    if tempo_wanted:
+        features['tempo'] = _tempo_from_onset_envelope(onset_envelope, sr, hop_length, block_frames)
+    return features
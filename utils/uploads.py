@@ -0,0 +1,52 @@
+#uploads.py - Upload bodies streamed to disk instead of held in memory
+
+import hashlib
+import tempfile
+
+from flask import Request
+
+# Leading bytes kept from every upload (enough for any container's magic bytes)
+HEAD_BYTES = 64
+
+
+class SpooledUpload:
+    """
+    A file upload written chunk by chunk to a temporary file in `directory`, with
+    its sha256, size and leading bytes computed while it streams in. Reads, seeks
+    and close() go to the file; the file is deleted when closed (at the end of the
+    request), so keeping it means linking it elsewhere first (JobQueue.enqueue).
+    """
+
+    def __init__(self, directory):
+        self.file = tempfile.NamedTemporaryFile(dir=directory, prefix='upload-', suffix='.tmp')
+        self.name = self.file.name
+        self.size = 0
+        self.head = b''
+        self._sha256 = hashlib.sha256()
+
+    def write(self, data):
+        if len(self.head) < HEAD_BYTES:
+            self.head += bytes(data[:HEAD_BYTES - len(self.head)])
+        self._sha256.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+class SpoolingRequest(Request):
+    """Flask request whose file uploads stream into SpooledUpload files in `spool_directory()`"""
+
+    @staticmethod
+    def spool_directory():
+        from .job_queue import get_job_queue
+        # The job queue's audio directory, so a queued upload is linked into place rather than copied
+        return get_job_queue().audio_directory
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledUpload(self.spool_directory())
@@ -0,0 +1,340 @@
+#voice_quality.py
+
+import numpy as np
+import scipy.signal
+
+from .segments import find_runs
+
+
+# Praat's perturbation settings (period floor/ceiling in seconds, maximum period and amplitude factors)
+PERIOD_FLOOR = 0.0001
+PERIOD_CEILING = 0.02
+MAX_PERIOD_FACTOR = 1.3
+MAX_AMPLITUDE_FACTOR = 1.6
+
+
+def _parabolic_offset(left, centre, right):
+    """Sub-sample offset of the extremum of a parabola through three equally spaced points"""
+    denominator = left - 2 * centre + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.where(np.abs(denominator) > 1e-12, 0.5 * (left - right) / denominator, 0.0)
+    return np.clip(offset, -1.0, 1.0)
+
+
+def perturbation_quotient(values, valid, points, max_factor):
+    """
+    Praat-style perturbation of a sequence of periods or amplitudes.
+
+    points=2: mean absolute difference between consecutive values (jitter/shimmer local);
+    points=3/5: mean absolute deviation of each value from the average of the
+    `points` values around it (RAP/PPQ5, APQ3/APQ5). Only windows whose values are
+    all valid and whose consecutive ratios stay within max_factor count. The result
+    is divided by the mean of the valid values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.asarray(valid, dtype=bool)
+    if len(values) < points or not valid.any():
+        return np.nan
+
+    windows = np.lib.stride_tricks.sliding_window_view(values, points)
+    window_valid = np.lib.stride_tricks.sliding_window_view(valid, points).all(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = windows[:, 1:] / windows[:, :-1]
+    window_valid &= np.all((ratios <= max_factor) & (ratios >= 1.0 / max_factor), axis=1)
+    if not window_valid.any():
+        return np.nan
+
+    windows = windows[window_valid]
+    if points == 2:
+        deviation = np.abs(windows[:, 1] - windows[:, 0])
+    else:
+        deviation = np.abs(windows[:, points // 2] - windows.mean(axis=1))
+    return float(np.mean(deviation) / np.mean(values[valid]))
+
+
+def _correct_octave_errors(f0, kernel=9, tolerance=0.08):
+    """
+    Fold isolated octave/twelfth jumps (f0 near 2x, 3x, 1/2 or 1/3 of the running
+    median of voiced frames) back onto the contour, and unvoice frames that still
+    jump by more than 25%. Praat avoids these with a Viterbi path over pitch
+    candidates; a median reference is the cheap equivalent.
+    """
+    voiced = f0 > 0
+    if voiced.sum() < 3:
+        return f0
+    reference = scipy.signal.medfilt(f0[voiced], kernel_size=min(kernel, voiced.sum() // 2 * 2 - 1))
+    ratio = f0[voiced] / reference
+    corrected = f0[voiced].copy()
+    for factor in (2.0, 3.0, 0.5, 1.0 / 3.0):
+        jump = np.abs(ratio / factor - 1) < tolerance
+        corrected[jump] = f0[voiced][jump] / factor
+    corrected[np.abs(corrected / reference - 1) > 0.25] = 0.0
+    result = f0.copy()
+    result[voiced] = corrected
+    return result
+
+
+class VoiceQualityAnalysis:
+    """
+    NumPy voice-quality engine: an alternative to Praat for pitch, jitter, shimmer and HNR.
+
+    Pitch is tracked with a YIN-style cumulative mean normalised difference
+    computed by FFT for blocks of frames; each frame's normalised autocorrelation
+    at the chosen lag gives voicing and HNR. Glottal pulses are the dominant
+    peaks of each voiced run, spaced by the local period, and jitter/shimmer
+    follow Praat's definitions and period/amplitude constraints.
+
+    Defaults mirror the Praat settings used by the Praat engine (75-600 Hz pitch
+    range, 10 ms steps, one-period-of-75-Hz analysis window, 0.03 silence and
+    0.45 voicing thresholds). Results are close to Praat but not identical; see
+    tools/compare_voice_engines.py for the measured deviation.
+    """
+
+    def __init__(self, samples, sr, fmin=75.0, fmax=600.0, time_step=0.01,
+                 silence_threshold=0.03, voicing_threshold=0.45, yin_threshold=0.15, block_frames=256):
+        self.samples = np.asarray(samples, dtype=np.float64)
+        self.sr = sr
+        self.fmin = fmin
+        self.fmax = fmax
+        self.time_step = time_step
+        self.silence_threshold = silence_threshold
+        self.voicing_threshold = voicing_threshold
+        self.yin_threshold = yin_threshold
+        self.block_frames = block_frames
+
+        self._track = None
+        self._pulses = None
+
+    # --- Pitch track ---
+
+    @property
+    def track(self):
+        """Per-frame dict: times (s), f0 (Hz, 0 when unvoiced), strength (normalised autocorrelation), voiced, local_peak"""
+        if self._track is None:
+            self._track = self._compute_track()
+        return self._track
+
+    def _compute_track(self):
+        x, sr = self.samples, self.sr
+        max_lag = int(np.ceil(sr / self.fmin))
+        min_lag = max(2, int(np.floor(sr / self.fmax)))
+        window = max_lag  # Integration window: one period of the lowest pitch
+        frame_length = window + max_lag + 1
+        hop = max(1, int(round(self.time_step * sr)))
+
+        if len(x) < frame_length:
+            empty = np.zeros(0)
+            return {'times': empty, 'f0': empty, 'strength': empty, 'voiced': empty.astype(bool), 'local_peak': empty}
+
+        frames = np.lib.stride_tricks.sliding_window_view(x, frame_length)[::hop]
+        n_frames = len(frames)
+        n_fft = 1 << int(np.ceil(np.log2(frame_length + window)))
+        lags = np.arange(max_lag + 1)
+
+        lag = np.zeros(n_frames)
+        strength = np.zeros(n_frames)
+        local_peak = np.zeros(n_frames)
+
+        # Blocks of frames keep the FFT buffers small on long recordings
+        for b0 in range(0, n_frames, self.block_frames):
+            block = frames[b0:b0 + self.block_frames]
+            rows = np.arange(len(block))
+
+            # r[tau] = sum_{j<W} x_j x_{j+tau}, by FFT cross-correlation of the window with the frame
+            spectrum = np.fft.rfft(block, n_fft)
+            window_spectrum = np.fft.rfft(block[:, :window], n_fft)
+            r = np.fft.irfft(spectrum * np.conj(window_spectrum), n_fft)[:, :max_lag + 1]
+
+            energy = np.concatenate([np.zeros((len(block), 1)), np.cumsum(block ** 2, axis=1)], axis=1)
+            e0 = energy[:, window][:, np.newaxis]
+            e_tau = energy[:, lags + window] - energy[:, lags]
+
+            # YIN difference function and its cumulative mean normalisation
+            d = np.maximum(e0 + e_tau - 2 * r, 0.0)
+            cumulative = np.cumsum(d[:, 1:], axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cmnd = np.ones_like(d)
+                cmnd[:, 1:] = np.where(cumulative > 0, d[:, 1:] * lags[1:] / cumulative, 1.0)
+
+            # First trough below the threshold, else the global minimum in the pitch range
+            search = cmnd[:, min_lag:max_lag]
+            trough = (search <= cmnd[:, min_lag - 1:max_lag - 1]) & (search < cmnd[:, min_lag + 1:max_lag + 1])
+            # (the threshold relaxes to just above a frame's minimum so jittery frames don't fall to a subharmonic)
+            threshold = np.maximum(self.yin_threshold, search.min(axis=1, keepdims=True) + 0.1)
+            candidates = trough & (search < threshold)
+            best = np.where(candidates.any(axis=1), np.argmax(candidates, axis=1), np.argmin(search, axis=1)) + min_lag
+
+            offset = _parabolic_offset(cmnd[rows, best - 1], cmnd[rows, best], cmnd[rows, best + 1])
+            lag[b0:b0 + len(block)] = best + offset
+
+            # Normalised autocorrelation at the chosen lag (parabolic peak value)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                normalised = np.where(e0 * e_tau > 0, r / np.sqrt(e0 * e_tau), 0.0)
+            left, centre, right = normalised[rows, best - 1], normalised[rows, best], normalised[rows, best + 1]
+            strength[b0:b0 + len(block)] = centre - 0.25 * (left - right) * _parabolic_offset(left, centre, right)
+            local_peak[b0:b0 + len(block)] = np.max(np.abs(block), axis=1)
+
+        global_peak = np.max(np.abs(x)) if len(x) else 0.0
+        voiced = (strength > self.voicing_threshold) & (local_peak > self.silence_threshold * global_peak)
+
+        return {
+            'times': (np.arange(n_frames) * hop + frame_length / 2) / sr,
+            'f0': _correct_octave_errors(np.where(voiced, sr / lag, 0.0)),
+            'strength': np.clip(strength, -1.0, 1.0),
+            'voiced': voiced,
+            'local_peak': local_peak,
+            'hop': hop,
+            'frame_length': frame_length,
+        }
+
+    # --- Glottal pulses ---
+
+    @property
+    def pulses(self):
+        """Dict of pulse times (s), periods to the next pulse (NaN across unvoiced gaps) and pulse amplitudes"""
+        if self._pulses is None:
+            self._pulses = self._compute_pulses()
+        return self._pulses
+
+    def _compute_pulses(self):
+        track = self.track
+        x, sr = self.samples, self.sr
+        peak_positions, times, periods = [], [], []
+
+        if len(track['f0']):
+            hop, frame_length = track['hop'], track['frame_length']
+            starts, ends = find_runs(track['voiced'])
+            for start, end in zip(starts, ends):
+                # Samples covered by the run's frames (centre +/- half a step)
+                s0 = max(0, start * hop + frame_length // 2 - hop // 2)
+                s1 = min(len(x), (end - 1) * hop + frame_length // 2 + hop // 2)
+                segment = x[s0:s1]
+                if len(segment) < 3:
+                    continue
+
+                # Pulses are the dominant extrema of each period (polarity with the larger peak)
+                if np.max(segment) < -np.min(segment):
+                    segment = -segment
+                period = sr / np.median(track['f0'][start:end])
+                peaks, _ = scipy.signal.find_peaks(segment, distance=max(1, int(0.7 * period)))
+                peaks = peaks[(peaks > 0) & (peaks < len(segment) - 1)]
+                if len(peaks) == 0:
+                    continue
+
+                offset = _parabolic_offset(segment[peaks - 1], segment[peaks], segment[peaks + 1])
+                peak_positions.append(s0 + peaks)
+                times.append((s0 + peaks + offset) / sr)
+                # Periods within the run, refined by waveform cross-correlation; NaN closes the run
+                periods.append(np.append(self._aligned_periods(s0 + peaks, period), np.nan))
+
+        if not times:
+            empty = np.zeros(0)
+            return {'times': empty, 'periods': empty, 'amplitudes': empty}
+
+        times = np.concatenate(times)
+        periods = np.concatenate(periods)[:-1]
+        return {
+            'times': times,
+            'periods': periods,
+            'amplitudes': self._pulse_amplitudes(np.concatenate(peak_positions), periods),
+        }
+
+    def _aligned_periods(self, positions, period):
+        """
+        Period (s) between each pair of consecutive pulses: the lag, near the peak
+        distance, that best aligns the waveform around one pulse with the next
+        (the cross-correlation Praat uses to place pulses), with sub-sample interpolation.
+        """
+        x, sr = self.samples, self.sr
+        if len(positions) < 2:
+            return np.zeros(0)
+
+        half = max(2, int(0.4 * period))
+        spread = max(2, int(np.ceil(0.1 * period)))
+        distance = np.diff(positions)
+        first = positions[:-1]
+
+        # Waveform around each pulse, and around each candidate position of the next one
+        offsets = np.arange(-half, half)
+        lags = np.arange(-spread - 1, spread + 2)
+        reference_index = np.clip(first[:, np.newaxis] + offsets, 0, len(x) - 1)
+        candidate_index = np.clip(
+            (first + distance)[:, np.newaxis, np.newaxis] + lags[:, np.newaxis] + offsets, 0, len(x) - 1)
+        reference = x[reference_index]
+        candidates = x[candidate_index]
+
+        numerator = np.einsum('nl,nkl->nk', reference, candidates)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = numerator / np.sqrt(np.sum(reference ** 2, axis=1)[:, np.newaxis] *
+                                              np.sum(candidates ** 2, axis=2))
+        correlation = np.nan_to_num(correlation)
+
+        best = np.argmax(correlation[:, 1:-1], axis=1) + 1
+        rows = np.arange(len(best))
+        offset = _parabolic_offset(correlation[rows, best - 1], correlation[rows, best], correlation[rows, best + 1])
+        return (distance + lags[best] + offset) / sr
+
+    def _pulse_amplitudes(self, positions, periods):
+        """
+        Amplitude at each pulse: RMS over -0.2 of the previous period to +0.2 of the
+        next (Praat's AmplitudeTier window, without its Hann weighting), NaN where a
+        neighbouring period is missing
+        """
+        x, sr = self.samples, self.sr
+        previous = np.concatenate([[np.nan], periods])
+        following = np.concatenate([periods, [np.nan]])
+        amplitudes = np.full(len(positions), np.nan)
+
+        defined = np.isfinite(previous) & np.isfinite(following)
+        if defined.any():
+            energy = np.concatenate([[0.0], np.cumsum(x ** 2)])
+            start = np.clip(positions[defined] - np.round(0.2 * previous[defined] * sr).astype(int), 0, len(x))
+            stop = np.clip(positions[defined] + np.round(0.2 * following[defined] * sr).astype(int) + 1, 0, len(x))
+            amplitudes[defined] = np.sqrt((energy[stop] - energy[start]) / np.maximum(stop - start, 1))
+        return amplitudes
+
+    def _periods(self):
+        """Periods between consecutive pulses with Praat's floor/ceiling validity"""
+        periods = self.pulses['periods']
+        valid = np.isfinite(periods) & (periods >= PERIOD_FLOOR) & (periods <= PERIOD_CEILING)
+        return periods, valid
+
+    # --- Measures ---
+
+    def pitch_features(self):
+        f0 = self.track['f0']
+        voiced_f0 = f0[f0 > 0]
+        return {
+            "mean_pitch": np.mean(voiced_f0) if len(voiced_f0) > 0 else 0,
+            "std_pitch": np.std(voiced_f0) if len(voiced_f0) > 0 else 0,
+            "min_pitch": np.min(voiced_f0) if len(voiced_f0) > 0 else 0,
+            "max_pitch": np.max(voiced_f0) if len(voiced_f0) > 0 else 0,
+            "pitch_range": np.ptp(voiced_f0) if len(voiced_f0) > 0 else 0,
+        }
+
+    def jitter(self, points):
+        periods, valid = self._periods()
+        return perturbation_quotient(periods, valid, points, MAX_PERIOD_FACTOR)
+
+    def shimmer(self, points):
+        # Amplitudes count where both neighbouring periods are valid (as in Praat's AmplitudeTier)
+        periods, valid = self._periods()
+        amplitudes = self.pulses['amplitudes']
+        defined = np.concatenate([[False], valid]) & np.concatenate([valid, [False]])
+        defined &= np.isfinite(amplitudes) & (amplitudes > 0)
+        return perturbation_quotient(np.nan_to_num(amplitudes), defined, points, MAX_AMPLITUDE_FACTOR)
+
+    def hnr(self):
+        """Mean harmonics-to-noise ratio (dB) over frames above Praat's 0.1 harmonicity silence threshold"""
+        track = self.track
+        if not len(track['strength']):
+            return np.nan
+        global_peak = np.max(np.abs(self.samples))
+        frames = (track['strength'] > 0) & (track['local_peak'] > 0.1 * global_peak)
+        if not frames.any():
+            return np.nan
+        r = np.clip(track['strength'][frames], 1e-9, 1 - 1e-9)
+        return float(np.mean(10 * np.log10(r / (1 - r))))
+
+    def pulse_times(self):
+        return self.pulses['times']